@@ -0,0 +1,283 @@
+"""End-to-end load test of the bot against local fake Binance and Telegram servers.
+
+Runs the real dispatcher (start, wallet, sell and the other routers, with
+the account middleware) with ``--users`` simulated users, each with their
+own Binance account. Users act concurrently in three phases:
+
+- ``wallet``: send ``/wallet``
+- ``refresh``: press the Refresh button
+- ``sell``: the full market sell conversation, from ``/sell`` to confirming
+
+Every phase reports throughput, p50/p99 action latency and the Binance REST
+and Telegram calls per action. Save a run with ``--save baseline.json`` and
+pass ``--baseline baseline.json`` later to exit with status 1 when p99
+latency or REST calls per action regress beyond ``--tolerance``.
+
+Run with ``make bench_load`` or
+``PYTHONPATH=./src python3 benchmarks/bench_load.py --users 50 --latency 0.05``.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from fake_servers import FakeBinance, FakeTelegram
+
+PHASES = ("wallet", "refresh", "sell")
+BOT_TOKEN = "123456:bench"
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(int(q * len(sorted_values)), len(sorted_values) - 1)]
+
+
+def configure(args: argparse.Namespace, binance: FakeBinance, directory: str) -> None:
+    """Point the bot at the fake servers; must run before the bot modules are imported."""
+    accounts_file = os.path.join(directory, "accounts.json")
+    with open(accounts_file, "w") as f:
+        json.dump({
+            str(user_id): {
+                "name": f"user{user_id}", "api_key": f"key{user_id}", "api_secret": "secret",
+            }
+            for user_id in range(1, args.users + 1)
+        }, f)
+    streams = "true" if args.streams else "false"
+    os.environ.update({
+        "BOT_TOKEN": BOT_TOKEN,
+        "BINANCE_BASE_URL": binance.url,
+        "BINANCE_STREAM_URL": binance.stream_url,
+        "BINANCE_ACCOUNTS_FILE": accounts_file,
+        "MAX_OPEN_ACCOUNTS": str(args.users),
+        "MARKET_STREAM_ENABLED": streams,
+        "USER_STREAM_ENABLED": streams,
+        # The fake server has no rate limits, don't let the scheduler shed load
+        "BINANCE_REQUEST_WEIGHT_LIMIT": "1000000000",
+        "BINANCE_SAPI_WEIGHT_LIMIT": "1000000000",
+        "BINANCE_ORDER_COUNT_LIMIT": "1000000000",
+        "ALERTS_FILE": "",
+        "KLINES_DIR": os.path.join(directory, "klines"),
+        "HISTORY_DIR": os.path.join(directory, "history"),
+    })
+    for name in ("BOT_STORAGE_PATH", "METRICS_PORT", "BOT_WORKERS"):
+        os.environ.pop(name, None)
+
+
+class SimulatedUser:
+    """One Telegram user driving the bot through raw updates."""
+
+    def __init__(self, user_id: int, feed: Callable, telegram: FakeTelegram):
+        self.user_id = user_id
+        self.feed = feed
+        self.telegram = telegram
+        self._update_ids = iter(range(user_id * 1_000_000, (user_id + 1) * 1_000_000))
+        self.user = {"id": user_id, "is_bot": False, "first_name": f"User{user_id}"}
+        self.chat = {"id": user_id, "type": "private"}
+
+    def _message(self) -> Dict[str, Any]:
+        return {"message_id": 1, "date": int(time.time()), "chat": self.chat, "from": self.user}
+
+    async def send(self, text: str) -> None:
+        await self.feed({
+            "update_id": next(self._update_ids),
+            "message": {**self._message(), "text": text},
+        })
+
+    async def press(self, data: str) -> None:
+        await self.feed({
+            "update_id": next(self._update_ids),
+            "callback_query": {
+                "id": str(next(self._update_ids)),
+                "from": self.user,
+                "chat_instance": str(self.user_id),
+                "data": data,
+                "message": {**self._message(), "text": "…"},
+            },
+        })
+
+    def button(self, prefix: str, choose: Callable[[List[str]], str] = lambda b: b[0]) -> str:
+        """Callback data of a button the bot last showed, starting with ``prefix``."""
+        buttons = [b for b in self.telegram.buttons(self.user_id) if b.startswith(prefix)]
+        if not buttons:
+            offered = self.telegram.buttons(self.user_id)
+            raise RuntimeError(f"No {prefix}* button offered, got {offered}")
+        return choose(buttons)
+
+    async def wallet(self) -> None:
+        await self.send("/wallet")
+
+    async def refresh(self) -> None:
+        await self.press("refresh_wallet")
+
+    async def sell(self) -> None:
+        await self.send("/sell")
+        await self.press(self.button("sell_asset_", random.choice))
+        # Market is offered first
+        await self.press(self.button("select_type_"))
+        await self.send("50%")
+        await self.press(self.button("confirm_sell_"))
+
+
+async def run_phase(
+    name: str, users: List[SimulatedUser], rounds: int, binance: FakeBinance, telegram: FakeTelegram
+) -> Dict[str, float]:
+    latencies: List[float] = []
+    errors = 0
+
+    async def act(user: SimulatedUser) -> None:
+        nonlocal errors
+        for _ in range(rounds):
+            started = time.perf_counter()
+            try:
+                await getattr(user, name)()
+            except Exception as e:
+                errors += 1
+                logging.getLogger(__name__).debug(f"{name} of user {user.user_id} failed: {e}")
+                continue
+            latencies.append(time.perf_counter() - started)
+
+    rest_before, telegram_before = binance.total_calls(), sum(telegram.calls.values())
+    started = time.perf_counter()
+    await asyncio.gather(*(act(user) for user in users))
+    elapsed = time.perf_counter() - started
+    actions = len(users) * rounds
+    latencies.sort()
+    return {
+        "actions": actions,
+        "errors": errors,
+        "seconds": elapsed,
+        "throughput": actions / elapsed,
+        "p50_ms": percentile(latencies, 0.5) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "rest_per_action": (binance.total_calls() - rest_before) / actions,
+        "telegram_per_action": (sum(telegram.calls.values()) - telegram_before) / actions,
+    }
+
+
+def report(results: Dict[str, Dict[str, float]], args: argparse.Namespace) -> None:
+    print(
+        f"{args.users} users, {args.assets} assets each, {args.latency * 1000:.0f} ms Binance "
+        f"and {args.telegram_latency * 1000:.0f} ms Telegram latency, "
+        f"streams {'on' if args.streams else 'off'}:"
+    )
+    print(
+        f"{'phase':<8} {'actions':>8} {'errors':>7} {'actions/s':>10} {'p50':>10} {'p99':>10} "
+        f"{'REST/action':>12} {'TG/action':>10}"
+    )
+    for name, r in results.items():
+        print(
+            f"{name:<8} {r['actions']:>8} {r['errors']:>7} {r['throughput']:>10.1f} "
+            f"{r['p50_ms']:>7.1f} ms {r['p99_ms']:>7.1f} ms {r['rest_per_action']:>12.2f} "
+            f"{r['telegram_per_action']:>10.2f}"
+        )
+
+
+def regressions(
+    results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]], tolerance: float
+) -> List[str]:
+    found = []
+    for name, r in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        for key in ("p99_ms", "rest_per_action"):
+            if r[key] > base[key] * (1 + tolerance):
+                found.append(f"{name} {key}: {r[key]:.2f} vs baseline {base[key]:.2f}")
+        if r["errors"] > base["errors"]:
+            found.append(f"{name} errors: {r['errors']} vs baseline {base['errors']}")
+    return found
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Dict[str, float]]:
+    random.seed(args.seed)
+    binance = FakeBinance(assets=args.assets, latency=args.latency)
+    telegram = FakeTelegram(latency=args.telegram_latency)
+    await binance.start()
+    await telegram.start()
+
+    with tempfile.TemporaryDirectory() as directory:
+        configure(args, binance, directory)
+        # Imported only now, the bot modules read their settings on import
+        from aiogram import Bot
+        from aiogram.client.default import DefaultBotProperties
+        from aiogram.client.session.aiohttp import AiohttpSession
+        from aiogram.client.telegram import TelegramAPIServer
+        from aiogram.enums import ParseMode
+        from aiogram.fsm.storage.memory import MemoryStorage
+        import app
+
+        dp = app.create_dispatcher(MemoryStorage())
+        bot = Bot(
+            token=BOT_TOKEN,
+            session=AiohttpSession(api=TelegramAPIServer.from_base(telegram.url)),
+            default=DefaultBotProperties(parse_mode=ParseMode.HTML),
+        )
+
+        async def feed(update: Dict[str, Any]) -> None:
+            await dp.feed_raw_update(bot, update)
+
+        users = [SimulatedUser(user_id, feed, telegram) for user_id in range(1, args.users + 1)]
+        results = {}
+        try:
+            # As on a real startup, before the first update
+            await app.warmup.warm_up(app.accounts.registry)
+            async with app.background_tasks(bot):
+                if args.streams:
+                    # Let the market stream fill the book before measuring
+                    await asyncio.sleep(2 * binance.tick)
+                for name in PHASES:
+                    results[name] = await run_phase(name, users, args.rounds, binance, telegram)
+        finally:
+            await bot.session.close()
+            await telegram.stop()
+            await binance.stop()
+
+    if args.verbose:
+        for endpoint, count in sorted(binance.calls.items()):
+            print(f"  {endpoint:<40} {count:>6}")
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=20, help="concurrent simulated users")
+    parser.add_argument("--rounds", type=int, default=3, help="actions per user and phase")
+    parser.add_argument("--assets", type=int, default=50, help="coins in every wallet")
+    parser.add_argument("--latency", type=float, default=0.02, help="Binance REST delay, seconds")
+    parser.add_argument(
+        "--telegram-latency", type=float, default=0.02, help="Bot API delay, seconds"
+    )
+    parser.add_argument("--no-streams", dest="streams", action="store_false", help="REST only")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="fail on regressions against this JSON file")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative regression")
+    parser.add_argument("-v", "--verbose", action="store_true", help="print calls per endpoint")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.ERROR)
+    results = asyncio.run(run(args))
+    report(results, args)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            found = regressions(results, json.load(f), args.tolerance)
+        for line in found:
+            print(f"REGRESSION {line}")
+        if found:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
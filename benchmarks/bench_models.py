@@ -0,0 +1,96 @@
+"""Compare pydantic and lazy market models on a realistic 500-symbol payload.
+
+Run with ``make bench`` or ``PYTHONPATH=./src python3 benchmarks/bench_models.py``.
+"""
+import random
+import timeit
+
+from models import (
+    LazyTicker24hrData,
+    LazyUserAsset,
+    Ticker24hrData,
+    UserAsset,
+)
+
+SYMBOLS = 500
+REPEAT = 5
+NUMBER = 20
+
+
+def ticker_payload(symbol: str) -> dict:
+    price = random.uniform(0.0001, 60000)
+    change = price * random.uniform(-0.1, 0.1)
+    return {
+        "symbol": symbol,
+        "priceChange": f"{change:.8f}",
+        "priceChangePercent": f"{change / price * 100:.3f}",
+        "weightedAvgPrice": f"{price * 0.99:.8f}",
+        "prevClosePrice": f"{price - change:.8f}",
+        "lastPrice": f"{price:.8f}",
+        "lastQty": f"{random.uniform(0, 100):.8f}",
+        "bidPrice": f"{price * 0.9995:.8f}",
+        "bidQty": f"{random.uniform(0, 1000):.8f}",
+        "askPrice": f"{price * 1.0005:.8f}",
+        "askQty": f"{random.uniform(0, 1000):.8f}",
+        "openPrice": f"{price - change:.8f}",
+        "highPrice": f"{price * 1.05:.8f}",
+        "lowPrice": f"{price * 0.95:.8f}",
+        "volume": f"{random.uniform(0, 1e7):.8f}",
+        "quoteVolume": f"{random.uniform(0, 1e9):.8f}",
+        "openTime": 1741478400000,
+        "closeTime": 1741564799999,
+        "firstId": 100000,
+        "lastId": 200000,
+        "count": 100001,
+    }
+
+
+def asset_payload(symbol: str) -> dict:
+    return {
+        "asset": symbol,
+        "free": f"{random.uniform(0, 100):.8f}",
+        "locked": "0",
+        "freeze": "0",
+        "withdrawing": "0",
+        "ipoable": "0",
+        "btcValuation": f"{random.uniform(0, 1):.8f}",
+    }
+
+
+def read_wallet_fields(tickers, assets) -> None:
+    """Touch the fields the wallet actually renders."""
+    for t, a in zip(tickers, assets):
+        a.free
+        t.last_price
+        t.bid_price, t.bid_qty, t.ask_price, t.ask_qty
+        t.price_change, t.price_change_percent
+
+
+def bench(name: str, fn) -> None:
+    best = min(timeit.repeat(fn, repeat=REPEAT, number=NUMBER)) / NUMBER
+    print(f"{name:<28} {best * 1000:8.3f} ms")
+
+
+def main() -> None:
+    random.seed(0)
+    symbols = [f"COIN{i}" for i in range(SYMBOLS)]
+    tickers_json = [ticker_payload(f"{s}USDT") for s in symbols]
+    assets_json = [asset_payload(s) for s in symbols]
+
+    def pydantic_models():
+        tickers = [Ticker24hrData(**x) for x in tickers_json]
+        assets = [UserAsset(**x) for x in assets_json]
+        read_wallet_fields(tickers, assets)
+
+    def lazy_models():
+        tickers = [LazyTicker24hrData.from_json(x) for x in tickers_json]
+        assets = [LazyUserAsset.from_json(x) for x in assets_json]
+        read_wallet_fields(tickers, assets)
+
+    print(f"Parse + read wallet fields, {SYMBOLS} symbols (best of {REPEAT}):")
+    bench("pydantic models", pydantic_models)
+    bench("lazy models", lazy_models)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Compare per-item WalletItem valuation with the columnar PortfolioFrame.
+
+Both paths do what ``/wallet`` needs: value every asset, sort by balance,
+total it, filter out small balances and count the displayed rows.
+
+Run with ``make bench`` or ``PYTHONPATH=./src python3 benchmarks/bench_valuation.py``.
+"""
+import random
+import timeit
+
+from models import LazyTicker24hrData, LazyUserAsset, WalletItem
+from valuation import PortfolioFrame
+from bench_models import asset_payload, ticker_payload
+
+SIZES = (10, 100, 1000)
+REPEAT = 5
+
+
+def wallet_items(assets, tickers):
+    """The pre-frame pipeline, one WalletItem per asset."""
+    wallet = sorted(
+        (
+            WalletItem(
+                symbol=a.symbol,
+                free=a.free,
+                last_price_usdt=t.last_price,
+                available_liquidity=t.bid_price * t.bid_qty + t.ask_price * t.ask_qty,
+                pnl_24hr_usdt=t.price_change,
+                pnl_24hr_percentage=t.price_change_percent,
+            )
+            for a, t in zip(assets, tickers)
+        ),
+        key=lambda x: x.balance_usdt,
+        reverse=True,
+    )
+    total = sum(a.balance_usdt for a in wallet)
+    shown = [(a.balance_usdt, a.personal_pnl_usdt) for a in wallet if a.balance_usdt >= 1]
+    count = sum(1 for a in wallet if a.balance_usdt >= 1)
+    return total, shown, count
+
+
+def portfolio_frame(assets, tickers):
+    frame = PortfolioFrame(assets, tickers)
+    shown = [(frame.balance[i], frame.pnl[i]) for i in frame.visible_order()]
+    return frame.total_balance, shown, frame.visible_count
+
+
+def main() -> None:
+    random.seed(0)
+    print(f"Value, sort, total and filter a wallet (best of {REPEAT}, per render):")
+    print(f"{'assets':>8} {'WalletItem':>14} {'PortfolioFrame':>16} {'speedup':>9}")
+    for size in SIZES:
+        symbols = [f"COIN{i}" for i in range(size)]
+        assets_json = [asset_payload(s) for s in symbols]
+        tickers_json = [ticker_payload(f"{s}USDT") for s in symbols]
+        number = max(1, 2000 // size)
+
+        def run(pipeline):
+            # Fresh models each run, so lazily parsed fields are not reused
+            assets = [LazyUserAsset.from_json(x) for x in assets_json]
+            tickers = [LazyTicker24hrData.from_json(x) for x in tickers_json]
+            pipeline(assets, tickers)
+
+        items = min(timeit.repeat(lambda: run(wallet_items), repeat=REPEAT, number=number)) / number
+        frame = min(timeit.repeat(lambda: run(portfolio_frame), repeat=REPEAT, number=number)) / number
+        print(f"{size:>8} {items * 1000:>11.3f} ms {frame * 1000:>13.3f} ms {items / frame:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,321 @@
+"""Local stand-ins for the Binance REST/WebSocket APIs and the Telegram Bot API.
+
+Used by ``bench_load.py``. Both servers answer with canned but well-formed
+payloads after a configurable delay and count every call they serve, so a
+benchmark can report how many requests each user action costs.
+"""
+import asyncio
+import itertools
+import json
+import random
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from aiohttp import WSMsgType, web
+
+from bench_models import asset_payload, ticker_payload
+
+INTERVAL_MS = {
+    "1m": 60_000, "5m": 300_000, "15m": 900_000,
+    "1h": 3_600_000, "4h": 14_400_000, "1d": 86_400_000,
+}
+FILTERS = [
+    {
+        "filterType": "PRICE_FILTER",
+        "minPrice": "0.00000001", "maxPrice": "1000000", "tickSize": "0.00000001",
+    },
+    {
+        "filterType": "LOT_SIZE",
+        "minQty": "0.00000100", "maxQty": "9000000", "stepSize": "0.00000100",
+    },
+    {"filterType": "NOTIONAL", "minNotional": "1", "applyMinToMarket": True},
+]
+
+
+async def start_site(app: web.Application) -> Tuple[web.AppRunner, int]:
+    """Serve ``app`` on a free localhost port.
+
+    :return: The runner and the port it listens on
+    """
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    return runner, runner.addresses[0][1]
+
+
+class FakeBinance:
+    """Binance spot REST endpoints the bot uses, plus the market and user data streams.
+
+    Every account holds the same ``assets`` coins, each quoted against USDT.
+    The ``!miniTicker@arr`` stream and subscribed ``bookTicker``/``depth``
+    streams push an update per symbol every ``tick`` seconds; depth update
+    ids continue from the ones returned by ``/api/v3/depth`` snapshots.
+    """
+
+    def __init__(self, assets: int = 50, latency: float = 0.02, tick: float = 1.0):
+        self.latency = latency
+        self.tick = tick
+        self.coins = [f"COIN{i}" for i in range(assets)]
+        self.tickers = {f"{c}USDT": ticker_payload(f"{c}USDT") for c in self.coins}
+        self.wallet = [asset_payload(c) for c in self.coins] + [asset_payload("USDT")]
+        self.update_ids = {pair: 1 for pair in self.tickers}
+        self.calls: Counter = Counter()
+        self._order_ids = itertools.count(1)
+        self._runner: Optional[web.AppRunner] = None
+        self._port = 0
+        self._sockets: Set[web.WebSocketResponse] = set()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._port}"
+
+    @property
+    def stream_url(self) -> str:
+        return f"ws://127.0.0.1:{self._port}"
+
+    def total_calls(self) -> int:
+        return sum(self.calls.values())
+
+    @web.middleware
+    async def _count(self, request: web.Request, handler) -> web.StreamResponse:
+        if request.path.startswith(("/api", "/sapi")):
+            self.calls[f"{request.method} {request.path}"] += 1
+            await asyncio.sleep(self.latency)
+        return await handler(request)
+
+    def _price(self, pair: str) -> float:
+        return float(self.tickers[pair]["lastPrice"])
+
+    async def ping(self, request: web.Request) -> web.Response:
+        return web.json_response({})
+
+    async def time(self, request: web.Request) -> web.Response:
+        return web.json_response({"serverTime": int(time.time() * 1000)})
+
+    async def user_asset(self, request: web.Request) -> web.Response:
+        asset = request.query.get("asset")
+        if asset is not None:
+            return web.json_response([a for a in self.wallet if a["asset"] == asset])
+        return web.json_response(self.wallet)
+
+    async def ticker_24hr(self, request: web.Request) -> web.Response:
+        if "symbol" in request.query:
+            ticker = self.tickers.get(request.query["symbol"])
+            if ticker is None:
+                return web.json_response({"code": -1121, "msg": "Invalid symbol."}, status=400)
+            return web.json_response(ticker)
+        symbols = json.loads(request.query["symbols"])
+        return web.json_response([self.tickers[s] for s in symbols if s in self.tickers])
+
+    async def exchange_info(self, request: web.Request) -> web.Response:
+        return web.json_response(
+            {"symbols": [{"symbol": pair, "filters": FILTERS} for pair in self.tickers]}
+        )
+
+    async def klines(self, request: web.Request) -> web.Response:
+        pair = request.query["symbol"]
+        step = INTERVAL_MS[request.query["interval"]]
+        limit = int(request.query.get("limit", 500))
+        now = int(time.time() * 1000) // step * step
+        start = int(request.query.get("startTime", now - (limit - 1) * step)) // step * step
+        price = self._price(pair)
+        rows = []
+        for open_time in range(start, now + 1, step)[:limit]:
+            close = price * random.uniform(0.98, 1.02)
+            volume = random.uniform(1, 1000)
+            rows.append([
+                open_time, f"{price:.8f}", f"{max(price, close) * 1.01:.8f}",
+                f"{min(price, close) * 0.99:.8f}", f"{close:.8f}", f"{volume:.8f}",
+                open_time + step - 1, f"{volume * close:.8f}", 100, "0", "0", "0",
+            ])
+        return web.json_response(rows)
+
+    async def depth(self, request: web.Request) -> web.Response:
+        pair = request.query["symbol"]
+        limit = int(request.query.get("limit", 100))
+        price = self._price(pair)
+
+        def levels(side: int) -> List[List[str]]:
+            return [
+                [f"{price * (1 + side * 0.0005 * (i + 1)):.8f}", f"{random.uniform(0.1, 50):.8f}"]
+                for i in range(limit)
+            ]
+
+        return web.json_response(
+            {"lastUpdateId": self.update_ids[pair], "bids": levels(-1), "asks": levels(1)}
+        )
+
+    async def order(self, request: web.Request) -> web.Response:
+        query = request.query
+        return web.json_response({
+            "symbol": query["symbol"],
+            "orderId": next(self._order_ids),
+            "side": query.get("side"),
+            "type": query.get("type"),
+            "origQty": query.get("quantity"),
+            "executedQty": query.get("quantity") if query.get("type") == "MARKET" else "0",
+            "status": "FILLED" if query.get("type") == "MARKET" else "NEW",
+            "transactTime": int(time.time() * 1000),
+        })
+
+    async def listen_key(self, request: web.Request) -> web.Response:
+        if request.method == "POST":
+            return web.json_response({"listenKey": f"key{random.getrandbits(64):x}"})
+        return web.json_response({})
+
+    def _mini_tickers(self) -> dict:
+        events = []
+        for pair, ticker in self.tickers.items():
+            price = self._price(pair) * random.uniform(0.999, 1.001)
+            ticker["lastPrice"] = f"{price:.8f}"
+            events.append({"s": pair, "c": ticker["lastPrice"], "o": ticker["openPrice"]})
+        return {"stream": "!miniTicker@arr", "data": events}
+
+    def _book_ticker(self, pair: str) -> dict:
+        ticker = self.tickers[pair]
+        return {"stream": f"{pair.lower()}@bookTicker", "data": {
+            "s": pair, "b": ticker["bidPrice"], "B": ticker["bidQty"],
+            "a": ticker["askPrice"], "A": ticker["askQty"],
+        }}
+
+    def _depth_update(self, pair: str) -> dict:
+        self.update_ids[pair] += 1
+        update_id = self.update_ids[pair]
+        price = self._price(pair)
+        return {"stream": f"{pair.lower()}@depth@100ms", "data": {
+            "e": "depthUpdate", "s": pair, "U": update_id, "u": update_id,
+            "b": [[f"{price * 0.9995:.8f}", f"{random.uniform(0.1, 50):.8f}"]],
+            "a": [[f"{price * 1.0005:.8f}", f"{random.uniform(0.1, 50):.8f}"]],
+        }}
+
+    async def stream(self, request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse(heartbeat=30)
+        await ws.prepare(request)
+        self._sockets.add(ws)
+        mini_ticker = "!miniTicker@arr" in request.query.get("streams", "")
+        subscribed: Set[str] = set()
+
+        async def push() -> None:
+            while True:
+                if mini_ticker:
+                    await ws.send_str(json.dumps(self._mini_tickers()))
+                for stream in list(subscribed):
+                    pair, _, kind = stream.partition("@")
+                    pair = pair.upper()
+                    if pair not in self.tickers:
+                        continue
+                    if kind == "bookTicker":
+                        await ws.send_str(json.dumps(self._book_ticker(pair)))
+                    else:
+                        await ws.send_str(json.dumps(self._depth_update(pair)))
+                await asyncio.sleep(self.tick)
+
+        pusher = asyncio.create_task(push())
+        try:
+            async for msg in ws:
+                if msg.type != WSMsgType.TEXT:
+                    continue
+                request_message = json.loads(msg.data)
+                if request_message.get("method") == "SUBSCRIBE":
+                    subscribed.update(request_message["params"])
+                elif request_message.get("method") == "UNSUBSCRIBE":
+                    subscribed.difference_update(request_message["params"])
+                await ws.send_str(json.dumps({"result": None, "id": request_message.get("id")}))
+        finally:
+            pusher.cancel()
+            self._sockets.discard(ws)
+        return ws
+
+    async def user_stream(self, request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse(heartbeat=30)
+        await ws.prepare(request)
+        self._sockets.add(ws)
+        try:
+            # No balance changes, just keep the connection open
+            async for _ in ws:
+                pass
+        finally:
+            self._sockets.discard(ws)
+        return ws
+
+    async def start(self) -> None:
+        app = web.Application(middlewares=[self._count])
+        app.router.add_get("/api/v3/ping", self.ping)
+        app.router.add_get("/api/v3/time", self.time)
+        app.router.add_post("/sapi/v3/asset/getUserAsset", self.user_asset)
+        app.router.add_get("/api/v3/ticker/24hr", self.ticker_24hr)
+        app.router.add_get("/api/v3/exchangeInfo", self.exchange_info)
+        app.router.add_get("/api/v3/klines", self.klines)
+        app.router.add_get("/api/v3/depth", self.depth)
+        app.router.add_post("/api/v3/order", self.order)
+        app.router.add_route("*", "/api/v3/userDataStream", self.listen_key)
+        app.router.add_get("/stream", self.stream)
+        app.router.add_get("/ws/{listen_key}", self.user_stream)
+        self._runner, self._port = await start_site(app)
+
+    async def stop(self) -> None:
+        for ws in list(self._sockets):
+            await ws.close()
+        await self._runner.cleanup()
+
+
+class FakeTelegram:
+    """Bot API methods the handlers call, answered with minimal valid objects.
+
+    The reply markup of the last message sent or edited in every chat is
+    kept, so a simulated user can press the buttons it was offered.
+    """
+
+    def __init__(self, latency: float = 0.02):
+        self.latency = latency
+        self.calls: Counter = Counter()
+        self.markups: Dict[int, List[List[Dict[str, Any]]]] = {}
+        self.texts: Dict[int, str] = {}
+        self._message_ids = itertools.count(1000)
+        self._runner: Optional[web.AppRunner] = None
+        self._port = 0
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._port}"
+
+    def buttons(self, chat_id: int) -> List[str]:
+        """Callback data of every button last shown in a chat."""
+        return [
+            button["callback_data"]
+            for row in self.markups.get(chat_id, [])
+            for button in row
+            if "callback_data" in button
+        ]
+
+    async def method(self, request: web.Request) -> web.Response:
+        name = request.match_info["method"]
+        self.calls[name] += 1
+        await asyncio.sleep(self.latency)
+        data = await request.post()
+        if name == "getMe":
+            result: Any = {"id": 1, "is_bot": True, "first_name": "Bench", "username": "bench_bot"}
+        elif name in ("sendMessage", "editMessageText"):
+            chat_id = int(data["chat_id"])
+            markup = json.loads(data["reply_markup"]) if "reply_markup" in data else {}
+            self.markups[chat_id] = markup.get("inline_keyboard", [])
+            self.texts[chat_id] = data.get("text", "")
+            result = {
+                "message_id": int(data.get("message_id") or next(self._message_ids)),
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"},
+                "text": data.get("text", ""),
+            }
+        else:
+            result = True
+        return web.json_response({"ok": True, "result": result})
+
+    async def start(self) -> None:
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self.method)
+        self._runner, self._port = await start_site(app)
+
+    async def stop(self) -> None:
+        await self._runner.cleanup()
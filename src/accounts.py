@@ -0,0 +1,250 @@
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from os import getenv
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Optional
+
+import aiohttp
+from aiogram import BaseMiddleware
+from aiogram.types import CallbackQuery, Message, TelegramObject
+
+from binance_api import API_KEY, API_SECRET, KEEPALIVE_TIMEOUT, BinanceClient
+from user_stream import BalanceTable, UserDataStream
+
+# JSON file mapping Telegram user ids to Binance API credentials; without it
+# every user shares the account configured by BINANCE_TOKEN/BINANCE_SECRET
+ACCOUNTS_FILE = getenv("BINANCE_ACCOUNTS_FILE")
+# Max accounts with an open client and user data stream, least recently used are closed first
+MAX_OPEN_ACCOUNTS = int(getenv("MAX_OPEN_ACCOUNTS", "100"))
+# Accounts unused for this many seconds are closed
+ACCOUNT_IDLE_TIMEOUT = float(getenv("ACCOUNT_IDLE_TIMEOUT", "900"))
+# Keep-alive connections to Binance, shared by every account
+MAX_CONNECTIONS = int(getenv("BINANCE_MAX_CONNECTIONS", "100"))
+USER_STREAM_ENABLED = getenv("USER_STREAM_ENABLED", "true").lower() == "true"
+
+NOT_LINKED = "No Binance account is linked to your Telegram account."
+
+logger = logging.getLogger(__name__)
+
+
+def account_id(api_key: Optional[str]) -> str:
+    """Unique key of an account for caches and files, without revealing its API key."""
+    return hashlib.sha256((api_key or "").encode()).hexdigest()[:16]
+
+
+class Credentials(NamedTuple):
+    name: str
+    api_key: Optional[str]
+    api_secret: Optional[str]
+
+    @property
+    def id(self) -> str:
+        return account_id(self.api_key)
+
+
+def load_credentials(path: Optional[str]) -> Dict[int, Credentials]:
+    """Read the accounts file.
+
+    The file maps Telegram user ids to ``{"api_key", "api_secret"}`` and an
+    optional display ``name``. Several users may share one account.
+
+    :param path: Path to the accounts file, or None
+    :return: Credentials per Telegram user id, empty if no file is configured
+    """
+    if not path:
+        return {}
+    with open(path) as f:
+        entries = json.load(f)
+    return {
+        int(user_id): Credentials(
+            entry.get("name", f"user {user_id}"), entry["api_key"], entry["api_secret"]
+        )
+        for user_id, entry in entries.items()
+    }
+
+
+class Account:
+    """An open Binance account: its client, balance table and user data stream."""
+
+    def __init__(self, name: str, client: BinanceClient, user_stream: bool = USER_STREAM_ENABLED):
+        self.name = name
+        # Names are for display only and need not be unique
+        self.id = account_id(client.api_key)
+        self.client = client
+        self.balances = BalanceTable()
+        self.last_used = time.monotonic()
+        self._stream: Optional[UserDataStream] = None
+        self._task: Optional[asyncio.Task] = None
+        if user_stream:
+            self._stream = UserDataStream(client, self.balances)
+            self._task = asyncio.create_task(self._stream.run())
+
+    async def close(self) -> None:
+        if self._stream is not None:
+            await self._stream.stop()
+            await self._task
+        await self.client.close()
+
+
+class ClientRegistry:
+    """Open Binance accounts keyed by API key, resolved per Telegram user.
+
+    Every client borrows one shared connector, so accounts reuse the same
+    keep-alive TLS connections and the connection count stays capped at
+    ``max_connections`` no matter how many accounts are open. Accounts are
+    opened on first use and closed once idle for ``idle_timeout`` seconds, or
+    least recently used first when more than ``max_open`` are open.
+    """
+
+    def __init__(
+        self,
+        credentials: Dict[int, Credentials],
+        default: Credentials = Credentials("default", API_KEY, API_SECRET),
+        max_open: int = MAX_OPEN_ACCOUNTS,
+        idle_timeout: float = ACCOUNT_IDLE_TIMEOUT,
+        max_connections: int = MAX_CONNECTIONS,
+    ):
+        self.credentials = credentials
+        self.default = default
+        self.max_open = max_open
+        self.idle_timeout = idle_timeout
+        self.max_connections = max_connections
+        self._open: "OrderedDict[Optional[str], Account]" = OrderedDict()
+        self._connector: Optional[aiohttp.TCPConnector] = None
+        self._public: Optional[BinanceClient] = None
+        self.opened = 0
+        self.evicted = 0
+
+    @property
+    def connector(self) -> aiohttp.TCPConnector:
+        if self._connector is None or self._connector.closed:
+            self._connector = aiohttp.TCPConnector(
+                limit=self.max_connections,
+                keepalive_timeout=KEEPALIVE_TIMEOUT,
+                ttl_dns_cache=300,
+            )
+        return self._connector
+
+    @property
+    def public(self) -> BinanceClient:
+        """Unauthenticated client for market data and exchange info."""
+        if self._public is None:
+            self._public = BinanceClient(api_key=None, api_secret=None, connector=self.connector)
+        return self._public
+
+    def resolve(self, user_id: int) -> Optional[Credentials]:
+        """Credentials for a Telegram user, or None if the user has no account."""
+        if not self.credentials:
+            return self.default
+        return self.credentials.get(user_id)
+
+    def accounts(self) -> List[Credentials]:
+        """Credentials of every configured account, once per API key."""
+        if not self.credentials:
+            return [self.default]
+        return list({c.api_key: c for c in self.credentials.values()}.values())
+
+    async def get(self, user_id: int) -> Optional[Account]:
+        """Open account for a Telegram user, opening it if needed.
+
+        :param user_id: Telegram user id
+        :return: The user's account, or None if none is linked
+        """
+        credentials = self.resolve(user_id)
+        if credentials is None:
+            return None
+        return await self.open(credentials)
+
+    async def open(self, credentials: Credentials) -> Account:
+        """Open account for credentials, or the one already open.
+
+        :param credentials: Account credentials
+        :return: The open account
+        """
+        account = self._open.get(credentials.api_key)
+        if account is None:
+            client = BinanceClient(
+                api_key=credentials.api_key,
+                api_secret=credentials.api_secret,
+                connector=self.connector,
+            )
+            account = Account(credentials.name, client)
+            self._open[credentials.api_key] = account
+            self.opened += 1
+            logger.info(f"Opened Binance account {credentials.name}")
+            while len(self._open) > self.max_open:
+                _, evicted = self._open.popitem(last=False)
+                self.evicted += 1
+                await self._close(evicted)
+        else:
+            self._open.move_to_end(credentials.api_key)
+        account.last_used = time.monotonic()
+        return account
+
+    async def _close(self, account: Account) -> None:
+        try:
+            await account.close()
+        except Exception as e:
+            logger.warning(f"Closing Binance account {account.name} failed: {e}")
+        logger.info(f"Closed Binance account {account.name}")
+
+    async def sweep(self) -> None:
+        """Close accounts that have been idle for longer than ``idle_timeout``."""
+        now = time.monotonic()
+        idle = [
+            key for key, account in self._open.items()
+            if now - account.last_used > self.idle_timeout
+        ]
+        for key in idle:
+            await self._close(self._open.pop(key))
+
+    async def run(self) -> None:
+        """Sweep idle accounts in the background."""
+        while True:
+            await asyncio.sleep(min(self.idle_timeout, 60))
+            await self.sweep()
+
+    async def close(self) -> None:
+        """Close every account and the shared connector."""
+        while self._open:
+            await self._close(self._open.popitem()[1])
+        if self._public is not None:
+            await self._public.close()
+        if self._connector is not None:
+            await self._connector.close()
+
+    def stats(self) -> Dict[str, int]:
+        return {"open": len(self._open), "opened": self.opened, "evicted": self.evicted}
+
+
+class AccountMiddleware(BaseMiddleware):
+    """Resolve the caller's account and pass it to handlers as ``account``.
+
+    Updates from users without a linked account are answered and dropped.
+    """
+
+    def __init__(self, registry: ClientRegistry):
+        self.registry = registry
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        user = data.get("event_from_user")
+        account = await self.registry.get(user.id) if user is not None else None
+        if account is None:
+            if isinstance(event, CallbackQuery):
+                await event.answer(NOT_LINKED, show_alert=True)
+            elif isinstance(event, Message):
+                await event.answer(NOT_LINKED)
+            return None
+        data["account"] = account
+        return await handler(event, data)
+
+
+registry = ClientRegistry(load_credentials(ACCOUNTS_FILE))
@@ -0,0 +1,306 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from decimal import Decimal
+from os import getenv
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramForbiddenError, TelegramRetryAfter
+
+from exchange_filters import format_decimal
+
+# JSON file the alerts are saved to, so they survive restarts
+ALERTS_FILE = getenv("ALERTS_FILE", "alerts.json")
+MAX_ALERTS_PER_USER = int(getenv("MAX_ALERTS_PER_USER", "50"))
+# Seconds fired alerts are collected before notifying, one message per chat
+ALERT_FLUSH_INTERVAL = float(getenv("ALERT_FLUSH_INTERVAL", "1"))
+# Notification messages sent per second, below Telegram's broadcast limit
+ALERT_SEND_RATE = float(getenv("ALERT_SEND_RATE", "25"))
+
+logger = logging.getLogger(__name__)
+
+
+class Alert:
+    """A price threshold on one symbol, fired once when the price crosses it."""
+
+    __slots__ = ("id", "user_id", "chat_id", "symbol", "price", "above")
+
+    def __init__(
+        self, id: int, user_id: int, chat_id: int, symbol: str, price: Decimal, above: bool
+    ):
+        self.id = id
+        self.user_id = user_id
+        self.chat_id = chat_id
+        self.symbol = symbol
+        self.price = price
+        self.above = above
+
+    def to_json(self) -> dict:
+        return {
+            "id": self.id,
+            "user_id": self.user_id,
+            "chat_id": self.chat_id,
+            "symbol": self.symbol,
+            "price": str(self.price),
+            "above": self.above,
+        }
+
+    @classmethod
+    def from_json(cls, data: dict) -> "Alert":
+        return cls(
+            data["id"], data["user_id"], data["chat_id"], data["symbol"],
+            Decimal(data["price"]), data["above"],
+        )
+
+
+class Thresholds:
+    """Alerts of one symbol in two lists sorted by threshold.
+
+    ``above`` alerts fire once the price rises to their threshold, so on a
+    tick the fired ones are a prefix of the list; ``below`` alerts fire once
+    it falls to theirs, a suffix. Both ends are found with a binary search
+    on a parallel list of float keys, so a tick costs ``O(log n)`` plus the
+    alerts it fires.
+    """
+
+    __slots__ = ("above_keys", "above", "below_keys", "below")
+
+    def __init__(self):
+        self.above_keys: List[float] = []
+        self.above: List[Alert] = []
+        self.below_keys: List[float] = []
+        self.below: List[Alert] = []
+
+    def __len__(self) -> int:
+        return len(self.above) + len(self.below)
+
+    def _lists(self, alert: Alert) -> Tuple[List[float], List[Alert]]:
+        return (self.above_keys, self.above) if alert.above else (self.below_keys, self.below)
+
+    def add(self, alert: Alert) -> None:
+        keys, alerts = self._lists(alert)
+        key = float(alert.price)
+        i = bisect_right(keys, key)
+        keys.insert(i, key)
+        alerts.insert(i, alert)
+
+    def remove(self, alert: Alert) -> None:
+        keys, alerts = self._lists(alert)
+        key = float(alert.price)
+        i = bisect_left(keys, key)
+        # Several alerts can share a threshold, find this one among them
+        while alerts[i] is not alert:
+            i += 1
+        del keys[i]
+        del alerts[i]
+
+    def match(self, price: float) -> List[Alert]:
+        """Remove and return the alerts crossed at ``price``."""
+        fired: List[Alert] = []
+        if self.above_keys and self.above_keys[0] <= price:
+            i = bisect_right(self.above_keys, price)
+            fired.extend(self.above[:i])
+            del self.above_keys[:i]
+            del self.above[:i]
+        if self.below_keys and self.below_keys[-1] >= price:
+            i = bisect_left(self.below_keys, price)
+            fired.extend(self.below[i:])
+            del self.below_keys[i:]
+            del self.below[i:]
+        return fired
+
+
+class AlertEngine:
+    """Active price alerts of every user, matched against streamed prices.
+
+    Fired alerts are removed and queued per chat until :meth:`run` sends
+    them, so a burst of crossings becomes one message per chat.
+    """
+
+    def __init__(self, path: Optional[str] = ALERTS_FILE, max_per_user: int = MAX_ALERTS_PER_USER):
+        self.path = path
+        self.max_per_user = max_per_user
+        self._symbols: Dict[str, Thresholds] = {}
+        self._alerts: Dict[int, Alert] = {}
+        self._by_user: Dict[int, Dict[int, Alert]] = defaultdict(dict)
+        self._pending: Dict[int, List[Tuple[Alert, float]]] = defaultdict(list)
+        self._next_id = 1
+        self._dirty = False
+        self.fired = 0
+        self.sent = 0
+
+    def __len__(self) -> int:
+        return len(self._alerts)
+
+    def _insert(self, alert: Alert) -> None:
+        self._alerts[alert.id] = alert
+        self._by_user[alert.user_id][alert.id] = alert
+        thresholds = self._symbols.get(alert.symbol)
+        if thresholds is None:
+            thresholds = self._symbols[alert.symbol] = Thresholds()
+        thresholds.add(alert)
+
+    def _forget(self, alert: Alert) -> None:
+        del self._alerts[alert.id]
+        user_alerts = self._by_user[alert.user_id]
+        del user_alerts[alert.id]
+        if not user_alerts:
+            del self._by_user[alert.user_id]
+        self._dirty = True
+
+    def add(
+        self, user_id: int, chat_id: int, symbol: str, price: Decimal, current: Decimal
+    ) -> Optional[Alert]:
+        """Add an alert for when ``symbol`` crosses ``price``.
+
+        :param user_id: Telegram user owning the alert
+        :param chat_id: Chat to notify
+        :param symbol: Trading pair
+        :param price: Threshold price
+        :param current: Current price, which side of it the threshold is decides the direction
+        :return: The new alert, or None if the user has too many
+        """
+        if len(self._by_user.get(user_id, ())) >= self.max_per_user:
+            return None
+        alert = Alert(self._next_id, user_id, chat_id, symbol, price, price > current)
+        self._next_id += 1
+        self._insert(alert)
+        self._dirty = True
+        return alert
+
+    def remove(self, user_id: int, alert_id: int) -> bool:
+        """Delete one of the user's alerts, returns False if there is no such alert."""
+        alert = self._by_user.get(user_id, {}).get(alert_id)
+        if alert is None:
+            return False
+        self._symbols[alert.symbol].remove(alert)
+        if not self._symbols[alert.symbol]:
+            del self._symbols[alert.symbol]
+        self._forget(alert)
+        return True
+
+    def clear(self, user_id: int) -> int:
+        """Delete every alert of a user, returns how many were deleted."""
+        user_alerts = list(self._by_user.get(user_id, {}))
+        for alert_id in user_alerts:
+            self.remove(user_id, alert_id)
+        return len(user_alerts)
+
+    def user_alerts(self, user_id: int) -> List[Alert]:
+        """Alerts of a user, by symbol and threshold."""
+        return sorted(self._by_user.get(user_id, {}).values(), key=lambda a: (a.symbol, a.price))
+
+    def symbols(self) -> List[str]:
+        """Symbols with at least one alert."""
+        return list(self._symbols)
+
+    def match(self, symbol: str, price: float) -> List[Alert]:
+        """Fire the alerts of ``symbol`` crossed at ``price`` and queue their notifications."""
+        thresholds = self._symbols.get(symbol)
+        if thresholds is None:
+            return []
+        fired = thresholds.match(price)
+        if fired:
+            if not thresholds:
+                del self._symbols[symbol]
+            for alert in fired:
+                self._forget(alert)
+                self._pending[alert.chat_id].append((alert, price))
+            self.fired += len(fired)
+        return fired
+
+    def on_mini_tickers(self, events: Iterable[dict]) -> None:
+        """Market stream listener, matches the close price of every mini ticker event."""
+        symbols = self._symbols
+        for event in events:
+            if event["s"] in symbols:
+                self.match(event["s"], float(event["c"]))
+
+    def load(self) -> None:
+        if not self.path:
+            return
+        try:
+            with open(self.path) as f:
+                entries = json.load(f)
+        except FileNotFoundError:
+            return
+        for entry in entries:
+            self._insert(Alert.from_json(entry))
+        self._next_id = max(self._alerts, default=0) + 1
+        logger.info(f"Loaded {len(self._alerts)} price alerts")
+
+    def _snapshot(self) -> Optional[List[dict]]:
+        if not self.path or not self._dirty:
+            return None
+        self._dirty = False
+        return [alert.to_json() for alert in self._alerts.values()]
+
+    def _write(self, entries: List[dict]) -> None:
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(entries, f)
+        os.replace(tmp_path, self.path)
+
+    def save(self) -> None:
+        """Write the alerts to ``path`` if they changed since the last save."""
+        entries = self._snapshot()
+        if entries is not None:
+            self._write(entries)
+
+    async def _send(self, bot: Bot, chat_id: int, text: str) -> None:
+        try:
+            await bot.send_message(chat_id, text, parse_mode="HTML")
+        except TelegramRetryAfter as e:
+            await asyncio.sleep(e.retry_after)
+            await bot.send_message(chat_id, text, parse_mode="HTML")
+        except TelegramForbiddenError:
+            # The user blocked the bot, their remaining alerts can never be delivered
+            for alert in [a for a in self._alerts.values() if a.chat_id == chat_id]:
+                self.remove(alert.user_id, alert.id)
+            return
+        self.sent += 1
+
+    async def flush(self, bot: Bot) -> None:
+        """Send the queued notifications, one message per chat, paced to ``ALERT_SEND_RATE``."""
+        pending, self._pending = self._pending, defaultdict(list)
+        for chat_id, fired in pending.items():
+            lines = [
+                f"{alert.symbol} {'rose above' if alert.above else 'fell below'} "
+                f"${format_decimal(alert.price)} (now ${price:,.8g})"
+                for alert, price in fired
+            ]
+            started = time.monotonic()
+            try:
+                await self._send(bot, chat_id, "<b>🔔 Price Alert</b>\n\n" + "\n".join(lines))
+            except Exception as e:
+                logger.warning(f"Price alert notification to {chat_id} failed: {e}")
+            await asyncio.sleep(max(0.0, 1 / ALERT_SEND_RATE - (time.monotonic() - started)))
+
+    async def run(self, bot: Bot, interval: float = ALERT_FLUSH_INTERVAL) -> None:
+        """Send notifications and save the alerts every ``interval`` seconds until cancelled."""
+        try:
+            while True:
+                await asyncio.sleep(interval)
+                await self.flush(bot)
+                # Serialized on the loop, written off it
+                entries = self._snapshot()
+                if entries is not None:
+                    await asyncio.to_thread(self._write, entries)
+        finally:
+            self.save()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "active": len(self._alerts),
+            "symbols": len(self._symbols),
+            "fired": self.fired,
+            "sent": self.sent,
+        }
+
+
+engine = AlertEngine()
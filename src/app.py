@@ -1,42 +1,265 @@
 import asyncio
+import json
 import logging
+import multiprocessing
+import os
+from contextlib import asynccontextmanager
+from functools import partial
 from os import getenv
+from typing import Any, Awaitable, Callable, Dict, List
 from dotenv import load_dotenv
 
+# Every bot module reads its settings when imported, so .env is loaded once
+# here before any of them. Spawned workers re-import this module and inherit
+# the environment either way.
+load_dotenv()
+
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
 from aiogram.enums import ParseMode
+from aiogram.fsm.storage.base import BaseStorage
+from aiogram.fsm.storage.memory import MemoryStorage
 
 from handlers.wallet import wallet_router
 from handlers.start import start_router
 from handlers.sell import sell_router
+from handlers.batch_sell import batch_sell_router
+from handlers.history import history_router
+from handlers.alerts import alerts_router
+from binance_api import SCHEDULER, TICKER_CACHE
+from models import LazyTicker24hrData
+import accounts
+import alerts
 import bot_logger
+import market_stream
+import order_book
+import exchange_filters
+import history
+import metrics
+import storage
+import warmup
+import webhook
+import workers
 
 
-load_dotenv()
 TOKEN = getenv("BOT_TOKEN")
+# How updates are received, "polling" or "webhook"
+BOT_MODE = getenv("BOT_MODE", "polling")
+HISTORY_ENABLED = getenv("HISTORY_ENABLED", "true").lower() == "true"
+# Dispatcher processes; above 1 this process only polls and hands updates to them
+BOT_WORKERS = int(getenv("BOT_WORKERS", "1"))
+# Storage shared by the workers when BOT_STORAGE_PATH is not set
+DEFAULT_WORKER_STORAGE_PATH = "bot_storage.sqlite3"
 
-async def main() -> None:
-    # Set up logging
-    bot_logger.setup_logger()
-    logger = logging.getLogger(__name__)
-    logger.info("Starting bot...")
-    
+logger = logging.getLogger(__name__)
+
+
+def create_dispatcher(fsm_storage: BaseStorage) -> Dispatcher:
     # Dispatcher is a root router
-    dp = Dispatcher()
+    dp = Dispatcher(storage=fsm_storage)
+    # Tag every record logged while handling an update with its trace id
+    dp.update.outer_middleware(bot_logger.TraceMiddleware())
     dp.include_routers(
         start_router,
         wallet_router,
-        sell_router
+        sell_router,
+        batch_sell_router,
+        history_router,
+        alerts_router,
     )
-    
-    bot = Bot(
-        token=TOKEN, 
+    if metrics.registry.enabled:
+        # Registered first, so the time to resolve the account is included
+        handler_metrics = metrics.HandlerMetricsMiddleware()
+        dp.message.middleware(handler_metrics)
+        dp.callback_query.middleware(handler_metrics)
+    # Resolve the caller's Binance account for every handler
+    account_middleware = accounts.AccountMiddleware(accounts.registry)
+    dp.message.middleware(account_middleware)
+    dp.callback_query.middleware(account_middleware)
+    return dp
+
+
+def create_bot() -> Bot:
+    return Bot(
+        token=TOKEN,
         default=DefaultBotProperties(parse_mode=ParseMode.HTML)
     )
-    
-    logger.info("Bot initialized, starting polling...")
-    await dp.start_polling(bot)
+
+
+def share_caches(fsm_storage: BaseStorage) -> None:
+    """Back the market data caches with the storage if it can be shared."""
+    if isinstance(fsm_storage, storage.SharedCache):
+        TICKER_CACHE.share(
+            fsm_storage,
+            encode=lambda ticker: json.dumps(ticker.to_json()),
+            decode=lambda value: LazyTicker24hrData.from_json(json.loads(value)),
+        )
+
+
+def collect_metrics() -> None:
+    """Export the stats of the caches, scheduler and background services on /metrics."""
+    metrics.registry.collect("binance_ticker_cache", TICKER_CACHE.stats)
+    metrics.registry.collect("binance_scheduler", SCHEDULER.stats)
+    metrics.registry.collect("binance_accounts", accounts.registry.stats)
+    metrics.registry.collect("binance_order_books", order_book.books.stats)
+    metrics.registry.collect("bot_alerts", alerts.engine.stats)
+    metrics.registry.collect("bot_logging", bot_logger.stats)
+
+
+@asynccontextmanager
+async def background_tasks(bot: Bot):
+    """Run the exchange info, market and depth stream, price alert and account sweeping tasks."""
+    filters_task = asyncio.create_task(
+        exchange_filters.index.run(accounts.registry.public)
+    )
+    sweep_task = asyncio.create_task(accounts.registry.run())
+    # Alerts are matched against the mini ticker stream
+    alerts.engine.load()
+    market_stream.book.listeners.append(alerts.engine.on_mini_tickers)
+    alerts_task = asyncio.create_task(alerts.engine.run(bot))
+    if market_stream.MARKET_STREAM_ENABLED:
+        stream_task = asyncio.create_task(market_stream.stream.run())
+        depth_task = asyncio.create_task(order_book.books.run(accounts.registry.public))
+    try:
+        yield
+    finally:
+        filters_task.cancel()
+        sweep_task.cancel()
+        alerts_task.cancel()
+        await asyncio.gather(filters_task, sweep_task, alerts_task, return_exceptions=True)
+        if market_stream.MARKET_STREAM_ENABLED:
+            await market_stream.stream.stop()
+            await order_book.books.stop()
+            await asyncio.gather(stream_task, depth_task)
+
+
+async def run_dispatcher(index: int, queue: multiprocessing.Queue, storage_path: str) -> None:
+    fsm_storage = storage.SQLiteStorage(storage_path)
+    share_caches(fsm_storage)
+    dp = create_dispatcher(fsm_storage)
+    bot = create_bot()
+    if alerts.engine.path:
+        # Updates are routed by user, so each worker keeps the alerts of its own users
+        root, ext = os.path.splitext(alerts.engine.path)
+        alerts.engine.path = f"{root}.{index}{ext}"
+
+    if metrics.registry.enabled:
+        collect_metrics()
+        # Each worker exports its own metrics, on the ports after the main process
+        metrics_task = asyncio.create_task(
+            metrics.serve(port=metrics.METRICS_PORT + 1 + index)
+        )
+
+    try:
+        if warmup.WARMUP_ENABLED:
+            # Updates are routed by user, so accounts are opened by the worker they land on
+            await warmup.warm_up(accounts.registry, max_accounts=0)
+        logger.info(f"Worker {index} started")
+        async with background_tasks(bot):
+            try:
+                await workers.consume(queue, partial(dp.feed_raw_update, bot))
+            finally:
+                if metrics.registry.enabled:
+                    metrics_task.cancel()
+                    await asyncio.gather(metrics_task, return_exceptions=True)
+                await fsm_storage.close()
+                await bot.session.close()
+    finally:
+        # Stop the user data streams and release the pooled Binance connections,
+        # once every task using them has stopped
+        await accounts.registry.close()
+
+
+def run_worker(index: int, queue: multiprocessing.Queue, storage_path: str) -> None:
+    """Entry point of a dispatcher worker process."""
+    bot_logger.setup_logger()
+    asyncio.run(run_dispatcher(index, queue, storage_path))
+
+
+async def serve_webhook(
+    bot: Bot, allowed_updates: List[str], handle: Callable[[Dict[str, Any]], Awaitable[Any]]
+) -> None:
+    """Receive updates on the webhook server and handle them through a bounded pipeline."""
+    if webhook.WEBHOOK_URL:
+        await bot.set_webhook(
+            f"{webhook.WEBHOOK_URL.rstrip('/')}{webhook.WEBHOOK_PATH}",
+            secret_token=webhook.WEBHOOK_SECRET,
+            allowed_updates=allowed_updates,
+        )
+    pipeline = webhook.UpdatePipeline(handle)
+    metrics.registry.collect("bot_webhook", pipeline.stats)
+    await webhook.serve(pipeline)
+
+
+async def serve_workers() -> None:
+    storage_path = storage.STORAGE_PATH or DEFAULT_WORKER_STORAGE_PATH
+    bot = create_bot()
+    # Only used to find the update types the handlers need
+    allowed_updates = create_dispatcher(MemoryStorage()).resolve_used_update_types()
+
+    running = workers.start(BOT_WORKERS, run_worker, storage_path)
+    logger.info(f"Started {BOT_WORKERS} workers sharing {storage_path}")
+
+    async def forward(update: Dict[str, Any]) -> None:
+        workers.dispatch(running, update)
+
+    try:
+        if BOT_MODE == "webhook":
+            await serve_webhook(bot, allowed_updates, forward)
+        else:
+            await workers.poll(bot, running, allowed_updates)
+    finally:
+        await asyncio.to_thread(workers.stop, running)
+        await bot.session.close()
+
+
+async def main() -> None:
+    # Set up logging
+    bot_logger.setup_logger()
+    logger.info("Starting bot...")
+
+    if metrics.registry.enabled:
+        collect_metrics()
+        metrics_task = asyncio.create_task(metrics.serve())
+    # Sampled from this process only, workers just read the history files
+    if HISTORY_ENABLED:
+        sampler_task = asyncio.create_task(history.HistorySampler(accounts.registry).run())
+    try:
+        if BOT_WORKERS > 1:
+            await serve_workers()
+        else:
+            await serve_dispatcher()
+    finally:
+        if HISTORY_ENABLED:
+            sampler_task.cancel()
+            await asyncio.gather(sampler_task, return_exceptions=True)
+        if metrics.registry.enabled:
+            metrics_task.cancel()
+            await asyncio.gather(metrics_task, return_exceptions=True)
+        # Closed here rather than with the background tasks, the sampler uses it too
+        await accounts.registry.close()
+
+
+async def serve_dispatcher() -> None:
+    fsm_storage = storage.create_storage()
+    share_caches(fsm_storage)
+    dp = create_dispatcher(fsm_storage)
+    bot = create_bot()
+
+    if warmup.WARMUP_ENABLED:
+        await warmup.warm_up(accounts.registry)
+    logger.info(f"Bot initialized, starting {BOT_MODE}...")
+    async with background_tasks(bot):
+        try:
+            if BOT_MODE == "webhook":
+                await serve_webhook(
+                    bot, dp.resolve_used_update_types(), partial(dp.feed_raw_update, bot)
+                )
+            else:
+                await dp.start_polling(bot)
+        finally:
+            await fsm_storage.close()
+            await bot.session.close()
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(main())
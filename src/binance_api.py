@@ -1,71 +1,454 @@
-from typing import List
-import datetime as dt
+from typing import List, Dict, Optional, Any
+from decimal import Decimal
+from functools import partial
+import hashlib
+import hmac
+import json
+import logging
+import time
+from urllib.parse import urlencode
 
-from binance.spot import Spot
-from dotenv import load_dotenv
+import aiohttp
 from os import getenv
 
-from models import UserAsset, Ticker24hrData
+from models import LazyUserAsset, LazyTicker24hrData
+from market_cache import MarketDataCache
+from clock import ServerClock
+from scheduler import Priority, RateBucket, RequestScheduler, RequestShed
+import metrics
 import utils
 
-load_dotenv()
 API_KEY = getenv("BINANCE_TOKEN")
 API_SECRET = getenv("BINANCE_SECRET")
+BASE_URL = getenv("BINANCE_BASE_URL", "https://api.binance.com")
+
+# Connection pool settings for the shared keep-alive session
+POOL_SIZE = int(getenv("BINANCE_POOL_SIZE", "20"))
+KEEPALIVE_TIMEOUT = float(getenv("BINANCE_KEEPALIVE_TIMEOUT", "60"))
+REQUEST_TIMEOUT = float(getenv("BINANCE_REQUEST_TIMEOUT", "10"))
+
+# Process-wide 24hr ticker cache shared by every client instance
+TICKER_CACHE_TTL = float(getenv("TICKER_CACHE_TTL", "5"))
+TICKER_CACHE_SIZE = int(getenv("TICKER_CACHE_SIZE", "2048"))
+TICKER_CACHE = MarketDataCache(
+    ttl=TICKER_CACHE_TTL, maxsize=TICKER_CACHE_SIZE, namespace="ticker24hr"
+)
+
+# Server clock offset, shared by every client instance
+CLOCK_CALIBRATE_INTERVAL = float(getenv("CLOCK_CALIBRATE_INTERVAL", "300"))
+RECV_WINDOW = int(getenv("BINANCE_RECV_WINDOW", "5000"))
+SERVER_CLOCK = ServerClock(calibrate_interval=CLOCK_CALIBRATE_INTERVAL)
+
+# Error code returned when a signed request timestamp is outside recvWindow
+TIMESTAMP_OUTSIDE_RECV_WINDOW = -1021
+
+logger = logging.getLogger(__name__)
+
+# Rate limits, shared by every client instance since they are counted per IP
+REQUEST_WEIGHT_LIMIT = int(getenv("BINANCE_REQUEST_WEIGHT_LIMIT", "6000"))
+SAPI_WEIGHT_LIMIT = int(getenv("BINANCE_SAPI_WEIGHT_LIMIT", "12000"))
+# Order count limit per account, per 10 seconds
+ORDER_COUNT_LIMIT = int(getenv("BINANCE_ORDER_COUNT_LIMIT", "100"))
+# Share of each limit a priority may use before it is queued or shed
+USER_SHARE = float(getenv("SCHEDULER_USER_SHARE", "0.9"))
+BACKGROUND_SHARE = float(getenv("SCHEDULER_BACKGROUND_SHARE", "0.6"))
+# User reads that would wait longer than this are shed instead
+SCHEDULER_MAX_WAIT = float(getenv("SCHEDULER_MAX_WAIT", "2"))
+
+SCHEDULER = RequestScheduler(
+    buckets=[
+        RateBucket("weight", REQUEST_WEIGHT_LIMIT, 60, "X-MBX-USED-WEIGHT-1M"),
+        RateBucket("sapi", SAPI_WEIGHT_LIMIT, 60, "X-SAPI-USED-IP-WEIGHT-1M"),
+    ],
+    shares={
+        Priority.ORDER: 1.0,
+        Priority.USER: USER_SHARE,
+        Priority.BACKGROUND: BACKGROUND_SHARE,
+    },
+    max_wait=SCHEDULER_MAX_WAIT,
+)
+
+
+def ticker_weight(pairs: int) -> int:
+    """Request weight of ``/api/v3/ticker/24hr`` for a number of symbols."""
+    if pairs <= 20:
+        return 2
+    if pairs <= 100:
+        return 40
+    return 80
+
+
+def depth_weight(limit: int) -> int:
+    """Request weight of ``/api/v3/depth`` for a number of levels per side."""
+    if limit <= 100:
+        return 5
+    if limit <= 500:
+        return 25
+    if limit <= 1000:
+        return 50
+    return 250
+
+
+class BinanceAPIError(Exception):
+    """Error response returned by the Binance REST API."""
+
+    def __init__(self, status: int, code: Optional[int], message: str):
+        super().__init__(f"({status}) {code}: {message}")
+        self.status = status
+        self.code = code
+        self.message = message
 
 
 class BinanceClient:
-    def __init__(self):
-        self.client = Spot(api_key=API_KEY, api_secret=API_SECRET)
+    """Asyncio Binance Spot REST client on top of one pooled aiohttp session.
+
+    The session is created lazily on first use so the client can be
+    instantiated at import time, outside of a running event loop. If a
+    ``connector`` is given, the session borrows it instead of owning a pool,
+    so many clients can share the same keep-alive connections.
+    """
+
+    def __init__(
+        self,
+        api_key: Optional[str] = API_KEY,
+        api_secret: Optional[str] = API_SECRET,
+        base_url: str = BASE_URL,
+        ticker_cache: MarketDataCache = TICKER_CACHE,
+        clock: ServerClock = SERVER_CLOCK,
+        scheduler: RequestScheduler = SCHEDULER,
+        connector: Optional[aiohttp.BaseConnector] = None,
+    ):
+        self.api_key = api_key
+        self.api_secret = api_secret
+        self.base_url = base_url.rstrip("/")
+        self.ticker_cache = ticker_cache
+        self.clock = clock
+        self.scheduler = scheduler
+        self.order_bucket = RateBucket(
+            "orders", ORDER_COUNT_LIMIT, 10, "X-MBX-ORDER-COUNT-10S"
+        )
+        self.connector = connector
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            # A shared connector pools keep-alive connections across clients
+            connector = self.connector or aiohttp.TCPConnector(
+                limit=POOL_SIZE,
+                keepalive_timeout=KEEPALIVE_TIMEOUT,
+                ttl_dns_cache=300,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                connector_owner=self.connector is None,
+                timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT),
+            )
+        return self._session
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    def _sign(self, query: str) -> str:
+        return hmac.new(
+            self.api_secret.encode(), query.encode(), hashlib.sha256
+        ).hexdigest()
+
+    @metrics.instrument_request
+    async def _request(
+        self,
+        method: str,
+        path: str,
+        params: Optional[Dict[str, Any]] = None,
+        signed: bool = False,
+        weight: int = 1,
+        priority: Priority = Priority.USER,
+    ) -> Any:
+        """Send a request through the scheduler and return the decoded JSON body.
+
+        :param method: HTTP method
+        :param path: Endpoint path, e.g. ``/api/v3/time``
+        :param params: Query parameters, ``None`` values are dropped
+        :param signed: Whether the request needs a timestamp and HMAC signature
+        :param weight: Request weight Binance charges for the call
+        :param priority: Scheduling priority of the call
+        :return: Decoded JSON response
+        :raises BinanceAPIError: If Binance responds with an error status
+        :raises RequestShed: If the scheduler dropped the request
+        """
+        params = {
+            # Binance rejects scientific notation, which str(Decimal) may produce
+            k: format(v, "f") if isinstance(v, Decimal) else v
+            for k, v in (params or {}).items()
+            if v is not None
+        }
+        bucket = self.scheduler.buckets["sapi" if path.startswith("/sapi") else "weight"]
+        costs = [(bucket, weight)]
+        if priority == Priority.ORDER:
+            costs.append((self.order_bucket, 1))
+
+        if not signed:
+            return await self._send(method, path, params, costs, priority)
+
+        await self.clock.ensure_calibrated(self._fetch_server_time)
+        try:
+            return await self._send(method, path, params, costs, priority, signed=True)
+        except BinanceAPIError as e:
+            if e.code != TIMESTAMP_OUTSIDE_RECV_WINDOW:
+                raise
+            # Our offset drifted, recalibrate and retry once
+            await self.clock.calibrate(self._fetch_server_time)
+            return await self._send(method, path, params, costs, priority, signed=True)
+
+    def _signed_query(self, params: Dict[str, Any]) -> str:
+        query = urlencode(
+            {**params, "recvWindow": RECV_WINDOW, "timestamp": self.clock.now_ms()}
+        )
+        return f"{query}&signature={self._sign(query)}"
 
-    def create_sell_limit_order(
+    async def _send(
+        self,
+        method: str,
+        path: str,
+        params: Dict[str, Any],
+        costs: List,
+        priority: Priority,
+        signed: bool = False,
+    ) -> Any:
+        await self.scheduler.acquire(costs, priority)
+        # Signed only once admitted, a request may wait in the scheduler longer than recvWindow
+        query = self._signed_query(params) if signed else urlencode(params)
+
+        headers = {"X-MBX-APIKEY": self.api_key} if self.api_key else {}
+        url = f"{self.base_url}{path}"
+        if query:
+            url += f"?{query}"
+
+        started = time.perf_counter()
+        async with self.session.request(method, url, headers=headers) as response:
+            self.scheduler.observe(response.headers, [bucket for bucket, _ in costs])
+            if response.status in (429, 418):
+                self.scheduler.backoff(response.headers.get("Retry-After"))
+            data = await response.json(content_type=None)
+            if logger.isEnabledFor(logging.DEBUG):
+                # Carries the trace id of the update that made the call
+                logger.debug("Binance request", extra={
+                    "method": method,
+                    "path": path,
+                    "status": response.status,
+                    "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+                })
+            if response.status >= 400:
+                code, message = None, str(data)
+                if isinstance(data, dict):
+                    code, message = data.get("code"), data.get("msg", message)
+                raise BinanceAPIError(response.status, code, message)
+            return data
+
+    async def create_sell_limit_order(
         self,
         symbol: str,
-        quantity: float,
-        trigger_price: float,
+        quantity: float | Decimal,
+        trigger_price: float | Decimal,
         time_in_force: str = "GTC",
     ):
-        return self.client.new_order(
-            symbol=symbol,
-            side="SELL",
-            type="LIMIT",
-            quantity=quantity,
-            price=trigger_price,
-            timeInForce=time_in_force,
-            newOrderRespType="RESULT"
+        return await self._request(
+            "POST",
+            "/api/v3/order",
+            {
+                "symbol": symbol,
+                "side": "SELL",
+                "type": "LIMIT",
+                "quantity": quantity,
+                "price": trigger_price,
+                "timeInForce": time_in_force,
+                "newOrderRespType": "RESULT",
+            },
+            signed=True,
+            priority=Priority.ORDER,
         )
 
-    def create_sell_market_order(
+    async def create_sell_market_order(
         self,
         symbol: str,
-        quantity: float,
+        quantity: float | Decimal,
     ):
-        return self.client.new_order(
-            symbol=symbol,
-            side="SELL",
-            type="MARKET",
-            quantity=quantity,
-            newOrderRespType="RESULT"
+        return await self._request(
+            "POST",
+            "/api/v3/order",
+            {
+                "symbol": symbol,
+                "side": "SELL",
+                "type": "MARKET",
+                "quantity": quantity,
+                "newOrderRespType": "RESULT",
+            },
+            signed=True,
+            priority=Priority.ORDER,
         )
 
+    async def get_user_asset(self, symbol: str) -> LazyUserAsset:
+        single_asset_json = (
+            await self._request(
+                "POST",
+                "/sapi/v3/asset/getUserAsset",
+                {"asset": symbol},
+                signed=True,
+                weight=5,
+            )
+        )[0]
+        return LazyUserAsset.from_json(single_asset_json)
+
+    async def get_user_assets(self, priority: Priority = Priority.USER) -> List[LazyUserAsset]:
+        wallet_json = await self._request(
+            "POST", "/sapi/v3/asset/getUserAsset", signed=True, weight=5, priority=priority
+        )
+        return [LazyUserAsset.from_json(x) for x in wallet_json]
 
-    def get_user_asset(self, symbol: str) -> UserAsset:
-        single_asset_json = self.client.user_asset(asset=symbol)[0]
-        return UserAsset(**single_asset_json)
+    async def get_24hr_price_data_single(self, pair: str) -> LazyTicker24hrData:
+        return (await self.get_24hr_price_data(pair))[pair]
 
-    def get_user_assets(self) -> List[UserAsset]:
-        wallet_json = self.client.user_asset()
-        return [UserAsset(**x) for x in wallet_json]
+    async def get_24hr_price_data(
+        self, pairs: List[str] | str, priority: Priority = Priority.USER
+    ) -> Dict[str, LazyTicker24hrData]:
+        """Get 24hr ticker data per pair, served from the shared ticker cache.
 
-    def get_24hr_price_data_single(self, pair: str) -> Ticker24hrData:
-        price_data_json = self.client.ticker_24hr(symbol=pair)
-        return Ticker24hrData(**price_data_json)
+        If the scheduler sheds the request because the weight budget is low,
+        expired cache entries are served instead.
 
-    def get_24hr_price_data(self, pairs: List[str] | str) -> List[Ticker24hrData]:
+        :param pairs: Trading pair or list of trading pairs
+        :param priority: Scheduling priority for cache misses
+        :return: Mapping of pair to its 24hr ticker data
+        """
         if isinstance(pairs, str):
             pairs = [pairs]
-        price_data_json = self.client.ticker_24hr(symbols=pairs)
-        return {x["symbol"]: Ticker24hrData(**x) for x in price_data_json}
+        try:
+            return await self.ticker_cache.get_many(
+                pairs, partial(self._fetch_24hr_price_data, priority=priority)
+            )
+        except RequestShed:
+            stale = {pair: self.ticker_cache.get_stale(pair) for pair in pairs}
+            if any(value is None for value in stale.values()):
+                raise
+            return stale
+
+    async def _fetch_24hr_price_data(
+        self, pairs: List[str], priority: Priority = Priority.USER
+    ) -> Dict[str, LazyTicker24hrData]:
+        if not pairs:
+            return {}
+        weight = ticker_weight(len(pairs))
+        if len(pairs) == 1:
+            price_data_json = [
+                await self._request(
+                    "GET",
+                    "/api/v3/ticker/24hr",
+                    {"symbol": pairs[0]},
+                    weight=weight,
+                    priority=priority,
+                )
+            ]
+        else:
+            price_data_json = await self._request(
+                "GET",
+                "/api/v3/ticker/24hr",
+                {"symbols": json.dumps(pairs, separators=(",", ":"))},
+                weight=weight,
+                priority=priority,
+            )
+        return {x["symbol"]: LazyTicker24hrData.from_json(x) for x in price_data_json}
+
+    def cache_stats(self) -> Dict[str, float]:
+        """Hit/miss counters of the ticker cache, for tuning ``TICKER_CACHE_TTL``."""
+        return self.ticker_cache.stats()
+
+    def scheduler_stats(self) -> Dict[str, float]:
+        """Admission counters and remaining budget of the request scheduler."""
+        return self.scheduler.stats()
+
+    async def get_klines(
+        self,
+        symbol: str,
+        interval: str,
+        start_time: Optional[int] = None,
+        limit: int = 500,
+        priority: Priority = Priority.USER,
+    ) -> List[List[Any]]:
+        """Get candles for a pair, oldest first.
+
+        :param symbol: Trading pair
+        :param interval: Candle interval, e.g. ``1h``
+        :param start_time: Open time in ms of the first candle, latest candles if None
+        :param limit: Max candles to return, up to 1000
+        :param priority: Scheduling priority of the call
+        :return: Raw kline rows
+        """
+        return await self._request(
+            "GET",
+            "/api/v3/klines",
+            {"symbol": symbol, "interval": interval, "startTime": start_time, "limit": limit},
+            weight=2,
+            priority=priority,
+        )
+
+    async def get_order_book(
+        self, symbol: str, limit: int = 100, priority: Priority = Priority.USER
+    ) -> Dict[str, Any]:
+        """Get a depth snapshot of a pair.
+
+        :param symbol: Trading pair
+        :param limit: Price levels per side, up to 5000
+        :param priority: Scheduling priority of the call
+        :return: ``lastUpdateId`` and ``bids``/``asks`` as ``[price, qty]`` strings, best first
+        """
+        return await self._request(
+            "GET",
+            "/api/v3/depth",
+            {"symbol": symbol, "limit": limit},
+            weight=depth_weight(limit),
+            priority=priority,
+        )
+
+    async def get_exchange_info(self, priority: Priority = Priority.USER) -> Dict:
+        """Get trading rules and symbol filters for every spot symbol."""
+        return await self._request(
+            "GET", "/api/v3/exchangeInfo", weight=20, priority=priority
+        )
+
+    async def create_listen_key(self) -> str:
+        """Open a user data stream and return its listenKey."""
+        return (
+            await self._request("POST", "/api/v3/userDataStream", weight=2)
+        )["listenKey"]
+
+    async def keepalive_listen_key(self, listen_key: str) -> None:
+        await self._request(
+            "PUT",
+            "/api/v3/userDataStream",
+            {"listenKey": listen_key},
+            weight=2,
+            priority=Priority.BACKGROUND,
+        )
+
+    async def close_listen_key(self, listen_key: str) -> None:
+        await self._request(
+            "DELETE", "/api/v3/userDataStream", {"listenKey": listen_key}, weight=2
+        )
+
+    async def ping(self) -> None:
+        """Test connectivity, which opens a pooled connection if none is idle."""
+        await self._request("GET", "/api/v3/ping", priority=Priority.BACKGROUND)
+
+    async def _fetch_server_time(self) -> int:
+        return (await self._request("GET", "/api/v3/time"))["serverTime"]
+
+    async def calibrate_clock(self) -> None:
+        """Measure the server clock offset now."""
+        await self.clock.calibrate(self._fetch_server_time)
 
-    def get_server_time(self):
-        ts = self.client.time()["serverTime"]
-        return utils.unix_to_datetime(ts, True)
+    async def get_server_time(self):
+        """Server time from the calibrated local clock, formatted for display."""
+        await self.clock.ensure_calibrated(self._fetch_server_time)
+        return utils.unix_to_datetime(self.clock.now_ms(), True)
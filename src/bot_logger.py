@@ -1,17 +1,188 @@
+import atexit
+import json
 import logging
+import queue
+import time
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from os import getenv
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
 
-def setup_logger():
-    formatter = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
-    )
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
 
+LOG_LEVEL = getenv("LOG_LEVEL", "INFO")
+# "json" for one JSON object per line, "text" for the plain format
+LOG_FORMAT = getenv("LOG_FORMAT", "json")
+# Records waiting for the writer thread; beyond this new records are dropped
+LOG_QUEUE_SIZE = int(getenv("LOG_QUEUE_SIZE", "10000"))
+# Records per second each logging call site may emit below ERROR, 0 logs everything
+LOG_SAMPLE_RATE = float(getenv("LOG_SAMPLE_RATE", "10"))
+LOG_SAMPLE_BURST = float(getenv("LOG_SAMPLE_BURST", "50"))
+
+# Set per Telegram update and inherited by everything awaited while handling it
+trace_id: ContextVar[Optional[str]] = ContextVar("trace_id", default=None)
+user_id: ContextVar[Optional[int]] = ContextVar("user_id", default=None)
+
+# Attributes every LogRecord has, anything else was passed through ``extra``
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+
+class RateLimitFilter(logging.Filter):
+    """Token bucket per logging call site, so a hot log line can't flood the output.
+
+    Records at ERROR and above always pass. When a call site is allowed
+    through again, its record carries the number of records dropped
+    meanwhile as ``suppressed``.
+    """
+
+    def __init__(self, rate: float = LOG_SAMPLE_RATE, burst: float = LOG_SAMPLE_BURST):
+        super().__init__()
+        self.rate = rate
+        self.burst = burst
+        # Per call site: tokens, last refill time, records dropped since the last one passed
+        self._buckets: Dict[Tuple[str, int], list] = {}
+        self.suppressed = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not self.rate or record.levelno >= logging.ERROR:
+            return True
+        key = (record.pathname, record.lineno)
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = [self.burst, now, 0]
+        bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+        bucket[1] = now
+        if bucket[0] < 1:
+            bucket[2] += 1
+            self.suppressed += 1
+            return False
+        bucket[0] -= 1
+        if bucket[2]:
+            record.suppressed = bucket[2]
+            bucket[2] = 0
+        return True
+
+
+class ContextQueueHandler(QueueHandler):
+    """Queue handler that never blocks the event loop.
+
+    The trace context is read here, on the logging thread, because the
+    writer thread doesn't share it. Records are dropped and counted when the
+    queue is full instead of waiting for the writer.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        record.trace_id = trace_id.get()
+        record.user_id = user_id.get()
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per record, with the trace context and ``extra`` fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and value is not None:
+                entry[key] = value
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__(
+            '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+            datefmt='%Y-%m-%d %H:%M:%S'
+        )
+
+    def format(self, record: logging.LogRecord) -> str:
+        text = super().format(record)
+        trace = getattr(record, "trace_id", None)
+        return f"{text} [trace={trace}]" if trace else text
+
+
+class TraceMiddleware(BaseMiddleware):
+    """Give every update a trace id, logged with each record written while handling it."""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        user = data.get("event_from_user")
+        trace_token = trace_id.set(
+            f"u{event.update_id}" if isinstance(event, Update) else None
+        )
+        user_token = user_id.set(user.id if user is not None else None)
+        try:
+            return await handler(event, data)
+        finally:
+            trace_id.reset(trace_token)
+            user_id.reset(user_token)
+
+
+_queue_handler: Optional[ContextQueueHandler] = None
+_rate_limit: Optional[RateLimitFilter] = None
+
+
+def stats() -> Dict[str, int]:
+    if _queue_handler is None:
+        return {}
+    return {
+        "queued": _queue_handler.queue.qsize(),
+        "dropped": _queue_handler.dropped,
+        "suppressed": _rate_limit.suppressed,
+    }
+
+
+def setup_logger() -> QueueListener:
+    """Route every record through a queue to a writer thread.
+
+    :return: The running listener, stopped at exit
+    """
+    global _queue_handler, _rate_limit
+    formatter = JSONFormatter() if LOG_FORMAT == "json" else TextFormatter()
     console_handler = logging.StreamHandler()
     console_handler.setFormatter(formatter)
 
+    log_queue: queue.Queue = queue.Queue(LOG_QUEUE_SIZE)
+    _queue_handler = ContextQueueHandler(log_queue)
+    _rate_limit = RateLimitFilter()
+    _queue_handler.addFilter(_rate_limit)
+
     root_logger = logging.getLogger()
-    root_logger.setLevel(logging.INFO)
+    root_logger.setLevel(LOG_LEVEL)
     root_logger.handlers = []
-    
-    # Add the handlers
-    root_logger.addHandler(console_handler)
\ No newline at end of file
+    root_logger.addHandler(_queue_handler)
+
+    listener = QueueListener(log_queue, console_handler, respect_handler_level=True)
+    listener.start()
+    # Flush what is still queued on shutdown
+    atexit.register(listener.stop)
+    return listener
@@ -0,0 +1,63 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, Optional
+
+
+class ServerClock:
+    """Local estimate of the Binance server clock.
+
+    The offset to the local clock is measured against ``/api/v3/time``,
+    assuming the server stamped its response halfway through the round trip,
+    and is recalibrated once it is older than ``calibrate_interval`` seconds.
+    """
+
+    def __init__(self, calibrate_interval: float):
+        self.calibrate_interval = calibrate_interval
+        self.offset_ms = 0.0
+        self.round_trip_ms: Optional[float] = None
+        self.calibrated_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def needs_calibration(self) -> bool:
+        return (
+            self.calibrated_at is None
+            or time.monotonic() - self.calibrated_at > self.calibrate_interval
+        )
+
+    def now_ms(self) -> int:
+        """Current server time in milliseconds, without a round trip."""
+        return int(time.time() * 1000 + self.offset_ms)
+
+    def update(self, server_time_ms: int, sent_at: float, received_at: float) -> None:
+        """Record one server time measurement.
+
+        :param server_time_ms: Server time reported by Binance, in milliseconds
+        :param sent_at: Local wall clock time the request was sent, in seconds
+        :param received_at: Local wall clock time the response arrived, in seconds
+        """
+        midpoint_ms = (sent_at + received_at) * 500
+        self.offset_ms = server_time_ms - midpoint_ms
+        self.round_trip_ms = (received_at - sent_at) * 1000
+        self.calibrated_at = time.monotonic()
+
+    async def calibrate(self, fetch_server_time: Callable[[], Awaitable[int]]) -> None:
+        """Measure the offset now.
+
+        :param fetch_server_time: Coroutine returning the server time in milliseconds
+        """
+        async with self._lock:
+            await self._measure(fetch_server_time)
+
+    async def ensure_calibrated(self, fetch_server_time: Callable[[], Awaitable[int]]) -> None:
+        """Calibrate if the offset is missing or expired; concurrent callers share one request."""
+        if not self.needs_calibration:
+            return
+        async with self._lock:
+            if self.needs_calibration:
+                await self._measure(fetch_server_time)
+
+    async def _measure(self, fetch_server_time: Callable[[], Awaitable[int]]) -> None:
+        sent_at = time.time()
+        server_time_ms = await fetch_server_time()
+        self.update(server_time_ms, sent_at, time.time())
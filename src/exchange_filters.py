@@ -0,0 +1,176 @@
+import asyncio
+import logging
+import time
+from decimal import Decimal, ROUND_DOWN
+from os import getenv
+from typing import Dict, Optional
+
+from binance_api import BinanceClient
+from scheduler import Priority
+
+REFRESH_INTERVAL = float(getenv("EXCHANGE_INFO_REFRESH_INTERVAL", "3600"))
+# Seconds orders go unvalidated after the index failed to load, before it is tried again
+RETRY_DELAY = float(getenv("EXCHANGE_INFO_RETRY_DELAY", "30"))
+
+logger = logging.getLogger(__name__)
+
+ZERO = Decimal("0")
+
+
+def format_decimal(value: Decimal) -> str:
+    """Plain fixed-point string for a decimal, as Binance expects it."""
+    return format(value.normalize(), "f")
+
+
+def _floor_to_step(value: Decimal, step: Decimal) -> Decimal:
+    if not step:
+        return value
+    return (value / step).to_integral_value(rounding=ROUND_DOWN) * step
+
+
+class SymbolFilters:
+    """LOT_SIZE, PRICE_FILTER and NOTIONAL rules for one trading pair."""
+
+    __slots__ = (
+        "symbol", "step_size", "min_qty", "max_qty", "market_step_size",
+        "market_min_qty", "market_max_qty", "tick_size", "min_price", "max_price",
+        "min_notional", "apply_min_to_market",
+    )
+
+    def __init__(self, symbol: str, filters: list):
+        self.symbol = symbol
+        self.step_size = self.market_step_size = ZERO
+        self.min_qty = self.market_min_qty = ZERO
+        self.max_qty = self.market_max_qty = ZERO
+        self.tick_size = self.min_price = self.max_price = ZERO
+        self.min_notional = ZERO
+        self.apply_min_to_market = True
+
+        for f in filters:
+            match f["filterType"]:
+                case "LOT_SIZE":
+                    self.step_size = Decimal(f["stepSize"])
+                    self.min_qty = Decimal(f["minQty"])
+                    self.max_qty = Decimal(f["maxQty"])
+                case "MARKET_LOT_SIZE":
+                    self.market_step_size = Decimal(f["stepSize"])
+                    self.market_min_qty = Decimal(f["minQty"])
+                    self.market_max_qty = Decimal(f["maxQty"])
+                case "PRICE_FILTER":
+                    self.tick_size = Decimal(f["tickSize"])
+                    self.min_price = Decimal(f["minPrice"])
+                    self.max_price = Decimal(f["maxPrice"])
+                case "NOTIONAL":
+                    self.min_notional = Decimal(f["minNotional"])
+                    self.apply_min_to_market = f.get("applyMinToMarket", True)
+                case "MIN_NOTIONAL":
+                    self.min_notional = Decimal(f["minNotional"])
+                    self.apply_min_to_market = f.get("applyToMarket", True)
+
+    def quantize_qty(self, qty: Decimal, market: bool = False) -> Decimal:
+        """Round quantity down to the lot step size."""
+        qty = _floor_to_step(qty, self.step_size)
+        if market and self.market_step_size:
+            qty = _floor_to_step(qty, self.market_step_size)
+        return qty
+
+    def quantize_price(self, price: Decimal) -> Decimal:
+        """Round price down to the tick size."""
+        return _floor_to_step(price, self.tick_size)
+
+    def validate(
+        self, qty: Decimal, price: Optional[Decimal] = None, market: bool = False
+    ) -> Optional[str]:
+        """Check an already quantized order against the symbol filters.
+
+        :param qty: Order quantity
+        :param price: Limit price, or the current price for market orders;
+            price and notional checks are skipped while it is unknown
+        :param market: Whether this is a market order
+        :return: Human readable reason the order would be rejected, or None
+        """
+        min_qty, max_qty = self.min_qty, self.max_qty
+        if market and self.market_step_size:
+            min_qty = max(min_qty, self.market_min_qty)
+            if self.market_max_qty:
+                max_qty = min(max_qty, self.market_max_qty) if max_qty else self.market_max_qty
+
+        if qty <= 0 or qty < min_qty:
+            return f"Amount is below the minimum of {format_decimal(min_qty)}"
+        if max_qty and qty > max_qty:
+            return f"Amount is above the maximum of {format_decimal(max_qty)}"
+        if price is None:
+            return None
+        if not market:
+            if price < self.min_price:
+                return f"Price is below the minimum of {format_decimal(self.min_price)}"
+            if self.max_price and price > self.max_price:
+                return f"Price is above the maximum of {format_decimal(self.max_price)}"
+        if (not market or self.apply_min_to_market) and qty * price < self.min_notional:
+            return f"Order value is below the minimum of ${format_decimal(self.min_notional)}"
+        return None
+
+
+class FilterIndex:
+    """In-memory index of symbol filters, built from ``exchangeInfo``."""
+
+    def __init__(
+        self, refresh_interval: float = REFRESH_INTERVAL, retry_delay: float = RETRY_DELAY
+    ):
+        self.refresh_interval = refresh_interval
+        self.retry_delay = retry_delay
+        self.symbols: Dict[str, SymbolFilters] = {}
+        self.loaded_at: Optional[float] = None
+        self.failed_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+
+    def _should_load(self) -> bool:
+        return self.loaded_at is None and (
+            self.failed_at is None or time.monotonic() - self.failed_at >= self.retry_delay
+        )
+
+    async def refresh(self, client: BinanceClient, priority: Priority = Priority.USER) -> None:
+        info = await client.get_exchange_info(priority=priority)
+        self.symbols = {
+            s["symbol"]: SymbolFilters(s["symbol"], s["filters"]) for s in info["symbols"]
+        }
+        self.loaded_at = time.monotonic()
+
+    async def get(self, client: BinanceClient, symbol: str) -> Optional[SymbolFilters]:
+        """Filters for symbol, loading the index first if it is empty.
+
+        :return: Filters, or None if the symbol is unknown or the index couldn't be loaded
+        """
+        if self._should_load():
+            async with self._lock:
+                if self._should_load():
+                    try:
+                        await self.refresh(client)
+                    except asyncio.CancelledError:
+                        raise
+                    except Exception as e:
+                        # Callers go ahead unvalidated rather than fail the order
+                        self.failed_at = time.monotonic()
+                        logger.warning(f"Exchange info unavailable, orders are not validated: {e}")
+        return self.symbols.get(symbol)
+
+    async def run(self, client: BinanceClient) -> None:
+        """Refresh the index in the background every ``refresh_interval`` seconds."""
+        while True:
+            if self.loaded_at is not None:
+                # Loaded already, e.g. by the startup warm-up
+                due = self.loaded_at + self.refresh_interval - time.monotonic()
+                if due > 0:
+                    await asyncio.sleep(due)
+                    continue
+            try:
+                await self.refresh(client, priority=Priority.BACKGROUND)
+                logger.info(f"Exchange filters loaded for {len(self.symbols)} symbols")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Exchange info refresh failed: {e}")
+                await asyncio.sleep(self.refresh_interval)
+
+
+index = FilterIndex()
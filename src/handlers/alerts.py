@@ -0,0 +1,139 @@
+from decimal import Decimal
+from html import escape
+from typing import Optional
+import asyncio
+import logging
+
+import aiohttp
+
+from aiogram import Router
+from aiogram.filters import Command, CommandObject
+from aiogram.types import Message
+
+from accounts import Account
+from alerts import engine
+from binance_api import BinanceAPIError
+from exchange_filters import format_decimal
+from scheduler import RequestShed
+import market_stream
+import utils
+
+logger = logging.getLogger(__name__)
+
+alerts_router = Router()
+
+USDT = "USDT"
+USAGE = (
+    "Usage:\n"
+    "/alert SYMBOL PRICE - notify when SYMBOL crosses PRICE, e.g. /alert BTC 70000\n"
+    "/alert list - show your alerts\n"
+    "/alert del ID - delete an alert\n"
+    "/alert clear - delete all your alerts"
+)
+
+
+async def get_current_price(account: Account, pair: str) -> Decimal:
+    """Last price of a pair, from the market stream when it has one.
+
+    :param account: Caller's Binance account
+    :param pair: Trading pair
+    :return: Last traded price
+    :raises BinanceAPIError: If the pair does not exist
+    """
+    book = market_stream.book
+    entry = book.entries.get(pair)
+    if entry is not None and book.is_live() and entry.ticker_at >= book.connected_at:
+        return entry.last_price
+    return (await account.client.get_24hr_price_data(pair))[pair].last_price
+
+
+async def add_alert(message: Message, account: Account, symbol: str, price_text: str) -> None:
+    if not market_stream.MARKET_STREAM_ENABLED:
+        # Alerts are only matched against streamed prices
+        await message.answer("Price alerts are unavailable, the market stream is turned off.")
+        return
+    symbol = symbol.upper()
+    if symbol == USDT:
+        await message.answer(
+            f"Alerts are set on coins quoted in {USDT}, e.g. /alert BTC 70000"
+        )
+        return
+    pair = symbol if symbol.endswith(USDT) else utils.pair_ticker(symbol, USDT)
+    try:
+        price = Decimal(price_text)
+        if not price.is_finite() or price <= 0:
+            raise ValueError
+    except (ValueError, ArithmeticError):
+        await message.answer("Invalid price. Please enter a valid number.")
+        return
+
+    try:
+        current = await get_current_price(account, pair)
+    except BinanceAPIError as e:
+        logger.info(e)
+        await message.answer(f"Unknown symbol {escape(symbol)}.")
+        return
+    except (RequestShed, aiohttp.ClientError, asyncio.TimeoutError) as e:
+        logger.warning(f"Price of {pair} unavailable for a new alert: {e}")
+        await message.answer(
+            f"Couldn't get the price of {escape(symbol)} right now, please try again later."
+        )
+        return
+
+    alert = engine.add(message.from_user.id, message.chat.id, pair, price, current)
+    if alert is None:
+        await message.answer(
+            f"You already have {engine.max_per_user} alerts. Delete some with /alert del ID."
+        )
+        return
+    direction = "rises above" if alert.above else "falls below"
+    await message.answer(
+        f"🔔 Alert #{alert.id} set: {pair} {direction} ${format_decimal(price)}\n"
+        f"Current price: ${format_decimal(current)}"
+    )
+
+
+async def list_alerts(message: Message) -> None:
+    user_alerts = engine.user_alerts(message.from_user.id)
+    if not user_alerts:
+        await message.answer("You have no price alerts.\n\n" + USAGE)
+        return
+    lines = [
+        f"<code>#{alert.id:<5}</code> {alert.symbol} {'≥' if alert.above else '≤'} "
+        f"${format_decimal(alert.price)}"
+        for alert in user_alerts
+    ]
+    await message.answer("<b>🔔 Price Alerts</b>\n\n" + "\n".join(lines), parse_mode="HTML")
+
+
+@alerts_router.message(Command("alert"))
+async def command_alert(
+    message: Message, account: Account, command: Optional[CommandObject] = None
+) -> None:
+    """Manage price alerts.
+
+    Usage: ``/alert SYMBOL PRICE``, ``/alert list``, ``/alert del ID`` or ``/alert clear``.
+    Alerts fire once, when the streamed price crosses the threshold.
+
+    :param message: Incoming message from user
+    :param account: Caller's Binance account
+    :param command: Parsed command arguments
+    :return: None
+    """
+    args = (command.args or "").split() if command else []
+    action = args[0].lower() if args else "list"
+
+    if action == "list" and len(args) <= 1:
+        await list_alerts(message)
+    elif action == "del" and len(args) == 2:
+        alert_id = args[1].lstrip("#")
+        if alert_id.isdigit() and engine.remove(message.from_user.id, int(alert_id)):
+            await message.answer(f"Alert #{alert_id} deleted.")
+        else:
+            await message.answer(f"No alert #{alert_id}.")
+    elif action == "clear" and len(args) == 1:
+        await message.answer(f"Deleted {engine.clear(message.from_user.id)} alerts.")
+    elif len(args) == 2:
+        await add_alert(message, account, args[0], args[1])
+    else:
+        await message.answer(USAGE)
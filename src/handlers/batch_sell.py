@@ -0,0 +1,254 @@
+import asyncio
+from decimal import Decimal
+from html import escape
+from os import getenv
+from typing import Dict, List, Optional
+import logging
+
+from aiogram import Router, F
+from aiogram.types import InlineKeyboardButton, CallbackQuery
+from aiogram.utils.keyboard import InlineKeyboardBuilder
+from aiogram.fsm.context import FSMContext
+
+from handlers import sell, wallet
+from accounts import Account
+from exchange_filters import format_decimal
+from intents import OrderIntent, intents
+from binance_api import BinanceClient
+import exchange_filters
+import utils
+
+logger = logging.getLogger(__name__)
+
+batch_sell_router = Router()
+
+USDT = sell.USDT
+# Max market orders in flight at once; the scheduler enforces the order rate limit
+BATCH_CONCURRENCY = int(getenv("BATCH_SELL_CONCURRENCY", "5"))
+
+
+def batch_keyboard(symbols: List[str], selected: List[str]):
+    """Build the asset toggle keyboard for batch selection.
+
+    :param symbols: Sellable asset symbols
+    :param selected: Currently selected symbols
+    :return: Inline keyboard markup
+    """
+    builder = InlineKeyboardBuilder()
+    for symbol in symbols:
+        mark = "✅ " if symbol in selected else ""
+        builder.add(
+            InlineKeyboardButton(text=f"{mark}{symbol}", callback_data=f"batch_toggle_{symbol}")
+        )
+    builder.adjust(3)
+    builder.row(
+        InlineKeyboardButton(text=f"Review ({len(selected)})", callback_data="batch_review"),
+        InlineKeyboardButton(text="⬅️ Back", callback_data="back_to_start"),
+    )
+    return builder.as_markup()
+
+
+@batch_sell_router.callback_query(F.data == "batch_select")
+async def show_batch_selection(callback: CallbackQuery, state: FSMContext) -> None:
+    """Show sellable assets as toggles for a batch market sell.
+
+    :param callback: Callback query from the batch sell button
+    :param state: FSM context holding the sell snapshots
+    :return: None
+    """
+    symbols = list((await state.get_data()).get("snapshots", {}))
+    await state.update_data(batch_selected=[])
+
+    await callback.message.edit_text(
+        text="<b>Select assets to sell at market:</b>",
+        reply_markup=batch_keyboard(symbols, []),
+        parse_mode="HTML",
+    )
+    await callback.answer()
+
+
+@batch_sell_router.callback_query(F.data.startswith("batch_toggle_"))
+async def toggle_batch_asset(callback: CallbackQuery, state: FSMContext) -> None:
+    """Add or remove one asset from the batch selection.
+
+    :param callback: Callback query from an asset toggle
+    :param state: FSM context holding the selection
+    :return: None
+    """
+    symbol = callback.data.replace("batch_toggle_", "")
+    data = await state.get_data()
+    selected = data.get("batch_selected", [])
+    selected = [s for s in selected if s != symbol] if symbol in selected else [*selected, symbol]
+    await state.update_data(batch_selected=selected)
+
+    await callback.message.edit_reply_markup(
+        reply_markup=batch_keyboard(list(data.get("snapshots", {})), selected)
+    )
+    await callback.answer()
+
+
+@batch_sell_router.callback_query(F.data == "batch_review")
+async def review_batch(callback: CallbackQuery, state: FSMContext, account: Account) -> None:
+    """Preview the selected batch with quantized quantities.
+
+    :param callback: Callback query from the review button
+    :param state: FSM context holding the selection
+    :param account: Caller's Binance account
+    :return: None
+    """
+    selected = (await state.get_data()).get("batch_selected", [])
+    if not selected:
+        await callback.answer("Select at least one asset.")
+        return
+    await show_batch_preview(callback, state, account, selected)
+
+
+@batch_sell_router.callback_query(F.data == "batch_all")
+async def review_sell_all(callback: CallbackQuery, state: FSMContext, account: Account) -> None:
+    """Preview selling every asset worth at least $1 except USDT.
+
+    :param callback: Callback query from the preset button
+    :param state: FSM context for state management
+    :param account: Caller's Binance account
+    :return: None
+    """
+    await show_batch_preview(callback, state, account, None)
+
+
+async def show_batch_preview(
+    callback: CallbackQuery,
+    state: FSMContext,
+    account: Account,
+    symbols: Optional[List[str]],
+) -> None:
+    """Plan one market order per asset on fresh balances and ask for confirmation.
+
+    Each asset's full free balance is floored to its lot size; assets whose
+    order would be rejected by the exchange filters are listed as skipped.
+
+    :param callback: Callback query to answer
+    :param state: FSM context for state management
+    :param account: Caller's Binance account
+    :param symbols: Assets to sell, or None for every sellable asset
+    :return: None
+    """
+    portfolio = await wallet.build_portfolio(account)
+    assets = [
+        portfolio.item(i)
+        for i in portfolio.visible_order()
+        if portfolio.symbols[i] != USDT
+        and (symbols is None or portfolio.symbols[i] in symbols)
+    ]
+
+    orders: List[OrderIntent] = []
+    lines = []
+    total = Decimal("0")
+    for asset in assets:
+        amount = asset.free
+        filters = await exchange_filters.index.get(account.client, utils.pair_ticker(asset.symbol, USDT))
+        if filters is not None:
+            amount = filters.quantize_qty(amount, market=True)
+            error = filters.validate(amount, asset.last_price_usdt, market=True)
+            if error:
+                lines.append(f"⚪️ {asset.symbol}: skipped, {error[0].lower()}{error[1:]}")
+                continue
+        orders.append(OrderIntent(asset.symbol, sell.OrderType.MARKET, amount))
+        value = amount * asset.last_price_usdt
+        total += value
+        lines.append(f"🔸 {format_decimal(amount)} {asset.symbol} ≈ ${value:.2f}")
+
+    builder = InlineKeyboardBuilder()
+    if orders:
+        token = intents.create(callback.from_user.id, orders)
+        builder.add(
+            InlineKeyboardButton(
+                text=f"🔸 Sell {len(orders)} at Market 🔸", callback_data=f"batch_confirm_{token}"
+            )
+        )
+    builder.add(InlineKeyboardButton(text="⬅️ Back", callback_data="back_to_start"))
+    builder.adjust(1)
+
+    await callback.message.edit_text(
+        text="<b>Batch Market Sell Preview:</b>\n\n"
+        + "\n".join(lines or ["Nothing to sell."])
+        + f"\n\nEstimated value: ${total:.2f}",
+        reply_markup=builder.as_markup(),
+        parse_mode="HTML",
+    )
+    await callback.answer()
+
+
+async def submit_order(
+    client: BinanceClient, intent: OrderIntent, limiter: asyncio.Semaphore
+) -> Dict:
+    """Place one market sell and summarize its outcome.
+
+    :param client: Client of the account selling
+    :param intent: Order to place
+    :param limiter: Semaphore bounding concurrent submissions
+    :return: Per-order result
+    """
+    symbol, amount = intent.symbol, format_decimal(intent.quantity)
+    async with limiter:
+        try:
+            order = await client.create_sell_market_order(
+                symbol=utils.pair_ticker(symbol, USDT), quantity=intent.quantity
+            )
+        except Exception as e:
+            logger.warning(
+                f"Batch market sell of {amount} {symbol} failed: {e}",
+                extra={"symbol": symbol, "quantity": amount, "order_type": "MARKET"},
+            )
+            return {"symbol": symbol, "amount": amount, "error": str(e)}
+    return {
+        "symbol": symbol,
+        "amount": order.get("executedQty", amount),
+        "status": order.get("status", "UNKNOWN"),
+        "quote": Decimal(order.get("cummulativeQuoteQty", "0")),
+    }
+
+
+@batch_sell_router.callback_query(F.data.startswith("batch_confirm_"))
+async def execute_batch_sell(
+    callback: CallbackQuery, state: FSMContext, account: Account
+) -> None:
+    """Submit the planned market orders concurrently and report one fill summary.
+
+    The batch is claimed from the intent store, so a second tap on the
+    button can't submit it again.
+
+    :param callback: Callback query from the confirmation button
+    :param state: FSM context for state management
+    :param account: Caller's Binance account
+    :return: None
+    """
+    orders = intents.claim(callback.data.replace("batch_confirm_", ""), callback.from_user.id)
+    if orders is None:
+        await callback.answer("This batch has expired or was already submitted.", show_alert=True)
+        return
+    await state.clear()
+    await callback.answer("Submitting orders...")
+
+    limiter = asyncio.Semaphore(BATCH_CONCURRENCY)
+    results = await asyncio.gather(
+        *(submit_order(account.client, intent, limiter) for intent in orders)
+    )
+
+    lines = []
+    received = Decimal("0")
+    for r in results:
+        if "error" in r:
+            lines.append(f"❌ {r['symbol']}: {escape(r['error'])}")
+        else:
+            received += r["quote"]
+            lines.append(
+                f"✅ {r['symbol']}: {r['status']}, sold {r['amount']} for ${r['quote']:.2f}"
+            )
+    filled = sum(1 for r in results if "error" not in r)
+
+    await callback.message.edit_text(
+        text=f"<b>Batch Market Sell:</b> {filled}/{len(results)} orders placed\n\n"
+        + "\n".join(lines)
+        + f"\n\nTotal received: ${received:.2f}",
+        parse_mode="HTML",
+    )
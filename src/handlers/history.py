@@ -0,0 +1,79 @@
+import asyncio
+import time
+from datetime import datetime
+from math import fsum
+from typing import Optional
+
+from aiogram import Router
+from aiogram.filters import Command, CommandObject
+from aiogram.types import Message, InlineKeyboardButton
+from aiogram.utils.keyboard import InlineKeyboardBuilder
+
+from accounts import Account
+import history
+
+history_router = Router()
+
+RESOLUTIONS = {"1h": history.HOUR, "1d": history.DAY}
+# Points shown by default, and at most, per resolution
+DEFAULT_POINTS = {"1h": 24, "1d": 30}
+MAX_POINTS = 90
+
+
+@history_router.message(Command("history"))
+async def command_history(
+    message: Message, account: Account, command: Optional[CommandObject] = None
+) -> None:
+    """Display the portfolio value over time.
+
+    Usage: ``/history [1h|1d] [points]``, e.g. ``/history 1h 48``.
+
+    :param message: Incoming message from user
+    :param account: Caller's Binance account
+    :param command: Parsed command arguments
+    :return: None
+    """
+    args = (command.args or "").split() if command else []
+    resolution_name = args[0] if args and args[0] in RESOLUTIONS else "1d"
+    try:
+        points = int(args[1]) if len(args) > 1 else DEFAULT_POINTS[resolution_name]
+    except ValueError:
+        await message.answer("Usage: /history [1h|1d] [points]")
+        return
+    points = max(1, min(points, MAX_POINTS))
+
+    resolution = RESOLUTIONS[resolution_name]
+    end = int(time.time())
+    start = end - end % resolution - (points - 1) * resolution
+    # Opening the store and range reads touch the disk, keep them off the event loop
+    samples = await asyncio.to_thread(
+        lambda: history.get_store(account.id).read(start, end + 1, resolution)
+    )
+
+    builder = InlineKeyboardBuilder()
+    builder.add(InlineKeyboardButton(text="⬅️ Back", callback_data="back_to_start"))
+
+    if not samples:
+        await message.answer(
+            "No portfolio history recorded yet.", reply_markup=builder.as_markup()
+        )
+        return
+
+    totals = [(ts, fsum(value for _, value in assets.values())) for ts, assets in samples]
+    date_format = "%b %d %H:%M" if resolution < history.DAY else "%b %d"
+    lines = [
+        f"<code>{datetime.fromtimestamp(ts).strftime(date_format):<12} ${total:,.2f}</code>"
+        for ts, total in totals
+    ]
+    first, last = totals[0][1], totals[-1][1]
+    change = last - first
+    change_percent = change / first * 100 if first else 0.0
+
+    await message.answer(
+        text=f"<b>📊 Portfolio History ({resolution_name})</b>\n\n"
+        + "\n".join(lines)
+        + f"\n\nChange: {'+' if change >= 0 else '-'}${abs(change):,.2f} "
+        f"({change_percent:+.2f}%)",
+        reply_markup=builder.as_markup(),
+        parse_mode="HTML",
+    )
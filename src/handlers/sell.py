@@ -1,4 +1,9 @@
 from decimal import Decimal
+from html import escape
+from os import getenv
+from typing import Dict, Optional
+import asyncio
+import time
 
 from aiogram import Router, F
 from aiogram.filters import Command
@@ -8,16 +13,28 @@ from aiogram.fsm.state import State, StatesGroup
 from aiogram.fsm.context import FSMContext
 
 from handlers import wallet
-from binance_api import BinanceClient
+from accounts import Account
+from binance_api import BinanceAPIError
+from models import WalletItem
+from exchange_filters import format_decimal
+from intents import OrderIntent, intents
+from klines import Indicators
+from order_book import FillEstimate
+import exchange_filters
+import klines
+import order_book
+import utils
 import logging
 
 logger = logging.getLogger(__name__)
 sell_router = Router()
 
-bc = BinanceClient()
-sell_router = Router()
-
 USDT = "USDT"
+# Max age in seconds of the asset snapshot reused between sell steps
+SNAPSHOT_MAX_AGE = float(getenv("SELL_SNAPSHOT_MAX_AGE", "30"))
+# Max snapshot age when building the preview that offers the confirm button
+CONFIRM_MAX_AGE = float(getenv("SELL_CONFIRM_MAX_AGE", "5"))
+
 class OrderType:
     MARKET = "market"
     LIMIT = "limit"
@@ -27,26 +44,135 @@ class SellState(StatesGroup):
     AMOUNT = State()
     LIMIT_PRICE = State()
 
+def to_snapshot(asset: WalletItem) -> Dict:
+    """Serialize a wallet item into a compact FSM-storable snapshot.
+
+    :param asset: Wallet item to snapshot
+    :return: JSON-serializable snapshot stamped with the time it was taken
+    """
+    return {**asset.model_dump(mode="json"), "taken_at": time.time()}
+
+
+async def get_asset_snapshot(
+    state: FSMContext, account: Account, symbol: str, max_age: float = SNAPSHOT_MAX_AGE
+) -> WalletItem:
+    """Get the asset from the conversation snapshot, refetching it only when too old.
+
+    :param state: FSM context holding the snapshots
+    :param account: Account holding the asset
+    :param symbol: Asset symbol
+    :param max_age: Max snapshot age in seconds before it is refreshed
+    :return: Wallet item for the asset
+    """
+    snapshots = (await state.get_data()).get("snapshots", {})
+    snapshot = snapshots.get(symbol)
+    if snapshot is not None and time.time() - snapshot["taken_at"] <= max_age:
+        return WalletItem(**snapshot)
+
+    asset = await wallet.build_wallet_item(account, symbol)
+    await state.update_data(snapshots={**snapshots, symbol: to_snapshot(asset)})
+    return asset
+
+
+async def get_indicators(account: Account, symbol: str) -> Optional[Indicators]:
+    """Get VWAP, ATR and RSI for the asset's USDT pair, None if they can't be computed.
+
+    :param account: Account whose client fetches the candles
+    :param symbol: Asset symbol
+    :return: Indicators over the cached candles
+    """
+    try:
+        return await klines.cache.indicators(account.client, utils.pair_ticker(symbol, USDT))
+    except Exception as e:
+        logger.warning(f"Indicators for {symbol} unavailable: {e}")
+        return None
+
+
+def format_indicators(indicators: Optional[Indicators]) -> str:
+    if indicators is None:
+        return ""
+    lines = []
+    if indicators.vwap is not None:
+        lines.append(
+            f"VWAP ({klines.VWAP_WINDOW}×{klines.KLINE_INTERVAL}): "
+            f"<code>${indicators.vwap:.4f}</code>"
+        )
+    if indicators.atr is not None:
+        lines.append(f"ATR ({klines.ATR_PERIOD}): <code>${indicators.atr:.4f}</code>")
+    if indicators.rsi is not None:
+        lines.append(f"RSI ({klines.RSI_PERIOD}): <code>{indicators.rsi:.1f}</code>")
+    return "".join(f"{line}\n" for line in lines)
+
+
+async def get_fill_estimate(
+    account: Account, symbol: str, amount: Decimal
+) -> Optional[FillEstimate]:
+    """Estimate a market sell against the local order book, None if the book is unavailable.
+
+    :param account: Account whose client fetches a fallback snapshot
+    :param symbol: Asset symbol
+    :param amount: Quantity to sell
+    :return: Fill estimate over the bids
+    """
+    try:
+        book = await order_book.books.get(account.client, utils.pair_ticker(symbol, USDT))
+    except Exception as e:
+        logger.warning(f"Order book for {symbol} unavailable: {e}")
+        return None
+    return book.estimate_sell(float(amount))
+
+
+def format_fill_estimate(amount: Decimal, symbol: str, estimate: FillEstimate) -> str:
+    text = (
+        f"Est. average price: ${estimate.average_price:.4f} "
+        f"(slippage {estimate.slippage:.2f}%)\n"
+        f"Worst fill: ${estimate.worst_price:.4f} across {estimate.levels} levels\n"
+        f"Est. value: ${estimate.notional:.2f}"
+    )
+    if estimate.filled < estimate.quantity:
+        text += (
+            f"\n⚠️ The order book only covers {estimate.filled:g} of "
+            f"{format_decimal(amount)} {symbol}"
+        )
+    return text
+
+
 @sell_router.message(Command("sell"))
-async def command_sell_handler(message: Message) -> None:
+async def command_sell_handler(message: Message, state: FSMContext, account: Account) -> None:
     """Display available assets for selling as interactive buttons.
 
+    Sellable assets are snapshotted into the FSM state so the next steps of
+    the conversation don't have to refetch them.
+
     :param message: Incoming message from user
+    :param state: FSM context for state management
+    :param account: Caller's Binance account
     :return: None
     """
-    available_assets = wallet.build_wallet()
+    portfolio = await wallet.build_portfolio(account)
+    available_assets = [
+        portfolio.item(i)
+        for i in portfolio.visible_order()
+        if portfolio.symbols[i] != USDT
+    ]
+    await state.update_data(
+        snapshots={asset.symbol: to_snapshot(asset) for asset in available_assets}
+    )
 
     builder = InlineKeyboardBuilder()
     for asset in available_assets:
-        if asset.balance_usdt > 1.0 and asset.symbol != USDT:
-            builder.add(
-                InlineKeyboardButton(
-                    text=f"{asset.symbol}", callback_data=f"sell_asset_{asset.symbol}"
-                )
+        builder.add(
+            InlineKeyboardButton(
+                text=f"{asset.symbol}", callback_data=f"sell_asset_{asset.symbol}"
             )
+        )
 
     builder.adjust(3)
-    builder.add(InlineKeyboardButton(text="⬅️ Back", callback_data="back_to_start"))
+    builder.row(
+        InlineKeyboardButton(text="🧺 Batch sell", callback_data="batch_select"),
+        InlineKeyboardButton(text="💥 Sell all except USDT", callback_data="batch_all"),
+    )
+    builder.row(InlineKeyboardButton(text="⬅️ Back", callback_data="back_to_start"))
 
     await message.answer(
         text="<b>Select asset to sell:</b>",
@@ -55,15 +181,20 @@ async def command_sell_handler(message: Message) -> None:
     )
 
 @sell_router.callback_query(F.data.startswith("sell_asset_"))
-async def show_order_type_selection(callback: CallbackQuery, state: FSMContext):
+async def show_order_type_selection(
+    callback: CallbackQuery, state: FSMContext, account: Account
+):
     """Show order type selection menu and asset details.
 
     :param callback: Callback query from the button press
     :param state: FSM context for state management
+    :param account: Caller's Binance account
     :return: None
     """   
     symbol = callback.data.replace("sell_asset_", "")
-    asset = wallet.build_wallet_item(symbol)
+    asset, indicators = await asyncio.gather(
+        get_asset_snapshot(state, account, symbol), get_indicators(account, symbol)
+    )
 
     # Store symbol for later use
     await state.update_data(symbol=symbol)
@@ -89,7 +220,8 @@ async def show_order_type_selection(callback: CallbackQuery, state: FSMContext):
         f"Value: <code>${asset.balance_usdt:.2f}</code>\n"
         f"Price: <code>${asset.last_price_usdt:.4f}</code>\n"
         f"LIQ: <code>${asset.available_liquidity:.4f}</code>\n"
-        f"24h Change: {asset.formatted_pnl}\n\n"
+        f"24h Change: {asset.formatted_pnl}\n"
+        f"{format_indicators(indicators)}\n"
         f"<b>Select order type:</b>",
         reply_markup=builder.as_markup(),
         parse_mode="HTML",
@@ -117,34 +249,53 @@ async def handle_order_type_selection(callback: CallbackQuery, state: FSMContext
     await callback.answer()
 
 @sell_router.message(SellState.AMOUNT)
-async def handle_amount(message: Message, state: FSMContext):
+async def handle_amount(message: Message, state: FSMContext, account: Account):
     """Process entered amount and show appropriate order preview or prompt for limit price.
 
     :param message: Message containing amount input
     :param state: FSM context for state management
+    :param account: Caller's Binance account
     :return: None
     """    
     data = await state.get_data()
     symbol = data["symbol"]
     order_type = data["order_type"]
-    asset = wallet.build_wallet_item(symbol)
+    # A market preview offers the confirm button right away, so it needs fresh data
+    asset = await get_asset_snapshot(
+        state,
+        account,
+        symbol,
+        max_age=CONFIRM_MAX_AGE if order_type == OrderType.MARKET else SNAPSHOT_MAX_AGE,
+    )
 
+    market = order_type == OrderType.MARKET
     try:
         if "%" in message.text:
             value = message.text[:-1]
-            amount = Decimal(float(value)/100) * asset.free
+            amount = Decimal(value) / 100 * asset.free
         else:
-            amount = float(message.text)
-            if amount <= 0 or amount > asset.free:
-                raise ValueError
-    except ValueError:
+            amount = Decimal(message.text)
+        if amount <= 0 or amount > asset.free:
+            raise ValueError
+    except (ValueError, ArithmeticError):
         await message.answer("Invalid amount. Please try again.")
         return
 
-    await state.update_data(amount=amount)
+    # Check the order locally instead of waiting for Binance to reject it
+    filters = await exchange_filters.index.get(account.client, utils.pair_ticker(symbol, USDT))
+    if filters is not None:
+        amount = filters.quantize_qty(amount, market=market)
+        error = filters.validate(
+            amount, asset.last_price_usdt if market else None, market=market
+        )
+        if error:
+            await message.answer(f"{error}. Please try again.")
+            return
+
+    await state.update_data(amount=format_decimal(amount))
 
-    if order_type == OrderType.MARKET:
-        await show_market_order_preview(message, state, symbol, amount, asset)
+    if market:
+        await show_market_order_preview(message, state, account, symbol, amount, asset)
     else:
         await state.set_state(SellState.LIMIT_PRICE)
         await message.answer(
@@ -152,94 +303,138 @@ async def handle_amount(message: Message, state: FSMContext):
             parse_mode="HTML",
         )
 
-async def show_market_order_preview(message, state, symbol, amount, asset):
+async def show_market_order_preview(message, state, account, symbol, amount, asset):
     """Display market order preview with confirmation button.
 
+    The fill is estimated by walking the bids of the local order book, so
+    large orders show the average price and slippage they would get.
+
     :param message: Original message for replying
     :param state: FSM context for state management
+    :param account: Caller's Binance account
     :param symbol: Trading pair symbol
     :param amount: Order amount
     :param asset: Asset information object
     :return: None
     """
+    token = intents.create(
+        message.from_user.id, OrderIntent(symbol, OrderType.MARKET, amount)
+    )
     builder = InlineKeyboardBuilder()
     builder.add(
-        InlineKeyboardButton(
-            text="🔸 Sell at Market 🔸",
-            callback_data=f"confirm_market_sell_{symbol}_{amount}",
-        )
+        InlineKeyboardButton(text="🔸 Sell at Market 🔸", callback_data=f"confirm_sell_{token}")
     )
     builder.add(InlineKeyboardButton(text="⬅️ Back", callback_data=f"sell_asset_{symbol}"))
 
+    estimate = await get_fill_estimate(account, symbol, amount)
+    if estimate is not None:
+        details = format_fill_estimate(amount, symbol, estimate)
+    else:
+        details = (
+            f"at market price (${asset.last_price_usdt:.4f})\n"
+            f"Value: ${amount * asset.last_price_usdt:.2f}"
+        )
+
     await message.answer(
         text=f"<b>Market Order Preview:</b>\n\n"
-        f"Sell {amount:.4f} {symbol}\n"
-        f"at market price (${asset.last_price_usdt:.4f})\n"
-        f"Value: ${Decimal(amount) * asset.last_price_usdt:.2f}",
+        f"Sell {format_decimal(amount)} {symbol}\n"
+        f"{details}",
         reply_markup=builder.as_markup(),
         parse_mode="HTML",
     )
     await state.clear()
 
 @sell_router.message(SellState.LIMIT_PRICE)
-async def handle_limit_price(message: Message, state: FSMContext):
+async def handle_limit_price(message: Message, state: FSMContext, account: Account):
     """Process limit price input and show limit order preview.
 
     :param message: Message containing limit price input
     :param state: FSM context for state management
+    :param account: Caller's Binance account
     :return: None
     """    
     try:
-        limit_price = float(message.text)
+        limit_price = Decimal(message.text)
         if limit_price <= 0:
             raise ValueError
-    except ValueError:
+    except (ValueError, ArithmeticError):
         await message.answer("Invalid price. Please enter a valid number.")
         return
 
     data = await state.get_data()
     symbol = data["symbol"]
-    amount = data["amount"]
-    asset = wallet.build_wallet_item(symbol)
-
+    amount = Decimal(data["amount"])
+    asset = await get_asset_snapshot(state, account, symbol, max_age=CONFIRM_MAX_AGE)
+
+    filters = await exchange_filters.index.get(account.client, utils.pair_ticker(symbol, USDT))
+    if filters is not None:
+        limit_price = filters.quantize_price(limit_price)
+        error = filters.validate(amount, limit_price)
+        if error:
+            await message.answer(f"{error}. Please enter another price.")
+            return
+
+    token = intents.create(
+        message.from_user.id, OrderIntent(symbol, OrderType.LIMIT, amount, limit_price)
+    )
     builder = InlineKeyboardBuilder()
     builder.add(
-        InlineKeyboardButton(
-            text="🔸 Place Limit Order 🔸",
-            callback_data=f"confirm_limit_sell_{symbol}_{amount}_{limit_price}",
-        )
+        InlineKeyboardButton(text="🔸 Place Limit Order 🔸", callback_data=f"confirm_sell_{token}")
     )
     builder.add(InlineKeyboardButton(text="⬅️ Back", callback_data=f"back_to_start"))
 
     await message.answer(
         text=f"<b>Limit Order Preview:</b>\n\n"
-        f"Sell {amount:.4f} {symbol}\n"
-        f"at limit price: ${limit_price:.4f}\n"
+        f"Sell {format_decimal(amount)} {symbol}\n"
+        f"at limit price: ${format_decimal(limit_price)}\n"
         f"Current price: ${asset.last_price_usdt:.4f}\n"
-        f"Value if filled: ${Decimal(amount) * Decimal(limit_price):.2f}",
+        f"Value if filled: ${amount * limit_price:.2f}",
         reply_markup=builder.as_markup(),
         parse_mode="HTML",
     )
     await state.clear()
 
-@sell_router.callback_query(F.data.startswith("confirm_market_sell_"))
-async def execute_market_sell(callback: CallbackQuery):
+@sell_router.callback_query(F.data.startswith("confirm_sell_"))
+async def confirm_sell(callback: CallbackQuery, account: Account):
+    """Execute the previewed order behind a confirm button, at most once.
+
+    :param callback: Callback query from confirmation button
+    :param account: Caller's Binance account
+    :return: None
+    """
+    intent = intents.claim(callback.data.replace("confirm_sell_", ""), callback.from_user.id)
+    if intent is None:
+        await callback.answer("This order has expired or was already placed.", show_alert=True)
+        return
+
+    if intent.order_type == OrderType.MARKET:
+        await execute_market_sell(callback, account, intent)
+    else:
+        await execute_limit_sell(callback, account, intent)
+
+async def execute_market_sell(callback: CallbackQuery, account: Account, intent: OrderIntent):
     """Execute market sell order and display confirmation.
 
     :param callback: Callback query from confirmation button
+    :param account: Caller's Binance account
+    :param intent: Confirmed order
     :return: None
-    :raises: Various exceptions from BinanceClient
     """
-    symbol, amount = callback.data.replace("confirm_market_sell_", "").split("_")
-    amount = float(amount)
+    symbol, amount = intent.symbol, intent.quantity
 
     try:
-        bc.create_sell_market_order(
-            symbol=symbol,
+        await account.client.create_sell_market_order(
+            symbol=utils.pair_ticker(symbol, USDT),
             quantity=amount
         )
     except Exception as e:
-        logger.info(e)
+        logger.warning(
+            f"Market sell of {amount} {symbol} failed: {e}",
+            exc_info=True,
+            extra={"symbol": symbol, "quantity": str(amount), "order_type": "MARKET"},
+        )
+        await show_order_failure(callback, e)
+        return
 
     await callback.message.edit_text(
         text=f"<b>Market Order Executed:</b>\n"
@@ -248,26 +443,33 @@ async def execute_market_sell(callback: CallbackQuery):
     )
     await callback.answer("Order executed!")
 
-@sell_router.callback_query(F.data.startswith("confirm_limit_sell_"))
-async def execute_limit_sell(callback: CallbackQuery):
+async def execute_limit_sell(callback: CallbackQuery, account: Account, intent: OrderIntent):
     """Execute limit sell order and display confirmation.
 
     :param callback: Callback query from confirmation button
+    :param account: Caller's Binance account
+    :param intent: Confirmed order
     :return: None
-    :raises: Various exceptions from BinanceClient
     """
-    symbol, amount, price = callback.data.replace("confirm_limit_sell_", "").split("_")
-    amount = float(amount)
-    price = float(price)
+    symbol, amount, price = intent.symbol, intent.quantity, intent.price
 
     try:
-        bc.create_sell_limit_order(
-            symbol=symbol,
+        await account.client.create_sell_limit_order(
+            symbol=utils.pair_ticker(symbol, USDT),
             quantity=amount,
             trigger_price=price
         )
     except Exception as e:
-        logger.info(e)
+        logger.warning(
+            f"Limit sell of {amount} {symbol} at {price} failed: {e}",
+            exc_info=True,
+            extra={
+                "symbol": symbol, "quantity": str(amount), "price": str(price),
+                "order_type": "LIMIT",
+            },
+        )
+        await show_order_failure(callback, e)
+        return
 
     await callback.message.edit_text(
         text=f"<b>Limit Order Placed:</b>\n"
@@ -275,4 +477,18 @@ async def execute_limit_sell(callback: CallbackQuery):
         f"at ${price:.4f}",
         parse_mode="HTML",
     )
-    await callback.answer("Limit order placed!")
\ No newline at end of file
+    await callback.answer("Limit order placed!")
+
+async def show_order_failure(callback: CallbackQuery, error: Exception):
+    """Tell the user an order was not placed, with the reason Binance gave.
+
+    :param callback: Callback query from confirmation button
+    :param error: Exception raised placing the order
+    :return: None
+    """
+    reason = error.message if isinstance(error, BinanceAPIError) else str(error)
+    await callback.message.edit_text(
+        text=f"<b>Order Failed:</b>\n{escape(reason or type(error).__name__)}",
+        parse_mode="HTML",
+    )
+    await callback.answer("Order failed!")
\ No newline at end of file
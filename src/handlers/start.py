@@ -3,7 +3,8 @@ from aiogram.filters import CommandStart
 from aiogram.types import Message, InlineKeyboardButton, CallbackQuery
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from aiogram.fsm.context import FSMContext
-from handlers import sell, wallet
+from handlers import history, sell, wallet
+from accounts import Account
 
 start_router = Router()
 
@@ -23,6 +24,7 @@ async def command_start_handler(message: Message, is_new: bool = True) -> None:
         *[
             InlineKeyboardButton(text="💳 Wallet", callback_data="cmd_view_wallet"),
             InlineKeyboardButton(text="📈 Sell", callback_data="cmd_sell"),
+            InlineKeyboardButton(text="📊 History", callback_data="cmd_history"),
         ]
     )
     # Adjust button layout
@@ -46,7 +48,7 @@ async def back_to_start(callback: CallbackQuery) -> None:
 
 
 @start_router.callback_query(F.data[:4] == 'cmd_')
-async def process_callback(callback: CallbackQuery, state: FSMContext) -> None:
+async def process_callback(callback: CallbackQuery, state: FSMContext, account: Account) -> None:
     """Route button presses to appropriate command handlers.
     
     Processes callback queries from main menu buttons and delegates
@@ -54,14 +56,17 @@ async def process_callback(callback: CallbackQuery, state: FSMContext) -> None:
 
     :param callback: Callback query from button press
     :param state: FSM context for state management
+    :param account: Caller's Binance account
     :return: None
     """
     command = callback.data.replace('cmd_', '')
     
     match command:
         case "view_wallet":
-            await wallet.command_show_wallet(callback.message, is_new=True)
+            await wallet.command_show_wallet(callback.message, account, is_new=True)
         case "sell":
-            await sell.command_sell_handler(callback.message)
+            await sell.command_sell_handler(callback.message, state, account)
+        case "history":
+            await history.command_history(callback.message, account)
             
     await callback.answer()
\ No newline at end of file
@@ -1,128 +1,251 @@
-from typing import List, Dict
+from collections import OrderedDict
+from typing import List, Dict, Tuple
 from decimal import Decimal
+import asyncio
+import hashlib
 
 from aiogram import Router, F
 from aiogram.filters import Command
 from aiogram.types import Message, InlineKeyboardButton, CallbackQuery
 from aiogram.utils.keyboard import InlineKeyboardBuilder
+from aiogram.exceptions import TelegramBadRequest
 
-from models import UserAsset, Ticker24hrData, WalletItem
+from models import LazyUserAsset, LazyTicker24hrData, WalletItem
+from valuation import PortfolioFrame
+from wallet_render import PAGE_CACHE_SIZE, WalletPageCache
 from binance_api import BinanceClient
-from handlers import start
+from accounts import Account
+import market_stream
 import utils
 
 
 USDT = "USDT"
 
 wallet_router = Router()
-bc = BinanceClient()
+page_cache = WalletPageCache()
+
+# In-flight refresh per chat, Refresh taps landing meanwhile join it
+refreshes: Dict[int, asyncio.Task] = {}
+# Message id and content hash of the wallet message last shown per chat, least recent first
+last_shown: "OrderedDict[int, Tuple[int, str]]" = OrderedDict()
 
 
 @wallet_router.message(Command("wallet"))
-async def command_show_wallet(message: Message, is_new: bool = False) -> None:
+async def command_show_wallet(
+    message: Message, account: Account, is_new: bool = False, refresh: bool = False
+) -> None:
     """Display wallet overview with asset balances and 24h performance.
 
+    Recently rendered pages are reused, so reopening the wallet doesn't refetch.
+
     :param message: Incoming message from user
+    :param account: Caller's Binance account
     :param is_new: Flag to determine if this is a new message or edit existing
+    :param refresh: Flag to ignore recently rendered pages and refetch
     :return: None
     """
-    wallet: List[WalletItem] = build_wallet()
-    total_balance = sum(asset.balance_usdt for asset in wallet)
-    html_message = (
-        f"<b>💼 Wallet Overview</b>\n"
-        f"<code>Total: ${total_balance:.2f} USDT</code>\n\n"
-    )
+    pages = None if refresh else page_cache.get_fresh(account.id)
+    if pages is None:
+        pages = await render_wallet(account)
 
-    for asset in wallet:
-        # Skip small balances
-        if asset.balance_usdt < 1.0:
-            continue
+    await show_wallet_page(message, pages, 0, is_new)
 
-        html_message += (
-            f"<b>{asset.symbol}</b>\n"
-            f"└ <code>${asset.balance_usdt:.2f}</code> "
-            f"@ <code>${asset.last_price_usdt:.4f}</code>\n"
-            f"└ 24h: {asset.formatted_pnl}\n\n"
-        )
 
-    # Summary footer
-    displayed_assets = sum(1 for a in wallet if a.balance_usdt >= 1.0)
-    total_assets = len(wallet)
+async def render_wallet(account: Account) -> List[str]:
+    """Fetch and render the wallet into cached pages.
 
-    html_message += (
-        f"\n<i>Showing {displayed_assets} of {total_assets} assets</i>\n"
-        f"<i>Last updated: {bc.get_server_time()}</i>"
+    :param account: Account the pages are rendered for
+    :return: Rendered wallet pages
+    """
+    # The timestamp comes from the local server clock, so it rarely costs a request
+    portfolio, updated_at = await asyncio.gather(
+        build_portfolio(account), account.client.get_server_time()
     )
+    return page_cache.render(account.id, portfolio, updated_at)
 
-    builder = InlineKeyboardBuilder()
-    builder.add(
-        *[
-            InlineKeyboardButton(text="🔄 Refresh", callback_data="refresh_wallet"),
-            InlineKeyboardButton(text="⬅️ Back", callback_data="back_to_start"),
-        ]
-    )
 
-    await (message.answer if is_new else message.edit_text)(
-        html_message, parse_mode="HTML", reply_markup=builder.as_markup()
+async def show_wallet_page(
+    message: Message, pages: List[str], page: int, is_new: bool = False
+) -> None:
+    """Display one wallet page with navigation buttons.
+
+    :param message: Message to answer or edit
+    :param pages: Rendered wallet pages
+    :param page: Zero-based page index
+    :param is_new: Flag to determine if this is a new message or edit existing
+    :return: None
+    """
+    page = max(0, min(page, len(pages) - 1))
+
+    builder = InlineKeyboardBuilder()
+    navigation = []
+    if page > 0:
+        navigation.append(
+            InlineKeyboardButton(text="◀️ Prev", callback_data=f"wallet_page_{page - 1}")
+        )
+    if page < len(pages) - 1:
+        navigation.append(
+            InlineKeyboardButton(text="Next ▶️", callback_data=f"wallet_page_{page + 1}")
+        )
+    if navigation:
+        builder.row(*navigation)
+    builder.row(
+        InlineKeyboardButton(text="🔄 Refresh", callback_data="refresh_wallet"),
+        InlineKeyboardButton(text="⬅️ Back", callback_data="back_to_start"),
     )
 
+    digest = hashlib.blake2b(
+        f"{page}/{len(pages)}:{pages[page]}".encode(), digest_size=16
+    ).hexdigest()
+    chat_id = message.chat.id
+    if not is_new and last_shown.get(chat_id) == (message.message_id, digest):
+        # Identical content, Telegram would reject the edit anyway
+        return
 
+    if is_new:
+        message = await message.answer(
+            pages[page], parse_mode="HTML", reply_markup=builder.as_markup()
+        )
+    else:
+        try:
+            await message.edit_text(
+                pages[page], parse_mode="HTML", reply_markup=builder.as_markup()
+            )
+        except TelegramBadRequest as e:
+            if "message is not modified" not in e.message:
+                raise
+    last_shown[chat_id] = (message.message_id, digest)
+    last_shown.move_to_end(chat_id)
+    while len(last_shown) > PAGE_CACHE_SIZE:
+        last_shown.popitem(last=False)
 
 
 @wallet_router.callback_query(F.data == "refresh_wallet")
-async def refresh_wallet(callback: CallbackQuery) -> None:
+async def refresh_wallet(callback: CallbackQuery, account: Account) -> None:
     """Refresh wallet display with latest data.
 
+    Taps that arrive while a refresh for the same chat is in flight join it
+    instead of starting another one.
+
     :param callback: Callback query from refresh button
+    :param account: Caller's Binance account
+    :return: None
+    """
+    chat_id = callback.message.chat.id
+    task = refreshes.get(chat_id)
+    if task is None:
+        task = asyncio.create_task(
+            command_show_wallet(callback.message, account, is_new=False, refresh=True)
+        )
+        refreshes[chat_id] = task
+        task.add_done_callback(lambda _: refreshes.pop(chat_id, None))
+
+    # Shielded so one tap's cancellation doesn't cancel the shared refresh
+    await asyncio.shield(task)
+    await callback.answer()
+
+
+@wallet_router.callback_query(F.data.startswith("wallet_page_"))
+async def flip_wallet_page(callback: CallbackQuery, account: Account) -> None:
+    """Show another page of the cached wallet overview.
+
+    :param callback: Callback query from a Prev/Next button
+    :param account: Caller's Binance account
     :return: None
     """
-    await command_show_wallet(callback.message, is_new=False)
+    page = int(callback.data.replace("wallet_page_", ""))
+    pages = page_cache.get(account.id) or await render_wallet(account)
+
+    await show_wallet_page(callback.message, pages, page)
     await callback.answer()
 
 
-def build_wallet() -> List[WalletItem]:
+async def build_portfolio(account: Account) -> PortfolioFrame:
+    """Build columnar portfolio valuation with current prices and performance data.
+
+    Fetches user assets and corresponding 24hr price data and values every
+    asset in one pass.
+
+    :param account: Account to value
+    :return: Portfolio frame sorted by USD value
+    """
+    user_assets: List[LazyUserAsset] = await get_user_assets(account)
+    filtered_symbols = [ua.symbol for ua in user_assets if ua.symbol != USDT]
+    price_data: Dict[str, LazyTicker24hrData] = await get_price_data(
+        account.client, [utils.pair_ticker(symbol, USDT) for symbol in filtered_symbols]
+    )
+    return PortfolioFrame.build(user_assets, price_data)
+
+
+async def build_wallet(account: Account) -> List[WalletItem]:
     """Build complete wallet overview with current prices and performance data.
     
     Fetches user assets and corresponding 24hr price data, calculates liquidity depths,
     and returns sorted list of wallet items by USD value.
 
+    :param account: Account to value
     :return: List of wallet items sorted by USD value
     """
-    user_assets: List[UserAsset] = bc.get_user_assets()
-    filtered_symbols = [ua.symbol for ua in user_assets if ua.symbol != USDT]
-    price_data: Dict[str, Ticker24hrData] = bc.get_24hr_price_data(
-        [utils.pair_ticker(symbol, USDT) for symbol in filtered_symbols]
-    )
-    result = []
-    for asset in user_assets:
-        if asset.symbol != USDT:
-            pd = price_data[utils.pair_ticker(asset.symbol, USDT)]
-            result.append(
-                WalletItem(
-                    symbol=asset.symbol,
-                    free=asset.free,
-                    last_price_usdt=pd.last_price,
-                    available_liquidity=calculate_depth(
-                        pd.bid_price, pd.bid_qty, pd.ask_price, pd.ask_qty
-                    ),
-                    pnl_24hr_usdt=pd.price_change,
-                    pnl_24hr_percentage=pd.price_change_percent,
-                )
-            )
-        else:
-            result.append(WalletItem.create_usdt_entry(asset.free))
+    return (await build_portfolio(account)).wallet_items()
 
-    return sorted(result, key=lambda x: x.balance_usdt, reverse=True)
 
+async def get_user_assets(account: Account) -> List[LazyUserAsset]:
+    """Get user balances from the streamed balance table, falling back to REST.
 
-def build_wallet_item(symbol: str) -> WalletItem:
+    :param account: Account to read
+    :return: List of user assets with a non-zero balance
+    """
+    assets = account.balances.get_user_assets()
+    if assets is None:
+        assets = await account.client.get_user_assets()
+    return assets
+
+
+async def get_user_asset(account: Account, symbol: str) -> LazyUserAsset:
+    """Get a single user balance from the streamed balance table, falling back to REST.
+
+    :param account: Account to read
+    :param symbol: Asset symbol
+    :return: User asset balance
+    """
+    asset = account.balances.get_user_asset(symbol)
+    if asset is None:
+        asset = await account.client.get_user_asset(symbol)
+    return asset
+
+
+async def get_price_data(
+    client: BinanceClient, pairs: List[str]
+) -> Dict[str, LazyTicker24hrData]:
+    """Get price data for pairs from the live ticker book, falling back to REST.
+
+    Pairs are registered with the market stream so later lookups can be served
+    from memory. Pairs without fresh stream data are fetched over REST.
+
+    :param client: Client for the REST fallback
+    :param pairs: Trading pairs to look up
+    :return: Mapping of pair to its price data
+    """
+    market_stream.stream.track(pairs)
+    price_data = market_stream.book.fresh(pairs)
+    missing = [pair for pair in pairs if pair not in price_data]
+    if missing:
+        price_data.update(await client.get_24hr_price_data(missing))
+    return price_data
+
+
+async def build_wallet_item(account: Account, symbol: str) -> WalletItem:
     """Build single wallet item with current price and performance data.
 
+    :param account: Account holding the asset
     :param symbol: Asset symbol to build wallet item for
     :return: Wallet item with current market data
     """
-    asset: UserAsset = bc.get_user_asset(symbol)
-    pd: Ticker24hrData = bc.get_24hr_price_data_single(utils.pair_ticker(symbol, USDT))
+    pair = utils.pair_ticker(symbol, USDT)
+    asset, price_data = await asyncio.gather(
+        get_user_asset(account, symbol), get_price_data(account.client, [pair])
+    )
+    pd: LazyTicker24hrData = price_data[pair]
 
     return WalletItem(
         symbol=asset.symbol,
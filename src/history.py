@@ -0,0 +1,265 @@
+import asyncio
+import bisect
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+from itertools import groupby
+from os import getenv
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from accounts import ClientRegistry, Credentials
+from binance_api import BinanceClient
+from scheduler import Priority, RequestShed
+from valuation import PortfolioFrame
+import market_stream
+import utils
+
+HISTORY_DIR = getenv("HISTORY_DIR", "history")
+# Seconds between portfolio samples
+HISTORY_INTERVAL = float(getenv("HISTORY_INTERVAL", "60"))
+
+logger = logging.getLogger(__name__)
+
+USDT = "USDT"
+HOUR = 3600
+DAY = 86400
+
+# timestamp (s), asset id, free balance, USDT value
+# float64 values, float32 rounds balances past 7 significant digits
+RECORD = struct.Struct("<IHdd")
+# Each rollup file keeps the first sample of every bucket of its resolution
+ROLLUPS = (HOUR, DAY)
+
+Point = Tuple[int, Dict[str, Tuple[float, float]]]
+
+
+class _Timestamps(Sequence):
+    """Record timestamps of a mapped series, for bisecting without unpacking it all."""
+
+    def __init__(self, buffer: mmap.mmap, count: int):
+        self.buffer = buffer
+        self.count = count
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __getitem__(self, i: int) -> int:
+        return RECORD.unpack_from(self.buffer, i * RECORD.size)[0]
+
+
+class SeriesFile:
+    """Append-only file of fixed size records, sorted by timestamp."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def append(self, data: bytes) -> None:
+        with open(self.path, "ab") as f:
+            f.write(data)
+
+    def last_timestamp(self) -> Optional[int]:
+        try:
+            size = os.path.getsize(self.path)
+        except FileNotFoundError:
+            return None
+        size -= size % RECORD.size
+        if not size:
+            return None
+        with open(self.path, "rb") as f:
+            f.seek(size - RECORD.size)
+            return RECORD.unpack(f.read(RECORD.size))[0]
+
+    def read(self, start: int, end: int) -> Iterator[Tuple[int, int, float, float]]:
+        """Records with ``start <= timestamp < end``, read from a memory map.
+
+        Only the pages holding the range are touched, so reading a day from a
+        year-long file costs the same as reading it from a day-long one.
+        """
+        try:
+            f = open(self.path, "rb")
+        except FileNotFoundError:
+            return
+        with f:
+            size = os.fstat(f.fileno()).st_size
+            # Ignore a record the writer is still appending
+            size -= size % RECORD.size
+            if not size:
+                return
+            with mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ) as mm:
+                timestamps = _Timestamps(mm, size // RECORD.size)
+                lo = bisect.bisect_left(timestamps, start)
+                hi = bisect.bisect_left(timestamps, end, lo)
+                data = mm[lo * RECORD.size:hi * RECORD.size]
+        yield from RECORD.iter_unpack(data)
+
+
+class HistoryStore:
+    """Per-asset balance and value samples of one account.
+
+    Samples go to a raw file, plus hourly and daily rollup files so long
+    ranges are served without scanning every minute-level sample. Asset
+    symbols are stored once in a text file and referenced by line number.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.raw = SeriesFile(os.path.join(directory, "raw.bin"))
+        self.rollups = {
+            resolution: SeriesFile(os.path.join(directory, f"{resolution}.bin"))
+            for resolution in ROLLUPS
+        }
+        self._symbols_path = os.path.join(directory, "symbols.txt")
+        self._ids: Dict[str, int] = {s: i for i, s in enumerate(self.symbols())}
+        self._last_buckets = {
+            resolution: (ts // resolution if (ts := series.last_timestamp()) is not None else None)
+            for resolution, series in self.rollups.items()
+        }
+
+    def symbols(self) -> List[str]:
+        try:
+            with open(self._symbols_path) as f:
+                return f.read().splitlines()
+        except FileNotFoundError:
+            return []
+
+    def _asset_id(self, symbol: str) -> int:
+        asset_id = self._ids.get(symbol)
+        if asset_id is None:
+            asset_id = self._ids[symbol] = len(self._ids)
+            # Written before any record references it
+            with open(self._symbols_path, "a") as f:
+                f.write(symbol + "\n")
+        return asset_id
+
+    def record(
+        self, timestamp: int, symbols: List[str], free: Sequence[float], value: Sequence[float]
+    ) -> None:
+        """Append one sample of the portfolio.
+
+        :param timestamp: Unix time of the sample, in seconds
+        :param symbols: Asset symbols
+        :param free: Free balance per asset
+        :param value: USDT value per asset
+        """
+        data = b"".join(
+            RECORD.pack(timestamp, self._asset_id(s), f, v)
+            for s, f, v in zip(symbols, free, value)
+            if f
+        )
+        if not data:
+            return
+        self.raw.append(data)
+        for resolution, series in self.rollups.items():
+            bucket = timestamp // resolution
+            if bucket != self._last_buckets[resolution]:
+                series.append(data)
+                self._last_buckets[resolution] = bucket
+
+    def read(self, start: int, end: int, resolution: int) -> List[Point]:
+        """Samples in a time range, downsampled to one per ``resolution`` bucket.
+
+        :param start: Range start, unix seconds
+        :param end: Range end (exclusive), unix seconds
+        :param resolution: Bucket size in seconds
+        :return: ``(bucket start, {symbol: (free, value)})`` per bucket, oldest first
+        """
+        # Read from the coarsest file that is still fine enough
+        series = self.raw
+        for rollup in sorted(self.rollups):
+            if rollup <= resolution:
+                series = self.rollups[rollup]
+
+        symbols = self.symbols()
+        points: List[Point] = []
+        for timestamp, records in groupby(series.read(start, end), key=lambda r: r[0]):
+            bucket = timestamp - timestamp % resolution
+            if points and points[-1][0] == bucket:
+                # Keep the first sample of every bucket
+                continue
+            points.append(
+                (bucket, {symbols[asset_id]: (free, value) for _, asset_id, free, value in records})
+            )
+        return points
+
+
+_stores: Dict[str, HistoryStore] = {}
+# Stores are opened from worker threads, see :func:`get_store`
+_stores_lock = threading.Lock()
+
+
+def get_store(account_id: str, directory: str = HISTORY_DIR) -> HistoryStore:
+    """History store of an account, one directory per account id.
+
+    Opening a store reads its files, call this from a worker thread
+    (``asyncio.to_thread``) rather than the event loop.
+
+    :param account_id: Account id, see :func:`accounts.account_id`
+    :param directory: Directory holding every account's store
+    """
+    with _stores_lock:
+        store = _stores.get(account_id)
+        if store is None:
+            store = _stores[account_id] = HistoryStore(os.path.join(directory, account_id))
+        return store
+
+
+class HistorySampler:
+    """Records the portfolio of every configured account every ``interval`` seconds.
+
+    Samples use background priority, so they are skipped rather than
+    delaying users when the rate limit budget runs low.
+    """
+
+    def __init__(self, registry: ClientRegistry, interval: float = HISTORY_INTERVAL):
+        self.registry = registry
+        self.interval = interval
+        self._clients: Dict[Optional[str], BinanceClient] = {}
+
+    def _client(self, credentials: Credentials) -> BinanceClient:
+        client = self._clients.get(credentials.api_key)
+        if client is None:
+            client = self._clients[credentials.api_key] = BinanceClient(
+                api_key=credentials.api_key,
+                api_secret=credentials.api_secret,
+                connector=self.registry.connector,
+            )
+        return client
+
+    async def sample(self, credentials: Credentials, timestamp: int) -> None:
+        client = self._client(credentials)
+        user_assets = await client.get_user_assets(priority=Priority.BACKGROUND)
+        pairs = [utils.pair_ticker(a.symbol, USDT) for a in user_assets if a.symbol != USDT]
+        price_data = market_stream.book.fresh(pairs)
+        missing = [pair for pair in pairs if pair not in price_data]
+        if missing:
+            price_data.update(
+                await client.get_24hr_price_data(missing, priority=Priority.BACKGROUND)
+            )
+        frame = PortfolioFrame.build(user_assets, price_data)
+        # Opening the store and appending touch the disk, keep them off the event loop
+        await asyncio.to_thread(
+            lambda: get_store(credentials.id).record(
+                timestamp, frame.symbols, frame.free, frame.balance
+            )
+        )
+
+    async def run(self) -> None:
+        """Sample on every multiple of ``interval`` until cancelled."""
+        try:
+            while True:
+                await asyncio.sleep(self.interval - time.time() % self.interval)
+                timestamp = int(time.time())
+                for credentials in self.registry.accounts():
+                    try:
+                        await self.sample(credentials, timestamp)
+                    except RequestShed:
+                        logger.info(f"History sample of {credentials.name} skipped, rate limit budget low")
+                    except Exception as e:
+                        logger.warning(f"History sample of {credentials.name} failed: {e}")
+        finally:
+            for client in self._clients.values():
+                await client.close()
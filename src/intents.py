@@ -0,0 +1,81 @@
+import secrets
+import time
+from collections import OrderedDict
+from decimal import Decimal
+from os import getenv
+from typing import Any, Optional, Tuple
+
+# Seconds a previewed order can still be confirmed
+INTENT_TTL = float(getenv("ORDER_INTENT_TTL", "120"))
+INTENT_STORE_SIZE = int(getenv("ORDER_INTENT_STORE_SIZE", "10000"))
+
+
+class OrderIntent:
+    """An order the user has previewed but not confirmed yet."""
+
+    __slots__ = ("symbol", "order_type", "quantity", "price")
+
+    def __init__(
+        self, symbol: str, order_type: str, quantity: Decimal, price: Optional[Decimal] = None
+    ):
+        self.symbol = symbol
+        self.order_type = order_type
+        self.quantity = quantity
+        self.price = price
+
+
+class IntentStore:
+    """Pending confirmations keyed by short opaque tokens.
+
+    Confirm buttons carry only the token, which stays far below Telegram's
+    64 byte ``callback_data`` limit. :meth:`claim` removes the intent as it
+    returns it, so each one is executed at most once no matter how often
+    the button is tapped. Intents expire after ``ttl`` seconds.
+    """
+
+    def __init__(self, ttl: float = INTENT_TTL, maxsize: int = INTENT_STORE_SIZE):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._intents: "OrderedDict[str, Tuple[float, int, Any]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._intents)
+
+    def _evict(self, now: float) -> None:
+        # Intents are stored in creation order, so expired ones are at the front
+        while self._intents:
+            created_at = next(iter(self._intents.values()))[0]
+            if now - created_at <= self.ttl and len(self._intents) <= self.maxsize:
+                break
+            self._intents.popitem(last=False)
+
+    def create(self, user_id: int, intent: Any) -> str:
+        """Store an intent for a user.
+
+        :param user_id: Telegram user allowed to confirm it
+        :param intent: Order intent, or any payload to confirm
+        :return: Token to put in the confirm button
+        """
+        now = time.monotonic()
+        token = secrets.token_urlsafe(8)
+        self._intents[token] = (now, user_id, intent)
+        self._evict(now)
+        return token
+
+    def claim(self, token: str, user_id: int) -> Optional[Any]:
+        """Take the intent for a token, it can't be claimed again afterwards.
+
+        :param token: Token from the confirm button
+        :param user_id: Telegram user confirming
+        :return: The intent, or None if it expired, was claimed or belongs to someone else
+        """
+        entry = self._intents.get(token)
+        if entry is None or entry[1] != user_id:
+            return None
+        del self._intents[token]
+        if time.monotonic() - entry[0] > self.ttl:
+            return None
+        return entry[2]
+
+
+intents = IntentStore()
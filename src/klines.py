@@ -0,0 +1,273 @@
+import asyncio
+import logging
+import os
+import struct
+import time
+from array import array
+from collections import OrderedDict
+from math import fsum
+from os import getenv
+from typing import Dict, List, NamedTuple, Optional
+
+from binance_api import BinanceClient
+
+KLINES_DIR = getenv("KLINES_DIR", "klines")
+KLINE_INTERVAL = getenv("KLINE_INTERVAL", "1h")
+# Candles kept per symbol, enough to warm up the indicators
+KLINE_HISTORY = int(getenv("KLINE_HISTORY", "500"))
+# Views within this many seconds of the last fetch skip the delta request
+KLINE_REFRESH = float(getenv("KLINE_REFRESH", "30"))
+KLINE_CACHE_SIZE = int(getenv("KLINE_CACHE_SIZE", "256"))
+
+logger = logging.getLogger(__name__)
+
+INTERVAL_MS = {
+    "1m": 60_000,
+    "5m": 300_000,
+    "15m": 900_000,
+    "1h": 3_600_000,
+    "4h": 14_400_000,
+    "1d": 86_400_000,
+}
+VWAP_WINDOW = 24
+ATR_PERIOD = 14
+RSI_PERIOD = 14
+
+# open time (ms), open, high, low, close, volume, quote volume
+RECORD = struct.Struct("<q6d")
+
+
+class KlineSeries:
+    """Candles of one symbol as columns, oldest first."""
+
+    __slots__ = (
+        "open_time", "open", "high", "low", "close", "volume", "quote_volume", "checked_at"
+    )
+
+    def __init__(self):
+        self.open_time = array("q")
+        self.open = array("d")
+        self.high = array("d")
+        self.low = array("d")
+        self.close = array("d")
+        self.volume = array("d")
+        self.quote_volume = array("d")
+        self.checked_at = 0.0
+
+    def __len__(self) -> int:
+        return len(self.open_time)
+
+    def columns(self) -> List[array]:
+        return [
+            self.open_time, self.open, self.high, self.low,
+            self.close, self.volume, self.quote_volume,
+        ]
+
+    def append(self, record: tuple) -> None:
+        for column, value in zip(self.columns(), record):
+            column.append(value)
+
+    def drop_last(self) -> None:
+        for column in self.columns():
+            column.pop()
+
+    def trim(self, size: int) -> None:
+        """Keep only the newest ``size`` candles."""
+        excess = len(self) - size
+        if excess > 0:
+            for column in self.columns():
+                del column[:excess]
+
+    def to_bytes(self) -> bytes:
+        return b"".join(RECORD.pack(*record) for record in zip(*self.columns()))
+
+
+class Indicators(NamedTuple):
+    vwap: Optional[float]
+    atr: Optional[float]
+    rsi: Optional[float]
+
+
+def vwap(series: KlineSeries, window: int = VWAP_WINDOW) -> Optional[float]:
+    """Volume weighted average of the typical price over the last ``window`` candles."""
+    high, low, close = series.high[-window:], series.low[-window:], series.close[-window:]
+    volume = series.volume[-window:]
+    total_volume = fsum(volume)
+    if not total_volume:
+        return None
+    return fsum([(h + l + c) / 3 * v for h, l, c, v in zip(high, low, close, volume)]) / total_volume
+
+
+def _wilder(values: List[float], period: int) -> float:
+    average = fsum(values[:period]) / period
+    for value in values[period:]:
+        average = (average * (period - 1) + value) / period
+    return average
+
+
+def atr(series: KlineSeries, period: int = ATR_PERIOD) -> Optional[float]:
+    """Average true range with Wilder smoothing."""
+    high, low, close = series.high, series.low, series.close
+    if len(close) <= period:
+        return None
+    true_range = [
+        max(h - l, abs(h - prev_close), abs(l - prev_close))
+        for h, l, prev_close in zip(high[1:], low[1:], close)
+    ]
+    return _wilder(true_range, period)
+
+
+def rsi(series: KlineSeries, period: int = RSI_PERIOD) -> Optional[float]:
+    """Relative strength index of the close with Wilder smoothing."""
+    close = series.close
+    if len(close) <= period:
+        return None
+    deltas = [b - a for a, b in zip(close, close[1:])]
+    gain = _wilder([d if d > 0 else 0.0 for d in deltas], period)
+    loss = _wilder([-d if d < 0 else 0.0 for d in deltas], period)
+    if not loss:
+        return 100.0
+    return 100 - 100 / (1 + gain / loss)
+
+
+class KlineCache:
+    """Candles per symbol kept in memory and on disk, fetched incrementally.
+
+    A view first loads the symbol's file, then only requests candles from
+    the last cached one onwards. That one is refetched because it may still
+    have been open, and is replaced in place. Views within ``refresh``
+    seconds of the last fetch cost no request at all.
+    """
+
+    def __init__(
+        self,
+        directory: str = KLINES_DIR,
+        interval: str = KLINE_INTERVAL,
+        history: int = KLINE_HISTORY,
+        refresh: float = KLINE_REFRESH,
+        maxsize: int = KLINE_CACHE_SIZE,
+    ):
+        self.directory = directory
+        self.interval = interval
+        self.history = history
+        self.refresh = refresh
+        self.maxsize = maxsize
+        self._series: "OrderedDict[str, KlineSeries]" = OrderedDict()
+        # Per symbol being fetched: its lock and the number of callers using it.
+        # Kept apart from the series LRU so evicting a series never drops a held lock
+        self._locks: Dict[str, list] = {}
+        self.fetched = 0
+
+    def _path(self, symbol: str) -> str:
+        return os.path.join(self.directory, f"{symbol}_{self.interval}.bin")
+
+    def _load(self, symbol: str) -> KlineSeries:
+        series = KlineSeries()
+        try:
+            with open(self._path(symbol), "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return series
+        data = data[:len(data) - len(data) % RECORD.size]
+        for record in RECORD.iter_unpack(data):
+            series.append(record)
+        series.trim(self.history)
+        return series
+
+    def _save(
+        self, symbol: str, series: KlineSeries, new: Optional[int], replaced: bool
+    ) -> None:
+        """Persist the newest ``new`` candles, the first replacing the last stored one if ``replaced``.
+
+        ``new`` of None rewrites the whole file.
+        """
+        path = self._path(symbol)
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        if replaced:
+            size -= RECORD.size
+        if (
+            new is None
+            or not size
+            or new > len(series)
+            or size // RECORD.size + new > 2 * self.history
+        ):
+            # Rewrite the file with just the candles still in memory
+            os.makedirs(self.directory, exist_ok=True)
+            with open(path, "wb") as f:
+                f.write(series.to_bytes())
+            return
+        with open(path, "r+b") as f:
+            f.truncate(size)
+            f.seek(size)
+            f.write(
+                b"".join(RECORD.pack(*record) for record in zip(*(c[-new:] for c in series.columns())))
+            )
+
+    async def _update(self, client: BinanceClient, symbol: str, series: KlineSeries) -> None:
+        now_ms = int(time.time() * 1000)
+        step = INTERVAL_MS[self.interval]
+        start = series.open_time[-1] if series else None
+        if start is not None and now_ms - start > self.history * step:
+            # Too far behind to catch up incrementally, start over
+            series.trim(0)
+            start = None
+
+        rows = await client.get_klines(
+            symbol, self.interval, start_time=start, limit=self.history if start is None else 1000
+        )
+        self.fetched += 1
+        series.checked_at = time.monotonic()
+        if not rows:
+            return
+
+        replaced = bool(series) and rows[0][0] == series.open_time[-1]
+        if replaced:
+            series.drop_last()
+        for row in rows:
+            series.append((
+                row[0], float(row[1]), float(row[2]), float(row[3]),
+                float(row[4]), float(row[5]), float(row[7]),
+            ))
+        series.trim(self.history)
+        # The symbol's lock is held, so the series can't change while it is written
+        await asyncio.to_thread(
+            self._save, symbol, series, len(rows) if start is not None else None, replaced
+        )
+
+    async def get(self, client: BinanceClient, symbol: str) -> KlineSeries:
+        """Candles of a symbol, up to date within ``refresh`` seconds.
+
+        :param client: Client for the delta request
+        :param symbol: Trading pair
+        :return: Cached candle columns
+        """
+        entry = self._locks.get(symbol)
+        if entry is None:
+            entry = self._locks[symbol] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                series = self._series.get(symbol)
+                if series is None:
+                    # File reads stay off the event loop
+                    series = await asyncio.to_thread(self._load, symbol)
+                self._series[symbol] = series
+                self._series.move_to_end(symbol)
+                while len(self._series) > self.maxsize:
+                    self._series.popitem(last=False)
+
+                if time.monotonic() - series.checked_at >= self.refresh:
+                    await self._update(client, symbol, series)
+                return series
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._locks[symbol]
+
+    async def indicators(self, client: BinanceClient, symbol: str) -> Indicators:
+        """VWAP, ATR and RSI of a symbol over the cached candles."""
+        series = await self.get(client, symbol)
+        return Indicators(vwap(series), atr(series), rsi(series))
+
+
+cache = KlineCache()
@@ -0,0 +1,179 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from storage import SharedCache
+
+
+class MarketDataCache:
+    """Bounded per-key TTL cache with single-flight loading.
+
+    Entries are evicted least-recently-used once ``maxsize`` is reached.
+    Concurrent misses for the same key share one in-flight load, so ten
+    callers asking for ``BTCUSDT`` at once cause a single upstream request.
+    With a ``shared`` cache attached (see :meth:`share`), misses are looked
+    up there before loading and loaded values are written through, so other
+    worker processes don't repeat the upstream request either.
+    """
+
+    def __init__(self, ttl: float, maxsize: int, namespace: str = "cache"):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.namespace = namespace
+        self.shared: Optional["SharedCache"] = None
+        self._encode: Callable[[Any], str] = str
+        self._decode: Callable[[str], Any] = str
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value for key if it has not expired."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        stored_at, value = entry
+        if time.monotonic() - stored_at > self.ttl:
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def get_stale(self, key: str) -> Optional[Any]:
+        """Return the cached value for key even if it has expired."""
+        entry = self._entries.get(key)
+        return entry[1] if entry is not None else None
+
+    def put(self, key: str, value: Any, stored_at: Optional[float] = None) -> None:
+        """Cache a value.
+
+        :param stored_at: ``time.monotonic()`` the value was fetched at, now if omitted
+        """
+        if stored_at is None:
+            stored_at = time.monotonic()
+        self._entries[key] = (stored_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def share(
+        self, shared: "SharedCache", encode: Callable[[Any], str], decode: Callable[[str], Any]
+    ) -> None:
+        """Use shared as a second tier between this cache and the loader.
+
+        :param shared: Cache shared between processes
+        :param encode: Serializes a value for the shared cache
+        :param decode: Restores a value read from the shared cache
+        """
+        self.shared = shared
+        self._encode = encode
+        self._decode = decode
+
+    async def _load(
+        self, keys: List[str], loader: Callable[[List[str]], Awaitable[Dict[str, Any]]]
+    ) -> Tuple[Dict[str, Any], Dict[str, float]]:
+        """Load keys from the shared cache, then the loader.
+
+        :return: Values, and for those found in the shared cache the
+            ``time.monotonic()`` they were stored at there
+        """
+        if self.shared is None:
+            return await loader(keys), {}
+        found = await self.shared.get_many(self.namespace, keys)
+        loaded = {key: self._decode(value) for key, (value, _) in found.items()}
+        # Keep only the TTL left in the shared cache, not a fresh one
+        now_wall, now = time.time(), time.monotonic()
+        stored_at = {
+            key: now - (self.ttl - (expires_at - now_wall))
+            for key, (_, expires_at) in found.items()
+        }
+        missing = [key for key in keys if key not in loaded]
+        if missing:
+            fetched = await loader(missing)
+            await self.shared.put_many(
+                self.namespace,
+                {key: self._encode(value) for key, value in fetched.items() if value is not None},
+                self.ttl,
+            )
+            loaded.update(fetched)
+        return loaded, stored_at
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    async def get_many(
+        self,
+        keys: Iterable[str],
+        loader: Callable[[List[str]], Awaitable[Dict[str, Any]]],
+    ) -> Dict[str, Any]:
+        """Resolve keys from the cache, loading the misses in one batch.
+
+        Keys that are already being loaded by another caller are awaited
+        instead of being requested again.
+
+        :param keys: Cache keys to resolve
+        :param loader: Coroutine fetching a batch of keys, returns ``{key: value}``
+        :return: Mapping of every requested key that could be resolved
+        """
+        result: Dict[str, Any] = {}
+        waiting: Dict[str, asyncio.Future] = {}
+        to_load: List[str] = []
+
+        for key in dict.fromkeys(keys):
+            value = self.get(key)
+            if value is not None:
+                self.hits += 1
+                result[key] = value
+            elif key in self._inflight:
+                self.coalesced += 1
+                waiting[key] = self._inflight[key]
+            else:
+                self.misses += 1
+                to_load.append(key)
+
+        if to_load:
+            loop = asyncio.get_running_loop()
+            futures = {key: loop.create_future() for key in to_load}
+            self._inflight.update(futures)
+            try:
+                loaded, stored_at = await self._load(to_load, loader)
+            except BaseException as e:
+                for future in futures.values():
+                    if not future.done():
+                        future.set_exception(e)
+                        # Mark retrieved so unawaited failures are not logged
+                        future.exception()
+                raise
+            else:
+                for key, future in futures.items():
+                    value = loaded.get(key)
+                    if value is not None:
+                        self.put(key, value, stored_at.get(key))
+                        result[key] = value
+                    future.set_result(value)
+            finally:
+                for key in to_load:
+                    self._inflight.pop(key, None)
+
+        for key, future in waiting.items():
+            value = await future
+            if value is not None:
+                result[key] = value
+
+        return result
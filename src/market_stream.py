@@ -0,0 +1,232 @@
+import asyncio
+import json
+import logging
+import time
+from decimal import Decimal
+from os import getenv
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+import aiohttp
+
+MARKET_STREAM_ENABLED = getenv("MARKET_STREAM_ENABLED", "true").lower() == "true"
+STREAM_URL = getenv("BINANCE_STREAM_URL", "wss://stream.binance.com:9443")
+# Book data older than this (no stream traffic) is treated as stale
+STALE_AFTER = float(getenv("MARKET_STREAM_STALE_AFTER", "10"))
+MAX_RECONNECT_DELAY = float(getenv("MARKET_STREAM_MAX_RECONNECT_DELAY", "60"))
+
+logger = logging.getLogger(__name__)
+
+
+class TickerEntry:
+    """Live market data for one symbol, as pushed by the market streams.
+
+    Raw string values from the stream are kept as-is and only converted to
+    ``Decimal`` when read. Attribute names match ``LazyTicker24hrData`` so an
+    entry can be used wherever the REST ticker model is expected.
+    """
+
+    __slots__ = (
+        "symbol", "_close", "_open", "_bid", "_bid_qty", "_ask", "_ask_qty",
+        "ticker_at", "book_at",
+    )
+
+    def __init__(self, symbol: str):
+        self.symbol = symbol
+        self._close = self._open = None
+        self._bid = self._bid_qty = self._ask = self._ask_qty = None
+        self.ticker_at = 0.0
+        self.book_at = 0.0
+
+    @property
+    def last_price(self) -> Decimal:
+        return Decimal(self._close)
+
+    @property
+    def price_change(self) -> Decimal:
+        return Decimal(self._close) - Decimal(self._open)
+
+    @property
+    def price_change_percent(self) -> Decimal:
+        open_price = Decimal(self._open)
+        if not open_price:
+            return Decimal("0")
+        return (Decimal(self._close) - open_price) / open_price * 100
+
+    @property
+    def bid_price(self) -> Decimal:
+        return Decimal(self._bid)
+
+    @property
+    def bid_qty(self) -> Decimal:
+        return Decimal(self._bid_qty)
+
+    @property
+    def ask_price(self) -> Decimal:
+        return Decimal(self._ask)
+
+    @property
+    def ask_qty(self) -> Decimal:
+        return Decimal(self._ask_qty)
+
+
+class TickerBook:
+    """In-memory book of last price, best bid/ask and 24h change per symbol."""
+
+    def __init__(self, stale_after: float = STALE_AFTER):
+        self.stale_after = stale_after
+        self.entries: Dict[str, TickerEntry] = {}
+        self.connected_at = 0.0
+        self.last_message_at = 0.0
+        # Called with every batch of mini ticker events after it is applied
+        self.listeners: List[Callable[[List[dict]], None]] = []
+
+    def _entry(self, symbol: str) -> TickerEntry:
+        entry = self.entries.get(symbol)
+        if entry is None:
+            entry = self.entries[symbol] = TickerEntry(symbol)
+        return entry
+
+    def apply_mini_ticker(self, event: dict, now: float) -> None:
+        entry = self._entry(event["s"])
+        entry._close = event["c"]
+        entry._open = event["o"]
+        entry.ticker_at = now
+
+    def apply_book_ticker(self, event: dict, now: float) -> None:
+        entry = self._entry(event["s"])
+        entry._bid = event["b"]
+        entry._bid_qty = event["B"]
+        entry._ask = event["a"]
+        entry._ask_qty = event["A"]
+        entry.book_at = now
+
+    def mark_connected(self) -> None:
+        self.connected_at = self.last_message_at = time.monotonic()
+
+    def is_live(self) -> bool:
+        return time.monotonic() - self.last_message_at <= self.stale_after
+
+    def get(self, symbol: str) -> Optional[TickerEntry]:
+        """Return the entry for symbol if it was filled by the current live connection."""
+        if not self.is_live():
+            return None
+        entry = self.entries.get(symbol)
+        if (
+            entry is None
+            or entry.ticker_at < self.connected_at
+            or entry.book_at < self.connected_at
+        ):
+            return None
+        return entry
+
+    def fresh(self, symbols: Iterable[str]) -> Dict[str, TickerEntry]:
+        """Return entries for every symbol that has fresh data in the book."""
+        if not self.is_live():
+            return {}
+        result = {}
+        for symbol in symbols:
+            entry = self.get(symbol)
+            if entry is not None:
+                result[symbol] = entry
+        return result
+
+
+class MarketStream:
+    """Background consumer of the combined ``!miniTicker@arr`` and ``bookTicker`` streams.
+
+    The all-market mini ticker stream is always subscribed; per-symbol book
+    ticker streams are added with :meth:`track`. On disconnect the stream
+    reconnects with exponential backoff and resubscribes every tracked symbol.
+    """
+
+    def __init__(self, book: TickerBook, url: str = STREAM_URL):
+        self.book = book
+        self.url = url.rstrip("/")
+        self._symbols: Set[str] = set()
+        self._ws: Optional[aiohttp.ClientWebSocketResponse] = None
+        self._request_id = 0
+        self._stopped = asyncio.Event()
+
+    def track(self, symbols: Iterable[str]) -> None:
+        """Subscribe to book ticker updates for symbols not tracked yet."""
+        new = {s for s in symbols if s} - self._symbols
+        if not new:
+            return
+        self._symbols |= new
+        if self._ws is not None and not self._ws.closed:
+            asyncio.ensure_future(self._subscribe(sorted(new)))
+
+    async def _subscribe(self, symbols: List[str]) -> None:
+        if not symbols or self._ws is None or self._ws.closed:
+            return
+        # Binance caps the number of streams per SUBSCRIBE message
+        for i in range(0, len(symbols), 200):
+            self._request_id += 1
+            await self._ws.send_str(json.dumps({
+                "method": "SUBSCRIBE",
+                "params": [f"{s.lower()}@bookTicker" for s in symbols[i:i + 200]],
+                "id": self._request_id,
+            }))
+
+    def _handle(self, raw: str) -> None:
+        message = json.loads(raw)
+        stream, data = message.get("stream"), message.get("data")
+        if stream is None:
+            # Subscription acknowledgements carry only ``result`` and ``id``
+            return
+        now = time.monotonic()
+        self.book.last_message_at = now
+        if stream == "!miniTicker@arr":
+            for event in data:
+                self.book.apply_mini_ticker(event, now)
+            for listener in self.book.listeners:
+                try:
+                    listener(data)
+                except Exception:
+                    logger.exception("Mini ticker listener failed")
+        elif stream.endswith("@bookTicker"):
+            self.book.apply_book_ticker(data, now)
+
+    async def run(self) -> None:
+        """Consume the streams until :meth:`stop` is called."""
+        delay = 1.0
+        async with aiohttp.ClientSession() as session:
+            while not self._stopped.is_set():
+                try:
+                    async with session.ws_connect(
+                        f"{self.url}/stream?streams=!miniTicker@arr", heartbeat=30
+                    ) as ws:
+                        self._ws = ws
+                        self.book.mark_connected()
+                        await self._subscribe(sorted(self._symbols))
+                        logger.info("Market stream connected")
+                        delay = 1.0
+                        async for msg in ws:
+                            if msg.type == aiohttp.WSMsgType.TEXT:
+                                self._handle(msg.data)
+                            elif msg.type == aiohttp.WSMsgType.ERROR:
+                                break
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.warning(f"Market stream error: {e}")
+                finally:
+                    self._ws = None
+
+                if self._stopped.is_set():
+                    break
+                logger.info(f"Market stream disconnected, reconnecting in {delay:.0f}s")
+                try:
+                    await asyncio.wait_for(self._stopped.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                delay = min(delay * 2, MAX_RECONNECT_DELAY)
+
+    async def stop(self) -> None:
+        self._stopped.set()
+        if self._ws is not None:
+            await self._ws.close()
+
+
+book = TickerBook()
+stream = MarketStream(book)
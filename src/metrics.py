@@ -0,0 +1,230 @@
+import asyncio
+import functools
+import logging
+import time
+from bisect import bisect_left
+from os import getenv
+from typing import Any, Awaitable, Callable, Dict, List, Sequence, Tuple
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+from aiohttp import web
+
+from scheduler import RequestShed
+
+# Port of the local Prometheus endpoint; metrics are not recorded when unset
+METRICS_PORT = int(getenv("METRICS_PORT", "0"))
+METRICS_HOST = getenv("METRICS_HOST", "127.0.0.1")
+# "low" keeps only counts and sums per label, "full" adds latency buckets
+METRICS_MODE = getenv("METRICS_MODE", "low")
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Labels = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Labels, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    """Monotonic counter per label set."""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.values: Dict[Labels, float] = {}
+
+    def inc(self, labels: Labels = (), amount: float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for labels, value in self.values.items():
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+class Histogram:
+    """Observations per label set, as cumulative buckets plus count and sum.
+
+    Without buckets only the count and sum are kept, which is enough for
+    average latency and costs one dict lookup per observation.
+    """
+
+    def __init__(
+        self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = ()
+    ):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # Per label set: [count per bucket..., +Inf count, sum]
+        self.values: Dict[Labels, List[float]] = {}
+
+    def observe(self, labels: Labels, value: float) -> None:
+        row = self.values.get(labels)
+        if row is None:
+            row = self.values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        if self.buckets:
+            row[bisect_left(self.buckets, value)] += 1
+        else:
+            row[0] += 1
+        row[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, row in self.values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), row):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                bucket_labels = _format_labels(self.labelnames, labels, f'le="{le}"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            suffix = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_count{suffix} {cumulative}")
+            lines.append(f"{self.name}_sum{suffix} {row[-1]}")
+        return lines
+
+
+class MetricsRegistry:
+    """Metrics of this process, rendered in the Prometheus text format.
+
+    Besides counters and histograms, collectors registered with
+    :meth:`collect` are called on every scrape and their ``stats()`` dicts
+    are exported as gauges, so existing counters need no extra bookkeeping.
+    """
+
+    def __init__(self, enabled: bool = bool(METRICS_PORT), mode: str = METRICS_MODE):
+        self.enabled = enabled
+        buckets = LATENCY_BUCKETS if mode == "full" else ()
+        self.handler_latency = Histogram(
+            "bot_handler_seconds", "Handler latency.", ("handler",), buckets
+        )
+        self.handler_errors = Counter(
+            "bot_handler_errors_total", "Handler exceptions.", ("handler", "error")
+        )
+        self.request_latency = Histogram(
+            "binance_request_seconds", "Binance REST latency per endpoint.",
+            ("method", "endpoint"), buckets,
+        )
+        self.request_weight = Counter(
+            "binance_request_weight_total", "Request weight spent per endpoint.", ("endpoint",)
+        )
+        self.request_errors = Counter(
+            "binance_request_errors_total", "Failed Binance requests per endpoint.",
+            ("endpoint", "error"),
+        )
+        self._metrics = [
+            self.handler_latency, self.handler_errors,
+            self.request_latency, self.request_weight, self.request_errors,
+        ]
+        self._collectors: List[Tuple[str, Callable[[], Dict[str, float]]]] = []
+
+    def collect(self, prefix: str, stats: Callable[[], Dict[str, float]]) -> None:
+        """Export the values returned by ``stats`` as ``{prefix}_{key}`` gauges on every scrape."""
+        self._collectors.append((prefix, stats))
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Current values of every collector, by prefix."""
+        result = {}
+        for prefix, stats in self._collectors:
+            try:
+                result[prefix] = stats()
+            except Exception as e:
+                logger.warning(f"Metrics collector {prefix} failed: {e}")
+        return result
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for prefix, values in self.stats().items():
+            for key, value in values.items():
+                lines.append(f"# TYPE {prefix}_{key} gauge")
+                lines.append(f"{prefix}_{key} {float(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+
+def instrument_request(request: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+    """Record latency, weight and errors of ``BinanceClient._request`` per endpoint."""
+
+    @functools.wraps(request)
+    async def wrapper(client, method: str, path: str, *args, weight: int = 1, **kwargs) -> Any:
+        if not registry.enabled:
+            return await request(client, method, path, *args, weight=weight, **kwargs)
+        started = time.perf_counter()
+        try:
+            return await request(client, method, path, *args, weight=weight, **kwargs)
+        except RequestShed:
+            # Never sent, so no weight was spent
+            registry.request_errors.inc((path, "RequestShed"))
+            weight = 0
+            raise
+        except Exception as e:
+            code = getattr(e, "code", None)
+            registry.request_errors.inc(
+                (path, type(e).__name__ if code is None else f"{type(e).__name__}({code})")
+            )
+            raise
+        finally:
+            registry.request_weight.inc((path,), weight)
+            registry.request_latency.observe((method, path), time.perf_counter() - started)
+
+    return wrapper
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """Record the latency and exceptions of every handler, labelled by handler name."""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        handler_object = data.get("handler")
+        name = handler_object.callback.__name__ if handler_object is not None else "unknown"
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception as e:
+            registry.handler_errors.inc((name, type(e).__name__))
+            raise
+        finally:
+            registry.handler_latency.observe((name,), time.perf_counter() - started)
+
+
+async def serve(host: str = METRICS_HOST, port: int = METRICS_PORT) -> None:
+    """Serve ``GET /metrics`` and the collector values as JSON on ``GET /stats`` until cancelled."""
+
+    async def metrics(request: web.Request) -> web.Response:
+        return web.Response(text=registry.render(), content_type="text/plain", charset="utf-8")
+
+    async def stats(request: web.Request) -> web.Response:
+        return web.json_response(registry.stats())
+
+    app = web.Application()
+    app.router.add_get("/metrics", metrics)
+    app.router.add_get("/stats", stats)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info(f"Metrics available on http://{host}:{port}/metrics")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
@@ -1,5 +1,6 @@
 from decimal import Decimal
 from datetime import datetime
+from typing import Any, Callable, Dict, Optional, Tuple
 
 from pydantic import BaseModel, Field, validate_call
 
@@ -41,6 +42,114 @@ class Ticker24hrData(BaseModel):
             return datetime.fromtimestamp(value / 1000)
         return value
     
+_UNSET = object()
+
+
+def _from_ms(value) -> datetime:
+    return datetime.fromtimestamp(int(value) / 1000)
+
+
+class _LazyField:
+    """Descriptor converting one raw field of a lazy model on first access."""
+
+    __slots__ = ("index", "convert")
+
+    def __init__(self, index: int, convert: Optional[Callable[[Any], Any]] = None):
+        self.index = index
+        self.convert = convert
+
+    def __get__(self, obj, owner=None):
+        if obj is None:
+            return self
+        if self.convert is None:
+            return obj._raw[self.index]
+        value = obj._parsed[self.index]
+        if value is _UNSET:
+            value = obj._parsed[self.index] = self.convert(obj._raw[self.index])
+        return value
+
+
+class LazyModel:
+    """Compact read-only model over the raw values of a Binance JSON object.
+
+    Raw values are kept in a tuple and only converted (e.g. to ``Decimal``)
+    on first access, so fields that are never read cost nothing.
+    Subclasses list the JSON keys in ``_keys`` with matching ``_defaults``
+    and declare one ``_LazyField`` per key, in the same order.
+    """
+
+    __slots__ = ("_raw", "_parsed")
+    _keys: Tuple[str, ...] = ()
+    _defaults: Tuple[Any, ...] = ()
+
+    def __init__(self, raw: Tuple[Any, ...]):
+        self._raw = raw
+        self._parsed = [_UNSET] * len(raw)
+
+    @classmethod
+    def from_json(cls, data: Dict[str, Any]):
+        get = data.get
+        return cls(tuple(get(key, default) for key, default in zip(cls._keys, cls._defaults)))
+
+    def to_json(self) -> Dict[str, Any]:
+        """Raw values keyed by their JSON keys, the inverse of :meth:`from_json`."""
+        return dict(zip(self._keys, self._raw))
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{k}={v!r}" for k, v in zip(self._keys, self._raw))
+        return f"{type(self).__name__}({fields})"
+
+
+class LazyUserAsset(LazyModel):
+    """Lean counterpart of ``UserAsset``."""
+
+    __slots__ = ()
+    _keys = ("asset", "free", "locked", "freeze", "withdrawing", "btcValuation")
+    _defaults = (None, "0", "0", "0", "0", "0")
+
+    symbol = _LazyField(0)
+    free = _LazyField(1, Decimal)
+    locked = _LazyField(2, Decimal)
+    freeze = _LazyField(3, Decimal)
+    withdrawing = _LazyField(4, Decimal)
+    btc_valuation = _LazyField(5, Decimal)
+
+
+class LazyTicker24hrData(LazyModel):
+    """Lean counterpart of ``Ticker24hrData``."""
+
+    __slots__ = ()
+    _keys = (
+        "symbol", "priceChange", "priceChangePercent", "weightedAvgPrice",
+        "prevClosePrice", "lastPrice", "lastQty", "bidPrice", "bidQty", "askPrice",
+        "askQty", "openPrice", "highPrice", "lowPrice", "volume", "quoteVolume",
+        "openTime", "closeTime", "firstId", "lastId", "count",
+    )
+    _defaults = (None,) * len(_keys)
+
+    symbol = _LazyField(0)
+    price_change = _LazyField(1, Decimal)
+    price_change_percent = _LazyField(2, Decimal)
+    weighted_avg_price = _LazyField(3, Decimal)
+    prev_close_price = _LazyField(4, Decimal)
+    last_price = _LazyField(5, Decimal)
+    last_qty = _LazyField(6, Decimal)
+    bid_price = _LazyField(7, Decimal)
+    bid_qty = _LazyField(8, Decimal)
+    ask_price = _LazyField(9, Decimal)
+    ask_qty = _LazyField(10, Decimal)
+    open_price = _LazyField(11, Decimal)
+    high_price = _LazyField(12, Decimal)
+    low_price = _LazyField(13, Decimal)
+    volume = _LazyField(14, Decimal)
+    quote_volume = _LazyField(15, Decimal)
+    open_time = _LazyField(16, _from_ms)
+    close_time = _LazyField(17, _from_ms)
+    first_id = _LazyField(18, int)
+    last_id = _LazyField(19, int)
+    count = _LazyField(20, int)
+
+
 class WalletItem(BaseModel):
     symbol: str
     free: Decimal
@@ -0,0 +1,331 @@
+import asyncio
+import json
+import logging
+import time
+from array import array
+from bisect import bisect_left
+from itertools import accumulate
+from os import getenv
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import aiohttp
+
+from binance_api import BinanceClient
+from market_stream import MAX_RECONNECT_DELAY, STREAM_URL
+
+# Price levels per side fetched with every snapshot
+DEPTH_LIMIT = int(getenv("ORDER_BOOK_DEPTH", "500"))
+# Books not read for this many seconds are unsubscribed
+ORDER_BOOK_IDLE = float(getenv("ORDER_BOOK_IDLE", "300"))
+MAX_ORDER_BOOKS = int(getenv("MAX_ORDER_BOOKS", "50"))
+# Seconds a preview waits for a newly tracked book before using a plain snapshot
+SYNC_TIMEOUT = float(getenv("ORDER_BOOK_SYNC_TIMEOUT", "3"))
+# Seconds before a book whose snapshot failed is synced again
+RESYNC_DELAY = 5.0
+
+logger = logging.getLogger(__name__)
+
+
+class FillEstimate(NamedTuple):
+    quantity: float
+    filled: float
+    average_price: float
+    worst_price: float
+    best_price: float
+    levels: int
+
+    @property
+    def notional(self) -> float:
+        return self.filled * self.average_price
+
+    @property
+    def slippage(self) -> float:
+        """Shortfall of the average price against the best price, in percent."""
+        return abs(self.best_price - self.average_price) / self.best_price * 100
+
+
+def estimate_fill(prices: array, qtys: array, quantity: float) -> Optional[FillEstimate]:
+    """Walk one side of the book with a market order of ``quantity``.
+
+    Cumulative quantity and notional are computed for every level at once,
+    then the level the order ends on is found with a binary search.
+
+    :param prices: Level prices, best first
+    :param qtys: Level quantities
+    :param quantity: Order quantity in the base asset
+    :return: Fill estimate, or None if that side of the book is empty
+    """
+    if not prices or quantity <= 0:
+        return None
+    cum_qty = list(accumulate(qtys))
+    cum_notional = list(accumulate(p * q for p, q in zip(prices, qtys)))
+    last = bisect_left(cum_qty, quantity)
+    if last == len(cum_qty):
+        # Deeper than the book, fill what is there
+        filled = cum_qty[-1]
+        notional = cum_notional[-1]
+        last -= 1
+    else:
+        filled = quantity
+        before = cum_qty[last - 1] if last else 0.0
+        notional = (cum_notional[last - 1] if last else 0.0) + (quantity - before) * prices[last]
+    return FillEstimate(
+        quantity, filled, notional / filled, prices[last], prices[0], last + 1
+    )
+
+
+class LocalOrderBook:
+    """Mirror of one symbol's order book, a snapshot kept current by diff events.
+
+    Levels are kept in dicts keyed by price for cheap updates and only
+    sorted into columns when read.
+    """
+
+    __slots__ = ("symbol", "bids", "asks", "last_update_id", "buffer", "synced", "read_at")
+
+    def __init__(self, symbol: str):
+        self.symbol = symbol
+        self.bids: Dict[float, float] = {}
+        self.asks: Dict[float, float] = {}
+        self.last_update_id = 0
+        # Diff events received before the snapshot they apply to
+        self.buffer: List[dict] = []
+        self.synced = asyncio.Event()
+        self.read_at = time.monotonic()
+
+    @staticmethod
+    def _update(side: Dict[float, float], levels: List[List[str]]) -> None:
+        for price, qty in levels:
+            if float(qty):
+                side[float(price)] = float(qty)
+            else:
+                side.pop(float(price), None)
+
+    def reset(self) -> None:
+        """Drop the book, it is rebuilt from the next snapshot."""
+        self.bids.clear()
+        self.asks.clear()
+        self.buffer.clear()
+        self.synced.clear()
+
+    def apply_snapshot(self, snapshot: dict) -> bool:
+        """Load a snapshot and replay the buffered events after it.
+
+        :return: False if the snapshot is older than the buffered events and must be refetched
+        """
+        last_update_id = snapshot["lastUpdateId"]
+        pending = [e for e in self.buffer if e["u"] > last_update_id]
+        if pending and pending[0]["U"] > last_update_id + 1:
+            return False
+        self.bids.clear()
+        self.asks.clear()
+        self._update(self.bids, snapshot["bids"])
+        self._update(self.asks, snapshot["asks"])
+        self.last_update_id = last_update_id
+        self.buffer.clear()
+        for event in pending:
+            self.apply_diff(event)
+        self.synced.set()
+        return True
+
+    def apply_diff(self, event: dict) -> bool:
+        """Apply a diff event, returns False on a sequence gap."""
+        if event["u"] <= self.last_update_id:
+            return True
+        if event["U"] > self.last_update_id + 1:
+            return False
+        self._update(self.bids, event["b"])
+        self._update(self.asks, event["a"])
+        self.last_update_id = event["u"]
+        return True
+
+    def side(self, bids: bool) -> Tuple[array, array]:
+        """Price and quantity columns of one side, best price first."""
+        levels = sorted((self.bids if bids else self.asks).items(), reverse=bids)
+        return array("d", [p for p, _ in levels]), array("d", [q for _, q in levels])
+
+    def estimate_sell(self, quantity: float) -> Optional[FillEstimate]:
+        """Estimate a market sell of ``quantity`` against the bids."""
+        self.read_at = time.monotonic()
+        return estimate_fill(*self.side(bids=True), quantity)
+
+
+class OrderBooks:
+    """Local order books of the symbols users are trading.
+
+    A symbol is tracked from its first :meth:`get`: its ``@depth`` diff
+    stream is subscribed, events are buffered until a REST snapshot is
+    loaded, then applied in sequence. A gap in the update ids, or a
+    reconnect, drops the book and resyncs it from a fresh snapshot. Books
+    idle for ``idle`` seconds are unsubscribed.
+    """
+
+    def __init__(
+        self,
+        url: str = STREAM_URL,
+        depth: int = DEPTH_LIMIT,
+        idle: float = ORDER_BOOK_IDLE,
+        maxsize: int = MAX_ORDER_BOOKS,
+    ):
+        self.url = url.rstrip("/")
+        self.depth = depth
+        self.idle = idle
+        self.maxsize = maxsize
+        self.books: Dict[str, LocalOrderBook] = {}
+        self._client: Optional[BinanceClient] = None
+        self._syncing: Dict[str, asyncio.Task] = {}
+        self._ws: Optional[aiohttp.ClientWebSocketResponse] = None
+        self._request_id = 0
+        self._stopped = asyncio.Event()
+        self.resyncs = 0
+
+    async def _send(self, method: str, symbols: List[str]) -> None:
+        if not symbols or self._ws is None or self._ws.closed:
+            return
+        for i in range(0, len(symbols), 200):
+            self._request_id += 1
+            await self._ws.send_str(json.dumps({
+                "method": method,
+                "params": [f"{s.lower()}@depth@100ms" for s in symbols[i:i + 200]],
+                "id": self._request_id,
+            }))
+
+    def _track(self, symbol: str) -> LocalOrderBook:
+        book = self.books.get(symbol)
+        if book is None:
+            book = self.books[symbol] = LocalOrderBook(symbol)
+            asyncio.ensure_future(self._send("SUBSCRIBE", [symbol]))
+            if len(self.books) > self.maxsize:
+                oldest = min(self.books.values(), key=lambda b: b.read_at)
+                self._untrack(oldest.symbol)
+        return book
+
+    def _untrack(self, symbol: str) -> None:
+        self.books.pop(symbol, None)
+        task = self._syncing.pop(symbol, None)
+        if task is not None:
+            task.cancel()
+        asyncio.ensure_future(self._send("UNSUBSCRIBE", [symbol]))
+
+    async def _sync(self, book: LocalOrderBook) -> None:
+        try:
+            for attempt in range(3):
+                snapshot = await self._client.get_order_book(book.symbol, self.depth)
+                if self.books.get(book.symbol) is not book:
+                    return
+                if book.apply_snapshot(snapshot):
+                    return
+                # Snapshot predates the buffered events, try a newer one
+                await asyncio.sleep(0.5 * (attempt + 1))
+            logger.warning(f"Order book of {book.symbol} could not be synced")
+            book.reset()
+            await asyncio.sleep(RESYNC_DELAY)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Order book snapshot of {book.symbol} failed: {e}")
+            book.reset()
+            # Events keep being buffered meanwhile, the next one starts over
+            await asyncio.sleep(RESYNC_DELAY)
+        finally:
+            self._syncing.pop(book.symbol, None)
+
+    def _handle(self, raw: str) -> None:
+        message = json.loads(raw)
+        data = message.get("data")
+        if data is None:
+            return
+        book = self.books.get(data["s"])
+        if book is None:
+            return
+        if not book.synced.is_set():
+            book.buffer.append(data)
+            if book.symbol not in self._syncing and self._client is not None:
+                self._syncing[book.symbol] = asyncio.create_task(self._sync(book))
+        elif not book.apply_diff(data):
+            logger.info(f"Order book of {book.symbol} missed updates, resyncing")
+            self.resyncs += 1
+            book.reset()
+            book.buffer.append(data)
+            self._syncing[book.symbol] = asyncio.create_task(self._sync(book))
+
+    def sweep(self) -> None:
+        now = time.monotonic()
+        for symbol in [s for s, b in self.books.items() if now - b.read_at > self.idle]:
+            self._untrack(symbol)
+
+    async def get(self, client: BinanceClient, symbol: str) -> LocalOrderBook:
+        """Order book of a symbol, synced from the stream when it is running.
+
+        :param client: Client for a fallback snapshot
+        :param symbol: Trading pair
+        :return: Live book, or a one-off snapshot if the live one isn't ready in time
+        """
+        if self._ws is not None and not self._ws.closed:
+            self.sweep()
+            book = self._track(symbol)
+            book.read_at = time.monotonic()
+            try:
+                await asyncio.wait_for(book.synced.wait(), timeout=SYNC_TIMEOUT)
+                return book
+            except asyncio.TimeoutError:
+                pass
+        snapshot = LocalOrderBook(symbol)
+        snapshot.apply_snapshot(await client.get_order_book(symbol, self.depth))
+        return snapshot
+
+    async def run(self, client: BinanceClient) -> None:
+        """Consume the depth streams until :meth:`stop` is called.
+
+        :param client: Client for the snapshots
+        """
+        self._client = client
+        delay = 1.0
+        async with aiohttp.ClientSession() as session:
+            while not self._stopped.is_set():
+                try:
+                    async with session.ws_connect(f"{self.url}/stream", heartbeat=30) as ws:
+                        self._ws = ws
+                        for task in self._syncing.values():
+                            task.cancel()
+                        for book in self.books.values():
+                            # Events were lost while disconnected
+                            book.reset()
+                        await self._send("SUBSCRIBE", sorted(self.books))
+                        delay = 1.0
+                        async for msg in ws:
+                            if msg.type == aiohttp.WSMsgType.TEXT:
+                                self._handle(msg.data)
+                            elif msg.type == aiohttp.WSMsgType.ERROR:
+                                break
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.warning(f"Depth stream error: {e}")
+                finally:
+                    self._ws = None
+
+                if self._stopped.is_set():
+                    break
+                try:
+                    await asyncio.wait_for(self._stopped.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                delay = min(delay * 2, MAX_RECONNECT_DELAY)
+
+    async def stop(self) -> None:
+        self._stopped.set()
+        for task in self._syncing.values():
+            task.cancel()
+        if self._ws is not None:
+            await self._ws.close()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "books": len(self.books),
+            "synced": sum(1 for b in self.books.values() if b.synced.is_set()),
+            "resyncs": self.resyncs,
+        }
+
+
+books = OrderBooks()
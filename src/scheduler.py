@@ -0,0 +1,159 @@
+import asyncio
+import logging
+import time
+from enum import IntEnum
+from typing import Dict, List, Mapping, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class Priority(IntEnum):
+    """Request priority, lower values are served first."""
+
+    ORDER = 0
+    USER = 1
+    BACKGROUND = 2
+
+
+class RequestShed(Exception):
+    """Raised when a request is dropped to protect the rate limit budget."""
+
+
+class RateBucket:
+    """Usage of one Binance rate limit over fixed windows.
+
+    Usage is counted locally as requests are admitted and corrected from the
+    ``X-MBX-USED-WEIGHT-*`` style header Binance returns with every response.
+    """
+
+    def __init__(self, name: str, limit: int, window: float, header: Optional[str] = None):
+        self.name = name
+        self.limit = limit
+        self.window = window
+        self.header = header
+        self.used = 0
+        self._window_id = 0
+
+    def _roll(self, now: float) -> None:
+        window_id = int(now // self.window)
+        if window_id != self._window_id:
+            self._window_id = window_id
+            self.used = 0
+
+    def remaining(self, now: float) -> int:
+        self._roll(now)
+        return self.limit - self.used
+
+    def fits(self, cost: int, share: float, now: float) -> bool:
+        self._roll(now)
+        return self.used + cost <= self.limit * share
+
+    def consume(self, cost: int, now: float) -> None:
+        self._roll(now)
+        self.used += cost
+
+    def observe(self, used: int, now: float) -> None:
+        """Record the usage reported by Binance for the current window."""
+        self._roll(now)
+        self.used = max(self.used, used)
+
+    def reset_in(self, now: float) -> float:
+        return self.window - now % self.window
+
+
+class RequestScheduler:
+    """Central admission control for every Binance REST request.
+
+    Each request declares its cost per rate limit bucket and a priority.
+    A priority may only use its share of each bucket: order placement can
+    spend the whole budget, user-facing reads keep a reserve for orders and
+    background work keeps a larger one. Requests over their share wait for
+    the next window in priority order; background requests, and user reads
+    that would wait longer than ``max_wait``, are shed with
+    :class:`RequestShed` so callers can serve cached data instead.
+    A 429/418 response blocks every request until its ``Retry-After``.
+    """
+
+    def __init__(
+        self,
+        buckets: List[RateBucket],
+        shares: Mapping[Priority, float],
+        max_wait: float,
+    ):
+        self.buckets: Dict[str, RateBucket] = {b.name: b for b in buckets}
+        self.shares = dict(shares)
+        self.max_wait = max_wait
+        self.blocked_until = 0.0
+        self._waiting: Dict[Priority, int] = {p: 0 for p in Priority}
+        self.admitted = 0
+        self.delayed = 0
+        self.shed = 0
+
+    def _wait_time(
+        self, costs: List[Tuple[RateBucket, int]], priority: Priority, now: float
+    ) -> float:
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        if any(self._waiting[p] for p in Priority if p < priority):
+            # Let higher priority waiters through first
+            return 0.05
+        share = self.shares[priority]
+        return max(
+            (bucket.reset_in(now) for bucket, cost in costs if not bucket.fits(cost, share, now)),
+            default=0.0,
+        )
+
+    async def acquire(self, costs: List[Tuple[RateBucket, int]], priority: Priority) -> None:
+        """Wait until the request fits its priority's budget, then reserve it.
+
+        :param costs: Cost of the request per bucket
+        :param priority: Request priority
+        :raises RequestShed: If the request was dropped instead of queued
+        """
+        delayed = False
+        while True:
+            now = time.time()
+            wait = self._wait_time(costs, priority, now)
+            if wait <= 0:
+                for bucket, cost in costs:
+                    bucket.consume(cost, now)
+                self.admitted += 1
+                return
+            if priority == Priority.BACKGROUND or (
+                priority == Priority.USER and wait > self.max_wait
+            ):
+                self.shed += 1
+                raise RequestShed(f"Rate limit budget low, retry in {wait:.1f}s")
+            if not delayed:
+                delayed = True
+                self.delayed += 1
+            self._waiting[priority] += 1
+            try:
+                await asyncio.sleep(wait)
+            finally:
+                self._waiting[priority] -= 1
+
+    def observe(self, headers: Mapping[str, str], buckets: List[RateBucket]) -> None:
+        """Update bucket usage from response headers."""
+        now = time.time()
+        for bucket in buckets:
+            if bucket.header and bucket.header in headers:
+                bucket.observe(int(headers[bucket.header]), now)
+
+    def backoff(self, retry_after: Optional[str]) -> None:
+        """Block all requests after a 429/418 response."""
+        seconds = float(retry_after) if retry_after else 60.0
+        self.blocked_until = max(self.blocked_until, time.time() + seconds)
+        logger.warning(f"Binance rate limit hit, pausing requests for {seconds:.0f}s")
+
+    def stats(self) -> Dict[str, float]:
+        now = time.time()
+        result = {
+            "admitted": self.admitted,
+            "delayed": self.delayed,
+            "shed": self.shed,
+            "blocked_for": max(0.0, self.blocked_until - now),
+        }
+        for name, bucket in self.buckets.items():
+            result[f"{name}_remaining"] = bucket.remaining(now)
+        return result
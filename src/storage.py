@@ -0,0 +1,146 @@
+import asyncio
+import json
+import sqlite3
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from os import getenv
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, KeyBuilder, StateType, StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+
+# SQLite file shared by every bot worker; FSM state stays in memory if unset
+STORAGE_PATH = getenv("BOT_STORAGE_PATH")
+
+
+class SharedCache(ABC):
+    """String key/value store with per-entry TTL, shared between processes.
+
+    Keys live in namespaces, e.g. one per cached Binance endpoint.
+    """
+
+    @abstractmethod
+    async def get_many(
+        self, namespace: str, keys: Iterable[str]
+    ) -> Dict[str, Tuple[str, float]]:
+        """Unexpired values of the keys that are present, with the unix time each expires at."""
+
+    @abstractmethod
+    async def put_many(self, namespace: str, items: Dict[str, str], ttl: float) -> None:
+        """Store the items, each expiring after ``ttl`` seconds."""
+
+
+class SQLiteStorage(BaseStorage, SharedCache):
+    """FSM storage and shared cache in one SQLite database in WAL mode.
+
+    WAL lets any number of worker processes read while one of them writes,
+    without an external service. Queries run on a dedicated thread so the
+    event loop never blocks on disk.
+    """
+
+    def __init__(self, path: str, key_builder: Optional[KeyBuilder] = None):
+        self.path = path
+        self.key_builder = key_builder or DefaultKeyBuilder(with_bot_id=True, with_destiny=True)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite-storage")
+        self._db: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS kv ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS kv_expires_at ON kv (expires_at)")
+            self._db = db
+        return self._db
+
+    async def _run(self, fn: Callable, *args) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    def _get(self, keys: List[str]) -> Dict[str, str]:
+        db = self._connect()
+        placeholders = ",".join("?" * len(keys))
+        rows = db.execute(
+            f"SELECT key, value FROM kv WHERE key IN ({placeholders})"
+            " AND (expires_at IS NULL OR expires_at > ?)",
+            (*keys, time.time()),
+        )
+        return dict(rows.fetchall())
+
+    def _get_expiring(self, keys: List[str]) -> Dict[str, Tuple[str, float]]:
+        db = self._connect()
+        placeholders = ",".join("?" * len(keys))
+        rows = db.execute(
+            f"SELECT key, value, expires_at FROM kv WHERE key IN ({placeholders})"
+            " AND expires_at > ?",
+            (*keys, time.time()),
+        )
+        return {key: (value, expires_at) for key, value, expires_at in rows.fetchall()}
+
+    def _set(self, items: Dict[str, Optional[str]], expires_at: Optional[float]) -> None:
+        db = self._connect()
+        with db:
+            db.execute("BEGIN IMMEDIATE")
+            for key, value in items.items():
+                if value is None:
+                    db.execute("DELETE FROM kv WHERE key = ?", (key,))
+                else:
+                    db.execute(
+                        "INSERT OR REPLACE INTO kv (key, value, expires_at) VALUES (?, ?, ?)",
+                        (key, value, expires_at),
+                    )
+            if expires_at is not None:
+                db.execute("DELETE FROM kv WHERE expires_at <= ?", (time.time(),))
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        value = state.state if isinstance(state, State) else state
+        await self._run(self._set, {self.key_builder.build(key, "state"): value}, None)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        storage_key = self.key_builder.build(key, "state")
+        return (await self._run(self._get, [storage_key])).get(storage_key)
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        value = json.dumps(data) if data else None
+        await self._run(self._set, {self.key_builder.build(key, "data"): value}, None)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        storage_key = self.key_builder.build(key, "data")
+        value = (await self._run(self._get, [storage_key])).get(storage_key)
+        return json.loads(value) if value is not None else {}
+
+    async def get_many(
+        self, namespace: str, keys: Iterable[str]
+    ) -> Dict[str, Tuple[str, float]]:
+        prefixed = {f"{namespace}:{key}": key for key in keys}
+        if not prefixed:
+            return {}
+        found = await self._run(self._get_expiring, list(prefixed))
+        return {prefixed[key]: value for key, value in found.items()}
+
+    async def put_many(self, namespace: str, items: Dict[str, str], ttl: float) -> None:
+        if items:
+            await self._run(
+                self._set,
+                {f"{namespace}:{key}": value for key, value in items.items()},
+                time.time() + ttl,
+            )
+
+    def _close(self) -> None:
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    async def close(self) -> None:
+        await self._run(self._close)
+        self._executor.shutdown(wait=False)
+
+
+def create_storage(path: Optional[str] = STORAGE_PATH) -> BaseStorage:
+    """SQLite storage if a path is configured, aiogram's in-memory storage otherwise."""
+    return SQLiteStorage(path) if path else MemoryStorage()
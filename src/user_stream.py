@@ -0,0 +1,158 @@
+import asyncio
+import json
+import logging
+from decimal import Decimal
+from os import getenv
+from typing import Dict, List, Optional, Tuple
+
+import aiohttp
+
+from binance_api import BinanceClient
+from market_stream import STREAM_URL, MAX_RECONNECT_DELAY
+from models import LazyUserAsset
+from scheduler import RequestShed
+
+# listenKeys expire after 60 minutes without a keepalive
+KEEPALIVE_INTERVAL = float(getenv("USER_STREAM_KEEPALIVE_INTERVAL", "1800"))
+# Seconds before a failed or shed keepalive is retried
+KEEPALIVE_RETRY_DELAY = 30.0
+
+logger = logging.getLogger(__name__)
+
+ZERO = Decimal("0")
+
+
+class BalanceTable:
+    """In-memory free/locked balance per asset, kept current by the user data stream.
+
+    Reads return ``None`` while the table is not synced (before the first
+    seed, or after the stream dropped) so callers can fall back to REST.
+    """
+
+    def __init__(self):
+        self._balances: Dict[str, Tuple[Decimal, Decimal]] = {}
+        self.synced = False
+
+    def seed(self, assets: List[LazyUserAsset]) -> None:
+        self._balances = {a.symbol: (a.free, a.locked) for a in assets}
+        self.synced = True
+
+    def invalidate(self) -> None:
+        self.synced = False
+
+    def apply_account_position(self, event: dict) -> None:
+        """Apply absolute balances from an ``outboundAccountPosition`` event."""
+        for balance in event["B"]:
+            self._balances[balance["a"]] = (Decimal(balance["f"]), Decimal(balance["l"]))
+
+    def apply_balance_update(self, event: dict) -> None:
+        """Apply the free balance delta from a ``balanceUpdate`` event."""
+        free, locked = self._balances.get(event["a"], (ZERO, ZERO))
+        self._balances[event["a"]] = (free + Decimal(event["d"]), locked)
+
+    def get_user_assets(self) -> Optional[List[LazyUserAsset]]:
+        if not self.synced:
+            return None
+        return [
+            LazyUserAsset.from_json({"asset": symbol, "free": free, "locked": locked})
+            for symbol, (free, locked) in self._balances.items()
+            if free or locked
+        ]
+
+    def get_user_asset(self, symbol: str) -> Optional[LazyUserAsset]:
+        if not self.synced:
+            return None
+        free, locked = self._balances.get(symbol, (ZERO, ZERO))
+        return LazyUserAsset.from_json({"asset": symbol, "free": free, "locked": locked})
+
+
+class UserDataStream:
+    """listenKey based consumer of the Binance user data stream.
+
+    On every (re)connect the balance table is seeded once over REST and then
+    updated incrementally from account events. Events that arrive while the
+    seed request is in flight are buffered by the websocket and applied right
+    after it; ``outboundAccountPosition`` carries absolute balances, so any
+    ``balanceUpdate`` already included in the seed is corrected by the
+    position event Binance sends with it.
+    """
+
+    def __init__(self, client: BinanceClient, balances: BalanceTable, url: str = STREAM_URL):
+        self.client = client
+        self.balances = balances
+        self.url = url.rstrip("/")
+        self._ws: Optional[aiohttp.ClientWebSocketResponse] = None
+        self._stopped = asyncio.Event()
+
+    async def _keepalive(self, listen_key: str) -> None:
+        delay = KEEPALIVE_INTERVAL
+        while True:
+            await asyncio.sleep(delay)
+            try:
+                await self.client.keepalive_listen_key(listen_key)
+                delay = KEEPALIVE_INTERVAL
+            except RequestShed:
+                # Retried well before the key expires rather than a full interval later
+                logger.info("User stream keepalive shed, rate limit budget low")
+                delay = KEEPALIVE_RETRY_DELAY
+            except Exception as e:
+                logger.warning(f"User stream keepalive failed: {e}")
+                delay = KEEPALIVE_RETRY_DELAY
+
+    def _handle(self, raw: str) -> bool:
+        """Apply one stream event, returns False if the stream must be resynced."""
+        event = json.loads(raw)
+        match event.get("e"):
+            case "outboundAccountPosition":
+                self.balances.apply_account_position(event)
+            case "balanceUpdate":
+                self.balances.apply_balance_update(event)
+            case "listenKeyExpired":
+                return False
+        return True
+
+    async def run(self) -> None:
+        """Consume the user data stream until :meth:`stop` is called."""
+        delay = 1.0
+        async with aiohttp.ClientSession() as session:
+            while not self._stopped.is_set():
+                keepalive = None
+                try:
+                    listen_key = await self.client.create_listen_key()
+                    async with session.ws_connect(f"{self.url}/ws/{listen_key}", heartbeat=30) as ws:
+                        self._ws = ws
+                        keepalive = asyncio.create_task(self._keepalive(listen_key))
+                        self.balances.seed(await self.client.get_user_assets())
+                        logger.info("User data stream connected, balances synced")
+                        delay = 1.0
+                        async for msg in ws:
+                            if msg.type == aiohttp.WSMsgType.TEXT:
+                                if not self._handle(msg.data):
+                                    break
+                            elif msg.type == aiohttp.WSMsgType.ERROR:
+                                break
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.warning(f"User data stream error: {e}")
+                finally:
+                    # Events may be missed until the next seed
+                    self.balances.invalidate()
+                    self._ws = None
+                    if keepalive is not None:
+                        keepalive.cancel()
+
+                if self._stopped.is_set():
+                    break
+                logger.info(f"User data stream disconnected, resyncing in {delay:.0f}s")
+                try:
+                    await asyncio.wait_for(self._stopped.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                delay = min(delay * 2, MAX_RECONNECT_DELAY)
+
+    async def stop(self) -> None:
+        self._stopped.set()
+        if self._ws is not None:
+            await self._ws.close()
+
@@ -0,0 +1,132 @@
+from array import array
+from math import fsum
+from typing import Any, Dict, List, Sequence
+
+from models import WalletItem
+import utils
+
+USDT = "USDT"
+# Assets worth less than this many USDT are hidden from the wallet view
+MIN_DISPLAY_BALANCE = 1.0
+# Stand-in liquidity for the quote currency itself
+QUOTE_LIQUIDITY = 999999999.0
+
+
+def calculate_depths(
+    bid_price: Sequence[float],
+    bid_qty: Sequence[float],
+    ask_price: Sequence[float],
+    ask_qty: Sequence[float],
+) -> array:
+    """Vectorized ``calculate_depth`` over whole columns.
+
+    :return: Top-of-book depth in USDT per row
+    """
+    return array("d", [
+        bp * bq + ap * aq
+        for bp, bq, ap, aq in zip(bid_price, bid_qty, ask_price, ask_qty)
+    ])
+
+
+class PortfolioFrame:
+    """Columnar valuation of a whole portfolio.
+
+    Balances, prices and book data are unpacked once into float columns, then
+    USDT balance, 24h PnL, depth and the display filter are computed for every
+    asset in one pass. Sorting, totals and filtering work on those columns;
+    exact ``Decimal`` values are only produced by :meth:`item` for the rows
+    that actually get rendered.
+    """
+
+    __slots__ = (
+        "symbols", "free", "price", "change_percent", "depth", "balance", "pnl",
+        "visible", "order", "_assets", "_tickers",
+    )
+
+    def __init__(self, assets: List[Any], tickers: List[Any]):
+        self._assets = assets
+        self._tickers = tickers
+        self.symbols = [a.symbol for a in assets]
+
+        free = array("d")
+        price = array("d")
+        change_percent = array("d")
+        bid_price, bid_qty, ask_price, ask_qty = array("d"), array("d"), array("d"), array("d")
+        for asset, pd in zip(assets, tickers):
+            free.append(float(asset.free))
+            if pd is None:
+                # Quote currency, valued 1:1
+                price.append(1.0)
+                change_percent.append(0.0)
+                bid_price.append(0.0)
+                bid_qty.append(0.0)
+                ask_price.append(0.0)
+                ask_qty.append(0.0)
+            else:
+                price.append(float(pd.last_price))
+                change_percent.append(float(pd.price_change_percent))
+                bid_price.append(float(pd.bid_price))
+                bid_qty.append(float(pd.bid_qty))
+                ask_price.append(float(pd.ask_price))
+                ask_qty.append(float(pd.ask_qty))
+
+        self.free = free
+        self.price = price
+        self.change_percent = change_percent
+        self.depth = calculate_depths(bid_price, bid_qty, ask_price, ask_qty)
+        for i, pd in enumerate(tickers):
+            if pd is None:
+                self.depth[i] = QUOTE_LIQUIDITY
+
+        self.balance = array("d", [f * p for f, p in zip(free, price)])
+        self.pnl = array("d", [b * c / 100 for b, c in zip(self.balance, change_percent)])
+        self.visible = [b >= MIN_DISPLAY_BALANCE for b in self.balance]
+        self.order = sorted(range(len(assets)), key=self.balance.__getitem__, reverse=True)
+
+    @classmethod
+    def build(cls, user_assets: List[Any], price_data: Dict[str, Any]) -> "PortfolioFrame":
+        """Build the frame from user balances and price data keyed by USDT pair.
+
+        :param user_assets: User balances
+        :param price_data: Price data per trading pair
+        :return: Portfolio frame
+        """
+        tickers = [
+            None if asset.symbol == USDT else price_data[utils.pair_ticker(asset.symbol, USDT)]
+            for asset in user_assets
+        ]
+        return cls(user_assets, tickers)
+
+    def __len__(self) -> int:
+        return len(self.symbols)
+
+    @property
+    def total_balance(self) -> float:
+        return fsum(self.balance)
+
+    @property
+    def visible_count(self) -> int:
+        return sum(self.visible)
+
+    def visible_order(self) -> List[int]:
+        """Row indices of displayed assets, by descending USDT balance."""
+        visible = self.visible
+        return [i for i in self.order if visible[i]]
+
+    def item(self, i: int) -> WalletItem:
+        """Exact ``WalletItem`` for one row, for rendering."""
+        asset, pd = self._assets[i], self._tickers[i]
+        if pd is None:
+            return WalletItem.create_usdt_entry(asset.free)
+        return WalletItem(
+            symbol=asset.symbol,
+            free=asset.free,
+            last_price_usdt=pd.last_price,
+            available_liquidity=pd.bid_price * pd.bid_qty + pd.ask_price * pd.ask_qty,
+            pnl_24hr_usdt=pd.price_change,
+            pnl_24hr_percentage=pd.price_change_percent,
+        )
+
+    def wallet_items(self) -> List[WalletItem]:
+        """Exact wallet items for every asset, sorted by USDT balance."""
+        return [self.item(i) for i in self.order]
@@ -0,0 +1,132 @@
+import time
+from collections import OrderedDict
+from os import getenv
+from typing import Hashable, List, Optional, Tuple
+
+from models import WalletItem
+from valuation import PortfolioFrame
+
+# Telegram rejects messages longer than this many UTF-16 code units
+MESSAGE_LIMIT = 4096
+# Reopening the wallet within this many seconds reuses the rendered pages
+PAGE_CACHE_TTL = float(getenv("WALLET_PAGE_CACHE_TTL", "15"))
+PAGE_CACHE_SIZE = int(getenv("WALLET_PAGE_CACHE_SIZE", "1024"))
+
+
+def text_length(text: str) -> int:
+    """Message length as Telegram counts it, in UTF-16 code units."""
+    return len(text.encode("utf-16-le")) // 2
+
+
+def format_row(asset: WalletItem) -> str:
+    return (
+        f"<b>{asset.symbol}</b>\n"
+        f"└ <code>${asset.balance_usdt:.2f}</code> "
+        f"@ <code>${asset.last_price_usdt:.4f}</code>\n"
+        f"└ 24h: {asset.formatted_pnl}\n\n"
+    )
+
+
+def format_timestamp(updated_at: str) -> str:
+    # Pages are reused for a while, so this is the time of the data, not of the message
+    return f"<i>Prices as of {updated_at}</i>"
+
+
+def format_footer(shown: int, total: int, updated_at: str, page: int, pages: int) -> str:
+    footer = f"\n<i>Showing {shown} of {total} assets"
+    if pages > 1:
+        footer += f" · page {page}/{pages}"
+    return footer + "</i>\n" + format_timestamp(updated_at)
+
+
+def render_pages(
+    portfolio: PortfolioFrame, updated_at: str, limit: int = MESSAGE_LIMIT
+) -> List[str]:
+    """Render the wallet overview into pages that each fit in one Telegram message.
+
+    Rows are formatted once and every page is assembled with a single join.
+
+    :param portfolio: Valued portfolio
+    :param updated_at: Display timestamp for the footer
+    :param limit: Max length of one page
+    :return: Rendered HTML pages, at least one
+    """
+    header = (
+        f"<b>💼 Wallet Overview</b>\n"
+        f"<code>Total: ${portfolio.total_balance:.2f} USDT</code>\n\n"
+    )
+    rows = [format_row(portfolio.item(i)) for i in portfolio.visible_order()]
+    shown, total = len(rows), len(portfolio)
+
+    # Reserve room for the widest possible footer
+    widest = max(len(rows), 1)
+    budget = (
+        limit
+        - text_length(header)
+        - text_length(format_footer(shown, total, updated_at, widest, widest))
+    )
+
+    chunks: List[List[str]] = [[]]
+    used = 0
+    for row in rows:
+        size = text_length(row)
+        if chunks[-1] and used + size > budget:
+            chunks.append([])
+            used = 0
+        chunks[-1].append(row)
+        used += size
+
+    pages = len(chunks)
+    return [
+        "".join([header, *chunk, format_footer(shown, total, updated_at, n, pages)])
+        for n, chunk in enumerate(chunks, start=1)
+    ]
+
+
+def data_version(portfolio: PortfolioFrame) -> int:
+    """Fingerprint of the portfolio data, pages only need re-rendering when it changes."""
+    return hash((
+        tuple(portfolio.symbols),
+        portfolio.free.tobytes(),
+        portfolio.price.tobytes(),
+        portfolio.change_percent.tobytes(),
+    ))
+
+
+class WalletPageCache:
+    """Rendered wallet pages per user, keyed by the data version they were rendered from."""
+
+    def __init__(self, ttl: float = PAGE_CACHE_TTL, maxsize: int = PAGE_CACHE_SIZE):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[Hashable, Tuple[float, int, List[str]]]" = OrderedDict()
+
+    def get(self, user_id: Hashable) -> Optional[List[str]]:
+        """Last rendered pages for user, regardless of age."""
+        entry = self._entries.get(user_id)
+        return entry[2] if entry is not None else None
+
+    def get_fresh(self, user_id: Hashable) -> Optional[List[str]]:
+        """Last rendered pages for user if they are younger than the TTL."""
+        entry = self._entries.get(user_id)
+        if entry is None or time.monotonic() - entry[0] > self.ttl:
+            return None
+        return entry[2]
+
+    def render(self, user_id: Hashable, portfolio: PortfolioFrame, updated_at: str) -> List[str]:
+        """Return pages for the portfolio, reusing the cached ones if its data is unchanged.
+
+        Reused pages keep the timestamp of the data they were rendered from, so
+        showing them again produces identical text and the edit can be skipped.
+        """
+        version = data_version(portfolio)
+        entry = self._entries.get(user_id)
+        if entry is not None and entry[1] == version:
+            pages = entry[2]
+        else:
+            pages = render_pages(portfolio, updated_at)
+        self._entries[user_id] = (time.monotonic(), version, pages)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+        return pages
@@ -0,0 +1,100 @@
+import asyncio
+import logging
+import time
+from os import getenv
+from typing import Awaitable, Dict, List, Set
+
+from accounts import ClientRegistry, Credentials
+from exchange_filters import FilterIndex
+from scheduler import Priority
+import exchange_filters
+import market_stream
+import utils
+
+WARMUP_ENABLED = getenv("WARMUP_ENABLED", "true").lower() == "true"
+# Connections opened to Binance before the first update arrives
+WARMUP_CONNECTIONS = int(getenv("WARMUP_CONNECTIONS", "4"))
+# Accounts opened and whose held assets are prefetched, first configured first
+WARMUP_ACCOUNTS = int(getenv("WARMUP_ACCOUNTS", "10"))
+# Seconds each step may take before startup carries on without it
+WARMUP_TIMEOUT = float(getenv("WARMUP_TIMEOUT", "10"))
+
+logger = logging.getLogger(__name__)
+
+USDT = "USDT"
+
+
+async def _prefetch_tickers(registry: ClientRegistry, max_accounts: int) -> int:
+    """Open accounts and cache the tickers of the assets they hold.
+
+    :return: Number of pairs prefetched
+    """
+    async def held_pairs(credentials: Credentials) -> List[str]:
+        account = await registry.open(credentials)
+        user_assets = await account.client.get_user_assets(priority=Priority.BACKGROUND)
+        return [utils.pair_ticker(a.symbol, USDT) for a in user_assets if a.symbol != USDT]
+
+    selected = registry.accounts()[:max_accounts]
+    pairs: Set[str] = set()
+    results = await asyncio.gather(*(held_pairs(c) for c in selected), return_exceptions=True)
+    for credentials, held in zip(selected, results):
+        if isinstance(held, Exception):
+            # One account with bad keys or a shed balance call shouldn't stop the others
+            logger.warning(f"Warm-up of account {credentials.name} failed: {held}")
+            continue
+        pairs.update(held)
+    if pairs:
+        market_stream.stream.track(pairs)
+        await registry.public.get_24hr_price_data(sorted(pairs), priority=Priority.BACKGROUND)
+    return len(pairs)
+
+
+async def warm_up(
+    registry: ClientRegistry,
+    filters: FilterIndex = exchange_filters.index,
+    connections: int = WARMUP_CONNECTIONS,
+    max_accounts: int = WARMUP_ACCOUNTS,
+    timeout: float = WARMUP_TIMEOUT,
+) -> Dict[str, float]:
+    """Warm the Binance connection pool and caches before the first update arrives.
+
+    Opens ``connections`` pooled connections, then calibrates the server
+    clock, loads the exchange filters and prefetches tickers of held assets
+    concurrently. A failed or slow step is logged and skipped, the handlers
+    fetch what is missing on demand.
+
+    :param registry: Registry whose connector and accounts are warmed
+    :param filters: Exchange filter index to load
+    :param connections: Connections to open
+    :param max_accounts: Accounts to open and prefetch tickers for
+    :param timeout: Seconds each step may take
+    :return: Milliseconds spent per step, and in total
+    """
+    timings: Dict[str, float] = {}
+    client = registry.public
+
+    async def step(name: str, work: Awaitable) -> None:
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(work, timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Warm-up step {name} timed out after {timeout:g}s")
+        except Exception as e:
+            logger.warning(f"Warm-up step {name} failed: {e}")
+        timings[name] = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    # Concurrent requests each need their own connection, which stays pooled
+    await step("connect", asyncio.gather(*(client.ping() for _ in range(connections))))
+    await asyncio.gather(
+        step("clock", client.calibrate_clock()),
+        step("exchange_info", filters.refresh(client, priority=Priority.BACKGROUND)),
+        step("tickers", _prefetch_tickers(registry, max_accounts)),
+    )
+    timings["total"] = (time.perf_counter() - started) * 1000
+    logger.info(
+        "Warm-up finished in {total:.0f} ms: connect {connect:.0f} ms, clock {clock:.0f} ms, "
+        "exchange info {exchange_info:.0f} ms, tickers {tickers:.0f} ms".format(**timings),
+        extra={"timings_ms": {k: round(v, 1) for k, v in timings.items()}},
+    )
+    return timings
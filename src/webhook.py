@@ -0,0 +1,163 @@
+import asyncio
+import hmac
+import logging
+import secrets
+import time
+from collections import deque
+from os import getenv
+from typing import Any, Awaitable, Callable, Deque, Dict, List
+
+from aiohttp import web
+
+# Public HTTPS base URL registered with Telegram; leave unset to POST updates locally
+WEBHOOK_URL = getenv("WEBHOOK_URL")
+WEBHOOK_PATH = getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_HOST = getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(getenv("WEBHOOK_PORT", "8080"))
+# Echoed by Telegram in X-Telegram-Bot-Api-Secret-Token on every webhook call. Updates
+# without it are refused; when unset a random one is registered on every start
+WEBHOOK_SECRET = getenv("WEBHOOK_SECRET") or secrets.token_urlsafe(32)
+# Updates waiting for a handler; when full Telegram is asked to retry later
+UPDATE_QUEUE_SIZE = int(getenv("UPDATE_QUEUE_SIZE", "1000"))
+# Updates handled at once
+UPDATE_CONCURRENCY = int(getenv("UPDATE_CONCURRENCY", "50"))
+# Number of recent updates latency percentiles are computed over
+LATENCY_WINDOW = 1024
+
+logger = logging.getLogger(__name__)
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(int(q * len(sorted_values)), len(sorted_values) - 1)]
+
+
+class UpdatePipeline:
+    """Bounded queue of raw updates drained by a fixed number of handler tasks.
+
+    Bursts are absorbed by the queue up to ``maxsize``; beyond that
+    :meth:`submit` refuses the update so the webhook can answer with an
+    error status and Telegram redelivers it later. At most ``concurrency``
+    updates are handled at once, however large the burst.
+    """
+
+    def __init__(
+        self,
+        handle: Callable[[Dict[str, Any]], Awaitable[Any]],
+        maxsize: int = UPDATE_QUEUE_SIZE,
+        concurrency: int = UPDATE_CONCURRENCY,
+    ):
+        self.handle = handle
+        self.concurrency = concurrency
+        self.queue: "asyncio.Queue[tuple[float, Dict[str, Any]]]" = asyncio.Queue(maxsize)
+        self._workers: List[asyncio.Task] = []
+        self._waits: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self._latencies: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self.accepted = 0
+        self.rejected = 0
+        self.failed = 0
+        self.max_depth = 0
+
+    def start(self) -> None:
+        self._workers = [asyncio.create_task(self._work()) for _ in range(self.concurrency)]
+
+    async def stop(self) -> None:
+        """Finish the queued updates, then stop the handler tasks."""
+        await self.queue.join()
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+
+    def submit(self, update: Dict[str, Any]) -> bool:
+        """Queue an update, returns False if the queue is full."""
+        try:
+            self.queue.put_nowait((time.perf_counter(), update))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            return False
+        self.accepted += 1
+        self.max_depth = max(self.max_depth, self.queue.qsize())
+        return True
+
+    async def _work(self) -> None:
+        while True:
+            received_at, update = await self.queue.get()
+            started_at = time.perf_counter()
+            try:
+                await self.handle(update)
+            except Exception:
+                self.failed += 1
+                logger.exception(f"Update {update.get('update_id')} failed")
+            finally:
+                self._waits.append(started_at - received_at)
+                self._latencies.append(time.perf_counter() - received_at)
+                self.queue.task_done()
+
+    def stats(self) -> Dict[str, float]:
+        """Queue depth, counters and recent latency percentiles in seconds."""
+        waits = sorted(self._waits)
+        latencies = sorted(self._latencies)
+        return {
+            "queue_depth": self.queue.qsize(),
+            "max_queue_depth": self.max_depth,
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "failed": self.failed,
+            "wait_p50": percentile(waits, 0.5),
+            "wait_p95": percentile(waits, 0.95),
+            "latency_p50": percentile(latencies, 0.5),
+            "latency_p95": percentile(latencies, 0.95),
+            "latency_max": latencies[-1] if latencies else 0.0,
+        }
+
+
+def create_app(
+    pipeline: UpdatePipeline, path: str = WEBHOOK_PATH, secret: str = WEBHOOK_SECRET
+) -> web.Application:
+    """Web app accepting Telegram updates on ``path``.
+
+    Handlers act on the sender of an update, so updates without the secret
+    token are refused; anyone could forge them otherwise.
+
+    :param pipeline: Pipeline the updates are queued on
+    :param path: Webhook path
+    :param secret: Expected secret token header
+    :return: aiohttp application
+    """
+
+    async def receive(request: web.Request) -> web.Response:
+        token = request.headers.get("X-Telegram-Bot-Api-Secret-Token", "")
+        if not hmac.compare_digest(token.encode(), secret.encode()):
+            return web.Response(status=401)
+        try:
+            update = await request.json()
+        except ValueError:
+            return web.Response(status=400)
+        if not pipeline.submit(update):
+            # Telegram redelivers updates answered with an error status
+            return web.Response(status=503)
+        return web.Response()
+
+    app = web.Application()
+    app.router.add_post(path, receive)
+    return app
+
+
+async def serve(
+    pipeline: UpdatePipeline, host: str = WEBHOOK_HOST, port: int = WEBHOOK_PORT
+) -> None:
+    """Run the webhook server until cancelled, then drain the pipeline."""
+    runner = web.AppRunner(create_app(pipeline))
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    pipeline.start()
+    await site.start()
+    logger.info(f"Webhook server listening on {host}:{port}{WEBHOOK_PATH}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        # Stop accepting updates before draining the ones already queued
+        await site.stop()
+        await pipeline.stop()
+        await runner.cleanup()
@@ -0,0 +1,156 @@
+import asyncio
+import logging
+import multiprocessing
+from collections import deque
+from os import getenv
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from aiogram import Bot
+
+# Long polling timeout of the getUpdates request, in seconds
+POLL_TIMEOUT = int(getenv("BOT_POLL_TIMEOUT", "30"))
+# Seconds a worker gets to finish its updates on shutdown
+SHUTDOWN_TIMEOUT = float(getenv("BOT_WORKER_SHUTDOWN_TIMEOUT", "10"))
+# Updates a worker takes off its queue at once; the rest wait in the queue
+WORKER_CONCURRENCY = int(getenv("BOT_WORKER_CONCURRENCY", "50"))
+
+logger = logging.getLogger(__name__)
+
+Worker = Tuple[multiprocessing.Process, multiprocessing.Queue]
+
+
+def sender_id(update: Dict[str, Any]) -> int:
+    """Id of the user or chat that caused a raw update, 0 if there is none."""
+    for value in update.values():
+        if isinstance(value, dict):
+            sender = value.get("from") or value.get("user") or value.get("chat") or {}
+            return sender.get("id", 0)
+    return 0
+
+
+def route(update: Dict[str, Any], workers: int) -> int:
+    """Pick the worker for an update, sticky by the user that caused it.
+
+    Keeping each user on one worker lets it handle their updates in order
+    and keeps their Binance account open in a single process.
+
+    :param update: Raw Telegram update
+    :param workers: Number of workers
+    :return: Worker index
+    """
+    return sender_id(update) % workers
+
+
+def start(count: int, target: Callable, *args) -> List[Worker]:
+    """Start worker processes, each fed by its own update queue.
+
+    :param count: Number of workers
+    :param target: Worker entry point, called as ``target(index, queue, *args)``
+    :return: Started workers
+    """
+    context = multiprocessing.get_context("spawn")
+    workers = []
+    for index in range(count):
+        queue = context.Queue()
+        process = context.Process(
+            target=target, args=(index, queue, *args), name=f"bot-worker-{index}", daemon=True
+        )
+        process.start()
+        workers.append((process, queue))
+    return workers
+
+
+def stop(workers: List[Worker]) -> None:
+    """Ask every worker to finish its queue, terminating the ones that don't."""
+    for _, queue in workers:
+        queue.put(None)
+    for process, _ in workers:
+        process.join(SHUTDOWN_TIMEOUT)
+        if process.is_alive():
+            process.terminate()
+
+
+def dispatch(workers: List[Worker], update: Dict[str, Any]) -> None:
+    """Hand a raw update to the worker it is routed to."""
+    _, queue = workers[route(update, len(workers))]
+    queue.put(update)
+
+
+async def poll(bot: Bot, workers: List[Worker], allowed_updates: Optional[List[str]]) -> None:
+    """Long poll Telegram and hand every update to its worker.
+
+    :param bot: Bot to poll updates for
+    :param workers: Running workers
+    :param allowed_updates: Update types the dispatcher handles
+    :return: None
+    """
+    offset = None
+    while True:
+        try:
+            updates = await bot.get_updates(
+                offset=offset, timeout=POLL_TIMEOUT, allowed_updates=allowed_updates
+            )
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Polling failed: {e}")
+            await asyncio.sleep(1)
+            continue
+
+        for update in updates:
+            dispatch(workers, update.model_dump(mode="json", exclude_none=True))
+            offset = update.update_id + 1
+
+
+async def consume(
+    queue: multiprocessing.Queue,
+    handle: Callable[[Dict[str, Any]], Awaitable[Any]],
+    concurrency: int = WORKER_CONCURRENCY,
+) -> None:
+    """Handle updates from a worker queue until the stop sentinel.
+
+    Updates of different users are handled concurrently, each user's one at
+    a time in the order they arrived. At most ``concurrency`` updates are
+    taken off the queue at once, so a burst waits in the queue instead of
+    piling up as tasks.
+
+    :param queue: Queue filled by :func:`dispatch`
+    :param handle: Coroutine handling one raw update
+    :param concurrency: Max updates handled or waiting for their user's previous one
+    :return: None
+    """
+    loop = asyncio.get_running_loop()
+    slots = asyncio.Semaphore(concurrency)
+    # Updates per user, the first one is being handled
+    pending: Dict[int, Deque[Dict[str, Any]]] = {}
+    tasks = set()
+
+    async def drain(user: int) -> None:
+        updates = pending[user]
+        while updates:
+            raw = updates[0]
+            try:
+                await handle(raw)
+            except Exception:
+                logger.exception(f"Update {raw.get('update_id')} failed")
+            finally:
+                updates.popleft()
+                slots.release()
+        del pending[user]
+
+    while True:
+        await slots.acquire()
+        raw = await loop.run_in_executor(None, queue.get)
+        if raw is None:
+            break
+        user = sender_id(raw)
+        if user in pending:
+            pending[user].append(raw)
+            continue
+        pending[user] = deque([raw])
+        task = asyncio.create_task(drain(user))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+
+    if tasks:
+        await asyncio.wait(tasks, timeout=SHUTDOWN_TIMEOUT)